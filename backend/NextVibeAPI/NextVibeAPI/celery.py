@@ -10,5 +10,6 @@ app.autodiscover_tasks()
 
 @worker_ready.connect
 def at_start(sender, **kwargs):
-    from posts.tasks import auto_moderation_check
+    from posts.tasks import auto_moderation_check, refresh_popular_posts
     auto_moderation_check.delay()
+    refresh_popular_posts.delay()
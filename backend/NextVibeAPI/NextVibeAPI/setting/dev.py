@@ -113,6 +113,18 @@ MIDDLEWARE = [
 CELERY_BROKER_URL = "redis://localhost:6379/0"
 CELERY_RESULT_BACKEND = "redis://localhost:6379/0"
 
+# Media stages run on their own worker pools (posts.src.media_worker):
+#   celery -A NextVibeAPI worker -Q media_fast -c 4 -n media_fast@%h
+#   celery -A NextVibeAPI worker -Q media_video -c 2 --prefetch-multiplier=1 -n media_video@%h
+CELERY_TASK_ROUTES = {
+    'posts.tasks.process_media_file': {'queue': 'media_fast'},
+    'posts.tasks.render_image_stage': {'queue': 'media_fast'},
+    'posts.tasks.render_video_poster_stage': {'queue': 'media_fast'},
+    'posts.tasks.finish_media_stage': {'queue': 'media_fast'},
+    'posts.tasks.delete_media_objects': {'queue': 'media_fast'},
+    'posts.tasks.transcode_video_stage': {'queue': 'media_video'},
+}
+
 from celery.schedules import crontab
 
 CELERY_BEAT_SCHEDULE = {
@@ -120,6 +132,14 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'posts.tasks.auto_moderation_check',
         'schedule': crontab(minute='*/5'),  # every 5 min
     },
+    'flush-moderation-queue-every-min': {
+        'task': 'posts.tasks.flush_moderation_queue',
+        'schedule': crontab(minute='*'),  # safety net, enqueue triggers flushes too
+    },
+    'refresh-popular-posts-every-15-min': {
+        'task': 'posts.tasks.refresh_popular_posts',
+        'schedule': crontab(minute='*/15'),
+    },
 }
 
 
@@ -133,6 +153,9 @@ CACHES = {
     }
 }
 
+# Redis the socket service reads chat membership and presence from
+REALTIME_REDIS_URL = "redis://127.0.0.1:6379/0"
+
 
 from datetime import timedelta
 SIMPLE_JWT = {
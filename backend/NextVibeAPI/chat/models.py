@@ -30,6 +30,12 @@ class Message(models.Model):
     objects = MessageManager()
     all_objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of chat history on (created_at, id)
+            models.Index(fields=['chat', 'created_at', 'id'], name='chat_msg_history_keyset_idx'),
+        ]
+
     def __str__(self):
         return f"Message {self.id} in Chat {self.chat.id}"
 
@@ -58,6 +64,20 @@ class MessageReceipt(models.Model):
         return f"Receipt for Msg {self.message.id} User {self.user.id}"
 
 
+class ChatReadCursor(models.Model):
+    """Highest message id a participant has read in a chat; bounds read-receipt scans."""
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='read_cursors')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    last_read_message_id = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('chat', 'user')
+
+    def __str__(self):
+        return f"Read cursor for Chat {self.chat.id} User {self.user.user_id}: {self.last_read_message_id}"
+
+
 class MessageReaction(models.Model):
     message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='reactions')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -0,0 +1,29 @@
+import logging
+from typing import Iterable
+from .realtime import get_realtime_redis
+
+logger = logging.getLogger(__name__)
+
+# Must match socket_service/membership.py
+MEMBERSHIP_KEY_PREFIX = "chat_members:"
+GENERATION_KEY_PREFIX = "chat_members_gen:"
+GENERATION_TTL = 86400
+INVALIDATION_CHANNEL = "chat_membership_invalidate"
+
+
+def invalidate_chat_membership(chat_ids: Iterable[int]) -> None:
+    """Drops the socket service's cached participants/push tokens for `chat_ids` on every pod."""
+    chat_ids = list(chat_ids)
+    if not chat_ids:
+        return
+    try:
+        pipe = get_realtime_redis().pipeline(transaction=True)
+        for chat_id in chat_ids:
+            # Makes in-flight socket service loads skip writing back the old participants
+            pipe.incr(f"{GENERATION_KEY_PREFIX}{chat_id}")
+            pipe.expire(f"{GENERATION_KEY_PREFIX}{chat_id}", GENERATION_TTL)
+            pipe.delete(f"{MEMBERSHIP_KEY_PREFIX}{chat_id}")
+            pipe.publish(INVALIDATION_CHANNEL, str(chat_id))
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error invalidating chat membership cache for {chat_ids}: {e}")
@@ -0,0 +1,29 @@
+import logging
+import time
+from typing import Iterable, Set
+from .realtime import get_realtime_redis
+
+logger = logging.getLogger(__name__)
+
+# Must match socket_service/presence.py
+ONLINE_KEY = "presence:online"
+PRESENCE_TTL_SECONDS = 120
+
+
+def online_user_ids(user_ids: Iterable[int]) -> Set[int]:
+    """
+    Which of `user_ids` have a live socket connection, in one pipelined round trip
+    against the socket service's heartbeat index. Returns an empty set if Redis is down.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return set()
+    try:
+        pipe = get_realtime_redis().pipeline(transaction=False)
+        for uid in user_ids:
+            pipe.zscore(ONLINE_KEY, str(uid))
+        cutoff = time.time() - PRESENCE_TTL_SECONDS
+        return {uid for uid, score in zip(user_ids, pipe.execute()) if score is not None and score >= cutoff}
+    except Exception as e:
+        logger.error(f"Error reading presence index: {e}")
+        return set()
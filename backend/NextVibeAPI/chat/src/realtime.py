@@ -0,0 +1,12 @@
+import redis
+from django.conf import settings
+
+_client = None
+
+
+def get_realtime_redis() -> redis.Redis:
+    """Client for the Redis database shared with the socket service."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REALTIME_REDIS_URL)
+    return _client
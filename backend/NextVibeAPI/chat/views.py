@@ -6,6 +6,9 @@ from rest_framework.views import APIView
 import logging
 from django.db.models import Count
 from rest_framework.throttling import ScopedRateThrottle
+from .src.membership_cache import invalidate_chat_membership
+from .src.presence import online_user_ids
+from user.src.follow_graph import following_ids as get_following_ids
 
 logger = logging.getLogger(__name__)
 
@@ -85,11 +88,9 @@ class OnlineUsersView(APIView):
 
     def get(self, request):
         try:
-            following_ids = getattr(request.user, 'follow_for', []) or []
-            online_users = User.objects.filter(
-                is_online=True,
-                user_id__in=following_ids  
-            ).exclude(user_id=request.user.user_id)
+            following_ids = get_following_ids(request.user.user_id)
+            online_ids = online_user_ids(uid for uid in following_ids if uid != request.user.user_id)
+            online_users = User.objects.filter(user_id__in=online_ids)
 
             users_data = [{
                 'user_id': user.user_id,
@@ -129,6 +130,7 @@ class CreateChatView(APIView):
             chat = Chat.objects.create()
             chat.participants.set(participants)
             chat.save()
+            invalidate_chat_membership([chat.id])
             
             return Response({'chat_id': chat.id}, status=200)
         except Exception as e:
@@ -153,6 +155,7 @@ class DeleteChatView(APIView):
                 return Response({'error': 'Chat not found'}, status=404)
             chat = Chat.objects.get(id=chat_id, participants=request.user)
             chat.delete()
+            invalidate_chat_membership([chat_id])
             return Response({'message': 'Chat deleted successfully'}, status=200)
         except Chat.DoesNotExist:
             return Response({'error': 'Chat not found'}, status=404)
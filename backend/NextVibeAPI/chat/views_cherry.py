@@ -7,6 +7,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.contrib.auth import get_user_model
+from .src.presence import online_user_ids
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -122,6 +123,7 @@ class CherryMembersView(APIView):
                 users.remove(current_user)
                 users.insert(0, current_user)
 
+            online_ids = online_user_ids(u.user_id for u in users if u.user_id != current_user.user_id)
             members = []
             for u in users:
                 is_you = (u.user_id == current_user.user_id)
@@ -129,7 +131,7 @@ class CherryMembersView(APIView):
                     "user_id": u.user_id,
                     "username": u.username,
                     "avatar": get_avatar_url(u, request),
-                    "is_online": True if is_you else getattr(u, 'is_online', False),
+                    "is_online": is_you or u.user_id in online_ids,
                     "wallet_address": u.wallet_address,
                     "is_you": is_you,
                 })
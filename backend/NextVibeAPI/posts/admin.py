@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Post, PostsMedia, PostReport, Comment, CommentReply, UserCollection, EventCheckin, Reputation
+from .models import Post, PostsMedia, PostReport, Comment, CommentReply, UserCollection, EventCheckin, Reputation, PostLike, CommentLike, PopularPost, EventStats, EventActivityHour, MediaBlob
 from django.contrib import admin
 from user.models import User
 from .models import EventRequest
@@ -20,6 +20,12 @@ admin.site.register(UserCollection)
 admin.site.register(EventRequest)
 admin.site.register(EventCheckin)
 admin.site.register(Reputation)
+admin.site.register(PostLike)
+admin.site.register(CommentLike)
+admin.site.register(PopularPost)
+admin.site.register(EventStats)
+admin.site.register(EventActivityHour)
+admin.site.register(MediaBlob)
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
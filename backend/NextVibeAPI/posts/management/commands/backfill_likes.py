@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from posts.models import Comment, CommentLike, CommentReply, Post, PostLike
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the legacy User.liked_posts / liked_comments / liked_comment_replies JSON arrays "
+        "into the PostLike / CommentLike ledgers and recompute count_likes. Runs in small batches "
+        "and is safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users read per batch')
+        parser.add_argument('--start-id', type=int, default=0, help='Resume from this user_id')
+        parser.add_argument('--skip-counters', action='store_true', help='Only copy likes')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        last_id = options['start_id'] - 1
+        copied = 0
+        while True:
+            batch = list(
+                User.all_objects
+                .filter(user_id__gt=last_id)
+                .order_by('user_id')
+                .values_list('user_id', 'liked_posts', 'liked_comments', 'liked_comment_replies')[:batch_size]
+            )
+            if not batch:
+                break
+
+            post_ids, comment_ids, reply_ids = set(), set(), set()
+            for _, posts, comments, replies in batch:
+                post_ids.update(posts or [])
+                comment_ids.update(comments or [])
+                reply_ids.update(replies or [])
+
+            # Arrays may still point at deleted rows; only copy likes whose target exists
+            post_ids = set(Post.all_objects.filter(id__in=post_ids).values_list('id', flat=True))
+            comment_ids = set(Comment.all_objects.filter(id__in=comment_ids).values_list('id', flat=True))
+            reply_ids = set(CommentReply.all_objects.filter(id__in=reply_ids).values_list('id', flat=True))
+
+            post_likes, comment_likes = [], []
+            for user_id, posts, comments, replies in batch:
+                for post_id in set(posts or []) & post_ids:
+                    post_likes.append(PostLike(user_id=user_id, post_id=post_id))
+                for comment_id in set(comments or []) & comment_ids:
+                    comment_likes.append(CommentLike(user_id=user_id, comment_id=comment_id))
+                for reply_id in set(replies or []) & reply_ids:
+                    comment_likes.append(CommentLike(user_id=user_id, reply_id=reply_id))
+
+            PostLike.objects.bulk_create(post_likes, batch_size=1000, ignore_conflicts=True)
+            CommentLike.objects.bulk_create(comment_likes, batch_size=1000, ignore_conflicts=True)
+            copied += len(post_likes) + len(comment_likes)
+
+            last_id = batch[-1][0]
+            self.stdout.write(f"Processed users up to {last_id}")
+
+        if not options['skip_counters']:
+            self.recompute_counters(Post, PostLike.objects.filter(post_id=OuterRef('id')), 'post_id', batch_size)
+            self.recompute_counters(Comment, CommentLike.objects.filter(comment_id=OuterRef('id')), 'comment_id', batch_size)
+            self.recompute_counters(CommentReply, CommentLike.objects.filter(reply_id=OuterRef('id')), 'reply_id', batch_size)
+
+        self.stdout.write(self.style.SUCCESS(f"Like backfill finished: {copied} array entries copied"))
+
+    def recompute_counters(self, model, likes, group_field: str, batch_size: int):
+        counts = likes.order_by().values(group_field).annotate(c=Count('id')).values('c')
+
+        last_id = -1
+        while True:
+            ids = list(
+                model.all_objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            model.all_objects.filter(id__in=ids).update(
+                count_likes=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0)),
+            )
+            last_id = ids[-1]
+        self.stdout.write(f"Recomputed {model.__name__}.count_likes")
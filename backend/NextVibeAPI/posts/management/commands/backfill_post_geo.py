@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from posts.models import Post
+from posts.src.geo_index import geo_fields
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill Post.geo_lat / geo_lng / h3_r* from h3_geo for posts saved before the "
+        "Vibemap viewport index existed. Runs in batches and is safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Posts updated per batch')
+        parser.add_argument('--start-id', type=int, default=0, help='Resume from this post id')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        field_names = list(geo_fields(None))
+
+        last_id = options['start_id'] - 1
+        updated = 0
+        while True:
+            batch = list(
+                Post.all_objects
+                .filter(id__gt=last_id, h3_geo__isnull=False)
+                .exclude(h3_geo="")
+                .order_by('id')
+                .only('id', 'h3_geo')[:batch_size]
+            )
+            if not batch:
+                break
+
+            for post in batch:
+                for name, value in geo_fields(post.h3_geo).items():
+                    setattr(post, name, value)
+            Post.all_objects.bulk_update(batch, field_names)
+            updated += len(batch)
+
+            last_id = batch[-1].id
+            self.stdout.write(f"Processed posts up to {last_id}")
+
+        self.stdout.write(self.style.SUCCESS(f"Geo backfill finished: {updated} posts indexed"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from posts.src.media_worker import stage_metrics
+from posts.tasks import MEDIA_STAGES
+
+
+class Command(BaseCommand):
+    help = "Show recent per-stage timings of the media worker pool."
+
+    def handle(self, *args, **options):
+        for stage, metrics in stage_metrics(MEDIA_STAGES).items():
+            if not metrics["count"]:
+                self.stdout.write(f"{stage:16} no samples")
+                continue
+            self.stdout.write(
+                f"{stage:16} n={metrics['count']:<5} avg={metrics['avg_ms']}ms "
+                f"p50={metrics['p50_ms']}ms p95={metrics['p95_ms']}ms max={metrics['max_ms']}ms"
+            )
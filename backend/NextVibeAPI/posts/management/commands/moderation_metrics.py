@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from posts.src.media_worker import stage_metrics
+from posts.src.moderation import MODERATION_STAGES, queue_stats
+
+
+class Command(BaseCommand):
+    help = "Show the moderation queue and recent queue lag / service latency."
+
+    def handle(self, *args, **options):
+        stats = queue_stats()
+        self.stdout.write(
+            f"queued={stats['queued']} in_flight={stats['in_flight']} "
+            f"oldest_queued={stats['oldest_queued_s']}s"
+        )
+        for stage, metrics in stage_metrics(MODERATION_STAGES).items():
+            if not metrics["count"]:
+                self.stdout.write(f"{stage:20} no samples")
+                continue
+            self.stdout.write(
+                f"{stage:20} n={metrics['count']:<5} avg={metrics['avg_ms']}ms "
+                f"p50={metrics['p50_ms']}ms p95={metrics['p95_ms']}ms max={metrics['max_ms']}ms"
+            )
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from django.core.management.base import BaseCommand
+
+CALLBACK_URL = "http://127.0.0.1:8000/api/v1/posts/moderation-callback/"
+DENY_WORDS = ("forbidden",)
+DENY_MEDIA = "nsfw"
+
+
+def stub_result(req: dict, deny_words=DENY_WORDS, deny_media: str = DENY_MEDIA) -> dict:
+    """The service's response/callback body for one moderation request."""
+    content = req.get("content", "")
+    text_passed = not any(word in content.lower() for word in deny_words)
+    files = [
+        {"filename": url, "passed": deny_media not in url, "category": "", "errors": [], "details": {}}
+        for url in req.get("media_urls", [])
+    ]
+    return {
+        "id": req["id"],
+        "content": content,
+        "text": {"filename": "", "passed": text_passed, "category": "", "errors": [], "details": {}},
+        "files": files,
+        "passed": text_passed and all(f["passed"] for f in files),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stand-in for the Go moderation service (/moderation, "
+        "/moderation/batch, /health). Text containing a deny word and media URLs "
+        "containing the deny marker fail; everything else passes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8080)
+        parser.add_argument('--callback-url', default=CALLBACK_URL)
+        parser.add_argument('--deny-word', action='append', default=None, help='Repeatable; default "forbidden"')
+        parser.add_argument('--deny-media', default=DENY_MEDIA, help='Media URLs containing this fail')
+        parser.add_argument('--delay', type=float, default=0.0, help='Seconds spent "moderating" each post')
+
+    def handle(self, *args, **options):
+        deny_words = [w.lower() for w in (options['deny_word'] or DENY_WORDS)]
+        deny_media = options['deny_media']
+        delay = options['delay']
+        callback_url = options['callback_url']
+        stdout = self.stdout
+
+        def moderate(req):
+            time.sleep(delay)
+            return stub_result(req, deny_words, deny_media)
+
+        def callback(result):
+            try:
+                resp = requests.post(callback_url, json=result, timeout=10)
+                stdout.write(f"post {result['id']}: passed={result['passed']} -> callback {resp.status_code}")
+            except requests.exceptions.RequestException as e:
+                stdout.write(f"post {result['id']}: callback failed: {e}")
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, code, body):
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self._reply(200, {"status": "ok"})
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                except ValueError as e:
+                    self._reply(400, {"error": f"Failed to parse JSON: {e}"})
+                    return
+                if self.path == "/moderation":
+                    result = moderate(body)
+                    self._reply(200, result)
+                    callback(result)
+                elif self.path == "/moderation/batch":
+                    posts = body.get("posts", [])
+                    self._reply(202, {"accepted": len(posts)})
+                    threading.Thread(target=lambda: [callback(moderate(req)) for req in posts], daemon=True).start()
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def log_message(self, format, *args):
+                stdout.write(format % args)
+
+        server = ThreadingHTTPServer(("127.0.0.1", options['port']), Handler)
+        self.stdout.write(self.style.SUCCESS(f"Moderation stub on http://127.0.0.1:{options['port']}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from posts.models import Post
+from posts.src.event_analytics import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild EventStats / EventActivityHour rollups from the check-in, reputation and mint tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post-id', type=int, help='Rebuild a single event')
+        parser.add_argument('--batch-size', type=int, default=200, help='Events loaded per batch')
+        parser.add_argument('--start-id', type=int, default=0, help='Resume from this post id')
+
+    def handle(self, *args, **options):
+        if options['post_id']:
+            rebuild(options['post_id'])
+            self.stdout.write(self.style.SUCCESS(f"Event {options['post_id']} rebuilt"))
+            return
+
+        last_id = options['start_id'] - 1
+        while True:
+            ids = list(
+                Post.all_objects.filter(id__gt=last_id, is_luma_event=True).order_by('id')
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            for post_id in ids:
+                rebuild(post_id)
+            last_id = ids[-1]
+            self.stdout.write(f"Rebuilt events up to {last_id}")
+
+        self.stdout.write(self.style.SUCCESS("Event rollups rebuilt"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized Post.count_comments from the Comment table, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Posts updated per batch')
+        parser.add_argument('--start-id', type=int, default=0, help='Resume from this post id')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        counts = Comment.objects.filter(post_id=OuterRef('id')).order_by().values('post_id') \
+            .annotate(c=Count('id')).values('c')
+
+        last_id = options['start_id'] - 1
+        while True:
+            ids = list(
+                Post.all_objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            Post.all_objects.filter(id__in=ids).update(
+                count_comments=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0)),
+            )
+            last_id = ids[-1]
+            self.stdout.write(f"Recounted posts up to {last_id}")
+
+        self.stdout.write(self.style.SUCCESS("Post.count_comments recomputed"))
@@ -0,0 +1,36 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.core.management.base import BaseCommand
+from posts.models import EventRequest, Post
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized Post.approved_count / pending_count from EventRequest, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Events updated per batch')
+        parser.add_argument('--start-id', type=int, default=0, help='Resume from this post id')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        def counts(status):
+            return EventRequest.objects.filter(post_id=OuterRef('id'), status=status).order_by() \
+                .values('post_id').annotate(c=Count('id')).values('c')
+
+        last_id = options['start_id'] - 1
+        while True:
+            ids = list(
+                Post.all_objects.filter(id__gt=last_id, is_luma_event=True).order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            Post.all_objects.filter(id__in=ids).update(
+                approved_count=Coalesce(Subquery(counts(EventRequest.Status.APPROVED), output_field=IntegerField()), Value(0)),
+                pending_count=Coalesce(Subquery(counts(EventRequest.Status.PENDING), output_field=IntegerField()), Value(0)),
+            )
+            last_id = ids[-1]
+            self.stdout.write(f"Recounted events up to {last_id}")
+
+        self.stdout.write(self.style.SUCCESS("Event request counters recomputed"))
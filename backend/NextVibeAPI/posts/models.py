@@ -9,19 +9,38 @@ class Post(models.Model):
         indexes = [
             models.Index(fields=['-create_at', '-count_likes']),
             models.Index(fields=['owner', '-create_at']),
+            # Vibemap viewport index (see posts.src.geo_index)
+            models.Index(fields=['geo_lat', 'geo_lng'], name='posts_post_geo_idx'),
+            models.Index(fields=['h3_r3'], name='posts_post_h3_r3_idx'),
+            models.Index(fields=['h3_r5'], name='posts_post_h3_r5_idx'),
+            models.Index(fields=['h3_r7'], name='posts_post_h3_r7_idx'),
         ]
     owner = models.ForeignKey("user.User", on_delete=models.CASCADE)
     about = models.TextField(max_length=255, default="", null=True, blank=True)
     count_likes = models.IntegerField(default=0, null=True)
+    count_comments = models.IntegerField(default=0)
     create_at = models.DateTimeField(auto_now_add=True)
     location = models.CharField(default=None, null=True, blank=True, max_length=255)
     h3_geo = models.CharField(default=None, null=True, blank=True, max_length=255)
+    # Derived from h3_geo on save
+    geo_lat = models.FloatField(default=None, null=True, blank=True)
+    geo_lng = models.FloatField(default=None, null=True, blank=True)
+    h3_r3 = models.CharField(default=None, null=True, blank=True, max_length=16)
+    h3_r5 = models.CharField(default=None, null=True, blank=True, max_length=16)
+    h3_r7 = models.CharField(default=None, null=True, blank=True, max_length=16)
     is_ai_generated = models.BooleanField(default=False)
     is_approved = models.BooleanField(default=False)  
     moderation_status = models.CharField(max_length=20, default="pending")
+    # Media DAG (posts.src.media_worker): client finished uploading / moderation task queued
+    media_finalized = models.BooleanField(default=False)
+    moderation_queued = models.BooleanField(default=False)
+    moderation_queued_at = models.DateTimeField(null=True, blank=True)
     categories = models.JSONField(default=list, blank=True)
     is_comments_enabled = models.BooleanField(default=True, blank=True, null=True)
     is_luma_event = models.BooleanField(default=False)
+    # Event request counters, kept by posts.src.event_stats
+    approved_count = models.IntegerField(default=0)
+    pending_count = models.IntegerField(default=0)
     luma_event_url = models.CharField(default=None, null=True, blank=True, max_length=255)
     luma_event_verified = models.BooleanField(default=False)
     luma_event_start_time = models.DateTimeField(default=None, null=True, blank=True)
@@ -50,15 +69,67 @@ class Post(models.Model):
     objects = PostsManager()
     all_objects = models.Manager()
 
+    def save(self, *args, **kwargs):
+        from .src.geo_index import geo_fields
+
+        fields = geo_fields(self.h3_geo)
+        for name, value in fields.items():
+            setattr(self, name, value)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "h3_geo" in update_fields:
+            kwargs["update_fields"] = set(update_fields) | set(fields)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Post by {self.owner.username} with id {self.id}"
 
+class PopularPost(models.Model):
+    """
+    Maintained set of popular post ids for the legacy recommendations endpoint.
+    Rebuilt by posts.tasks.refresh_popular_posts instead of scanning Post per request.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name="popular_entry")
+    score = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Popular post {self.post_id} ({self.score})"
+
+class MediaBlob(models.Model):
+    """
+    One stored upload, addressed by the SHA-256 of its bytes. Every PostsMedia
+    with the same content points here and shares its object, renditions and
+    moderation verdict; ref_count tracks them (see posts.src.media_store).
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    file_key = models.CharField(max_length=255)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    processed = models.BooleanField(default=False)
+    preview_key = models.CharField(max_length=255, null=True, blank=True)
+    variants = models.JSONField(default=dict, blank=True)
+    # None until a post carrying this media has been moderated
+    moderation_passed = models.BooleanField(null=True, default=None)
+    # The PostsMedia whose processing fills in the renditions (None once processed)
+    processing_media = models.ForeignKey(
+        "PostsMedia", on_delete=models.SET_NULL, null=True, blank=True, related_name="+",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Blob {self.sha256[:12]} ({self.ref_count} refs)"
+
+
 class PostsMedia(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="media")
+    blob = models.ForeignKey(MediaBlob, on_delete=models.SET_NULL, null=True, blank=True, related_name="media")
+    # Set once every processing stage has run; moderation waits for it
+    processed_at = models.DateTimeField(null=True, blank=True)
     file = models.FileField(upload_to='posts_media/')
     preview = models.ImageField(upload_to='posts_previews/', null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Rendition keys written by posts.src.media_pipeline: {"image": {format: {width: key}}, "hls": key}
+    variants = models.JSONField(default=dict, blank=True)
 
     @property
     def file_url(self):
@@ -74,6 +145,28 @@ class PostsMedia(models.Model):
             return f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{self.preview.name}"
         return None
 
+    @property
+    def srcset(self):
+        """{format: {width: url}} for the image (or video poster) renditions; empty until processed"""
+        return {
+            fmt: {width: f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{key}" for width, key in widths.items()}
+            for fmt, widths in (self.variants or {}).get("image", {}).items()
+        }
+
+    @property
+    def hls_url(self):
+        key = (self.variants or {}).get("hls")
+        return f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{key}" if key else None
+
+    def image_url(self, width: int, fmt: str = "jpeg"):
+        """Smallest `fmt` rendition at least `width` wide (else the largest), or None without renditions"""
+        widths = (self.variants or {}).get("image", {}).get(fmt)
+        if not widths:
+            return None
+        sizes = sorted(int(w) for w in widths)
+        chosen = next((w for w in sizes if w >= width), sizes[-1])
+        return f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{widths[str(chosen)]}"
+
     def __str__(self):
         return f"Media for Post {self.post.id}"
     
@@ -104,6 +197,12 @@ class PostReport(models.Model):
         return f"{self.reporter.username} report for post (ID {self.post.id}) with report type: {self.report_type}"
 
 class Comment(models.Model):
+    class Meta:
+        indexes = [
+            # Keyset pages of a post's comments: newest first, and "top" by likes
+            models.Index(fields=['post', '-create_at', '-id'], name='posts_comment_new_idx'),
+            models.Index(fields=['post', '-count_likes', '-id'], name='posts_comment_top_idx'),
+        ]
     owner = models.ForeignKey("user.User", on_delete=models.CASCADE)
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     content = models.TextField(max_length=255)
@@ -116,6 +215,10 @@ class Comment(models.Model):
         return f"Comment by {self.owner.user_id} in post {self.post.id}"
 
 class CommentReply(models.Model):
+    class Meta:
+        indexes = [
+            models.Index(fields=['comment', 'create_at', 'id'], name='posts_reply_thread_idx'),
+        ]
     owner = models.ForeignKey("user.User", on_delete=models.CASCADE)
     comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name="replies")
     content = models.TextField(max_length=255)
@@ -127,6 +230,60 @@ class CommentReply(models.Model):
     def __str__(self) -> str:
         return f"Reply by {self.owner.user_id} in comment {self.comment.id}"
 
+class PostLike(models.Model):
+    """
+    One row per user -> post like; replaces the User.liked_posts JSON array.
+    """
+    user = models.ForeignKey("user.User", on_delete=models.CASCADE, related_name="post_likes")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="likes")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="posts_postlike_unique"),
+        ]
+        indexes = [
+            # Recent likes of a user (feed signals)
+            models.Index(fields=["user", "-created_at"], name="posts_postlike_user_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user_id} likes post {self.post_id}"
+
+class CommentLike(models.Model):
+    """
+    One row per user -> comment or user -> reply like; replaces the
+    User.liked_comments / User.liked_comment_replies JSON arrays.
+    Exactly one of `comment` and `reply` is set.
+    """
+    user = models.ForeignKey("user.User", on_delete=models.CASCADE, related_name="comment_likes")
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True, related_name="likes")
+    reply = models.ForeignKey(CommentReply, on_delete=models.CASCADE, null=True, blank=True, related_name="likes")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "comment"],
+                condition=models.Q(comment__isnull=False),
+                name="posts_commentlike_unique_comment",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "reply"],
+                condition=models.Q(reply__isnull=False),
+                name="posts_commentlike_unique_reply",
+            ),
+            models.CheckConstraint(
+                check=models.Q(comment__isnull=False, reply__isnull=True)
+                | models.Q(comment__isnull=True, reply__isnull=False),
+                name="posts_commentlike_one_target",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        target = f"reply {self.reply_id}" if self.reply_id else f"comment {self.comment_id}"
+        return f"{self.user_id} likes {target}"
+
 # --- NEW MODEL: USER COLLECTION (Who claimed what) ---
 class UserCollection(models.Model):
     user = models.ForeignKey(
@@ -244,4 +401,37 @@ class Reputation(models.Model):
 
     def __str__(self):
         src = "check-in" if self.is_checkin else "interaction"
-        return f"{self.given_by.username} → {self.user.username}: +{self.points} rep ({src})"
\ No newline at end of file
+        return f"{self.given_by.username} → {self.user.username}: +{self.points} rep ({src})"
+
+class EventStats(models.Model):
+    """
+    Check-in, tap, mint and reputation rollups for one event, built on first
+    read and then moved incrementally by posts.src.event_analytics.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name="event_stats")
+    nfc_checkins = models.IntegerField(default=0)
+    total_checkins = models.IntegerField(default=0)
+    cnft_claims = models.IntegerField(default=0)
+    irl_taps = models.IntegerField(default=0)
+    total_reputation = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for event {self.post_id}"
+
+
+class EventActivityHour(models.Model):
+    """Hourly (UTC) check-ins and networking taps at an event, next to EventStats."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="activity_hours")
+    hour = models.DateTimeField()
+    checkins = models.IntegerField(default=0)
+    networking = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['hour']
+        constraints = [
+            models.UniqueConstraint(fields=["post", "hour"], name="posts_eventactivityhour_unique"),
+        ]
+
+    def __str__(self):
+        return f"Event {self.post_id} at {self.hour.isoformat()}"
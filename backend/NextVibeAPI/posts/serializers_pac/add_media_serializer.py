@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from ..models import PostsMedia
 from ..tasks import process_media_file  
+from ..src.media_store import register
 
 class PostsMediaSerializer(serializers.ModelSerializer):
     media_url = serializers.SerializerMethodField(read_only=True)
@@ -13,7 +14,12 @@ class PostsMediaSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         media = PostsMedia.objects.create(**validated_data)
-        
+
+        # Registered before processing starts so renditions reach later duplicates
+        digest = self.context.get("content_hash")
+        if digest:
+            register(media, digest, validated_data["file"].size)
+
         process_media_file.delay(media.id)
         
         return media
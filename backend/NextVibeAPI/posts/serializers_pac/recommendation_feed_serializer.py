@@ -1,16 +1,18 @@
 from rest_framework import serializers
 from posts.models import Post, PostsMedia
-from django.conf import settings
+from user.src.user_cards import get_card
 
 
 class MediaItemSerializer(serializers.ModelSerializer):
     media_url     = serializers.SerializerMethodField()
     media_preview = serializers.SerializerMethodField()
     type          = serializers.SerializerMethodField()
+    srcset        = serializers.ReadOnlyField()
+    hls_url       = serializers.ReadOnlyField()
 
     class Meta:
         model  = PostsMedia
-        fields = ['id', 'media_url', 'media_preview', 'type']
+        fields = ['id', 'media_url', 'media_preview', 'type', 'srcset', 'hls_url']
 
     def get_media_url(self, obj):
         if str(obj.file).startswith("https://res.cloudinary.com/"):
@@ -31,7 +33,7 @@ class PostFeedSerializer(serializers.ModelSerializer):
     owner__user_id  = serializers.IntegerField(source='owner.user_id')
     owner__username = serializers.CharField(source='owner.username')
     owner__avatar   = serializers.SerializerMethodField()
-    owner__official = serializers.BooleanField(source='owner.official')
+    owner__official = serializers.SerializerMethodField()
     media           = serializers.SerializerMethodField()
     nft_price       = serializers.SerializerMethodField()
     already_claimed = serializers.SerializerMethodField()
@@ -63,12 +65,16 @@ class PostFeedSerializer(serializers.ModelSerializer):
             'on_event', 'reputation_earned',
         ]
 
+    def _owner_card(self, obj):
+        # Views pass the page's cards in context (one HMGET); fall back per owner
+        card = self.context.get('owner_cards', {}).get(obj.owner_id)
+        return card if card is not None else (get_card(obj.owner_id) or {})
+
     def get_owner__avatar(self, obj):
-        if obj.owner.avatar:
-            if str(obj.owner.avatar).startswith("https://res.cloudinary.com/"):
-                return str(obj.owner.avatar)
-            return f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{obj.owner.avatar}"
-        return None
+        return self._owner_card(obj).get('avatar')
+
+    def get_owner__official(self, obj):
+        return self._owner_card(obj).get('official')
 
     def get_media(self, obj):
         media_items = obj.media.all() if hasattr(obj, 'media') else PostsMedia.objects.filter(post=obj)
@@ -93,16 +99,13 @@ class PostFeedSerializer(serializers.ModelSerializer):
         return getattr(obj.owner, 'wallet_address', None)
 
     def get_owner__is_og(self, obj):
-        og = getattr(obj.owner, 'og_avatar', None)
-        return og is not None
+        return self._owner_card(obj).get('is_og', False)
 
     def get_owner__edition(self, obj):
-        og = getattr(obj.owner, 'og_avatar', None)
-        return og.edition if og is not None else None
+        return self._owner_card(obj).get('og_edition')
 
     def get_owner__invited_count(self, obj):
-        invite_counts = self.context.get('invite_counts', {})
-        return invite_counts.get(obj.owner.user_id, 0)
+        return self._owner_card(obj).get('invited_count', 0)
 
     def get_event_request_status(self, obj):
         return self.context.get('event_request_statuses', {}).get(obj.id)
\ No newline at end of file
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import PostsMedia
+from .src import media_store
+
+
+@receiver(post_delete, sender=PostsMedia)
+def release_media_blob(sender, instance, **kwargs):
+    media_store.release(instance)
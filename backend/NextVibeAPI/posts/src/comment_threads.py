@@ -0,0 +1,120 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from ..models import Comment, CommentReply
+
+COMMENTS_PAGE_SIZE = 20
+REPLIES_PAGE_SIZE = 20
+REPLIES_PREVIEW = 3
+
+ORDER_NEW = "new"
+ORDER_TOP = "top"
+
+
+def _encode_time_cursor(create_at: datetime, row_id: int) -> str:
+    return f"{create_at.isoformat()}_{row_id}"
+
+
+def _decode_time_cursor(cursor: str) -> Tuple[datetime, int]:
+    # An unencoded "+" in the UTC offset arrives as a space
+    create_at, row_id = cursor.replace(" ", "+").rsplit("_", 1)
+    return datetime.fromisoformat(create_at), int(row_id)
+
+
+def comments_page(post_id: int, order: str = ORDER_NEW, cursor: Optional[str] = None) -> Tuple[List[Comment], Optional[str]]:
+    """
+    One keyset page of a post's top-level comments with owners joined.
+    `order` is "new" (newest first) or "top" (most liked first); the cursor
+    is the previous page's `next_cursor` for the same order.
+    Raises ValueError on a malformed cursor.
+    """
+    comments = Comment.objects.filter(post_id=post_id).select_related("owner")
+    if order == ORDER_TOP:
+        comments = comments.order_by("-count_likes", "-id")
+        if cursor:
+            likes, comment_id = (int(part) for part in cursor.split("_", 1))
+            comments = comments.filter(Q(count_likes__lt=likes) | Q(count_likes=likes, id__lt=comment_id))
+    else:
+        comments = comments.order_by("-create_at", "-id")
+        if cursor:
+            create_at, comment_id = _decode_time_cursor(cursor)
+            comments = comments.filter(Q(create_at__lt=create_at) | Q(create_at=create_at, id__lt=comment_id))
+
+    rows = list(comments[:COMMENTS_PAGE_SIZE + 1])
+    if len(rows) <= COMMENTS_PAGE_SIZE:
+        return rows, None
+
+    rows = rows[:COMMENTS_PAGE_SIZE]
+    last = rows[-1]
+    if order == ORDER_TOP:
+        return rows, f"{last.count_likes or 0}_{last.id}"
+    return rows, _encode_time_cursor(last.create_at, last.id)
+
+
+def reply_counts(comment_ids: List[int]) -> Dict[int, int]:
+    """Replies per comment in one aggregate query."""
+    if not comment_ids:
+        return {}
+    return dict(
+        CommentReply.objects
+        .filter(comment_id__in=comment_ids)
+        .order_by()
+        .values("comment_id")
+        .annotate(c=Count("id"))
+        .values_list("comment_id", "c")
+    )
+
+
+def reply_previews(comment_ids: List[int], per_comment: int = REPLIES_PREVIEW) -> Dict[int, List[CommentReply]]:
+    """
+    The first `per_comment` replies of every comment, oldest first, in one
+    windowed query.
+    """
+    if not comment_ids:
+        return {}
+    replies = (
+        CommentReply.objects
+        .filter(comment_id__in=comment_ids)
+        .select_related("owner")
+        .annotate(
+            thread_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F("comment_id")],
+                order_by=[F("create_at").asc(), F("id").asc()],
+            )
+        )
+        .filter(thread_rank__lte=per_comment)
+        .order_by("comment_id", "create_at", "id")
+    )
+    previews: Dict[int, List[CommentReply]] = {}
+    for reply in replies:
+        previews.setdefault(reply.comment_id, []).append(reply)
+    return previews
+
+
+def reply_cursor(reply: CommentReply) -> str:
+    return _encode_time_cursor(reply.create_at, reply.id)
+
+
+def replies_page(comment_id: int, cursor: Optional[str] = None) -> Tuple[List[CommentReply], Optional[str]]:
+    """
+    One keyset page of a comment's replies, oldest first, continuing after
+    `cursor` (a preview's `replies_next_cursor` or a previous `next_cursor`).
+    Raises ValueError on a malformed cursor.
+    """
+    replies = (
+        CommentReply.objects
+        .filter(comment_id=comment_id)
+        .select_related("owner")
+        .order_by("create_at", "id")
+    )
+    if cursor:
+        create_at, reply_id = _decode_time_cursor(cursor)
+        replies = replies.filter(Q(create_at__gt=create_at) | Q(create_at=create_at, id__gt=reply_id))
+
+    rows = list(replies[:REPLIES_PAGE_SIZE + 1])
+    if len(rows) <= REPLIES_PAGE_SIZE:
+        return rows, None
+    rows = rows[:REPLIES_PAGE_SIZE]
+    return rows, reply_cursor(rows[-1])
@@ -0,0 +1,153 @@
+"""
+Event analytics for the organizer dashboard.
+
+Request counters are one conditional aggregate over EventRequest. Check-ins,
+taps, mints and reputation live in EventStats / EventActivityHour: the first
+read builds them with a few aggregates (hourly buckets via TruncHour), and the
+check-in, NFC connect and event-post flows move them with F() afterwards, so a
+dashboard refresh never rescans Reputation.
+"""
+from datetime import datetime, timezone as dt_timezone
+from typing import List, Optional
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncHour
+from django.utils import timezone
+from ..models import EventActivityHour, EventCheckin, EventRequest, EventStats, Reputation, UserCollection
+
+# A tap writes one Reputation row per direction; count the pair once
+TAP_ROWS = Q(is_checkin=False, post__isnull=True, given_by__isnull=False)
+TAP_PAIRS = TAP_ROWS & Q(user_id__lt=F("given_by_id"))
+
+
+def _hour(at: datetime) -> datetime:
+    return at.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def request_counts(post_id: int) -> dict:
+    """Request counters and the accepted attendees' wallet/Web2 split in one query."""
+    approved = Q(status=EventRequest.Status.APPROVED)
+    return EventRequest.objects.filter(post_id=post_id).aggregate(
+        total_requests=Count("id"),
+        accepted_requests=Count("id", filter=approved),
+        rejected_requests=Count("id", filter=Q(status=EventRequest.Status.REJECTED)),
+        mwa_wallet_users=Count("id", filter=approved & Q(user__auth_provider="wallet")),
+    )
+
+
+def rebuild(post_id: int) -> EventStats:
+    """Recomputes an event's rollups from the source tables and stores them."""
+    reputation = Reputation.objects.filter(event_id=post_id).aggregate(
+        irl_taps=Count("id", filter=TAP_PAIRS),
+        total_reputation=Coalesce(Sum("points"), Value(0)),
+    )
+    checkins = (
+        EventCheckin.objects
+        .filter(post_id=post_id)
+        .annotate(claimed=Exists(UserCollection.objects.filter(post_id=post_id, user_id=OuterRef("user_id"))))
+        .aggregate(
+            total_checkins=Count("id"),
+            nfc_checkins=Count("id", filter=Q(is_registered=True)),
+            cnft_claims=Count("id", filter=Q(claimed=True)),
+        )
+    )
+    hours = (
+        Reputation.objects
+        .filter(event_id=post_id, created_at__isnull=False)
+        .annotate(bucket=TruncHour("created_at", tzinfo=dt_timezone.utc))
+        .order_by()
+        .values("bucket")
+        .annotate(
+            checkins=Count("id", filter=Q(is_checkin=True)),
+            networking=Count("id", filter=TAP_PAIRS),
+        )
+    )
+
+    with transaction.atomic():
+        stats, _ = EventStats.objects.update_or_create(post_id=post_id, defaults={**reputation, **checkins})
+        EventActivityHour.objects.filter(post_id=post_id).delete()
+        EventActivityHour.objects.bulk_create([
+            EventActivityHour(post_id=post_id, hour=row["bucket"], checkins=row["checkins"], networking=row["networking"])
+            for row in hours
+            if row["checkins"] or row["networking"]
+        ])
+    return stats
+
+
+def _bump(post_id: int, at: Optional[datetime] = None, checkins: int = 0, networking: int = 0, **counters) -> None:
+    """
+    Moves an event's stored rollups. Events without a row are left alone:
+    their first read builds from the source tables, which already hold this change.
+    """
+    with transaction.atomic():
+        updated = EventStats.objects.filter(post_id=post_id).update(
+            **{field: F(field) + delta for field, delta in counters.items()}
+        )
+        if not updated or not (checkins or networking):
+            return
+        hour, _ = EventActivityHour.objects.get_or_create(post_id=post_id, hour=_hour(at or timezone.now()))
+        EventActivityHour.objects.filter(id=hour.id).update(
+            checkins=F("checkins") + checkins,
+            networking=F("networking") + networking,
+        )
+
+
+def record_claim(post_id: int, new_checkin: bool, registered: bool, points: int = 0) -> None:
+    """A cNFT claim at the door, with its check-in and check-in reputation (0 if already granted)."""
+    counters = {"cnft_claims": 1}
+    if new_checkin:
+        counters["total_checkins"] = 1
+        if registered:
+            counters["nfc_checkins"] = 1
+    if points:
+        counters["total_reputation"] = points
+    _bump(post_id, checkins=1 if points else 0, **counters)
+
+
+def record_tap(post_id: int, points: int) -> None:
+    """One NFC connection between two attendees; `points` is what both sides earned."""
+    _bump(post_id, networking=1, irl_taps=1, total_reputation=points)
+
+
+def record_reputation(post_id: int, points: int) -> None:
+    """Reputation earned at the event that is neither a check-in nor a tap (event posts)."""
+    _bump(post_id, total_reputation=points)
+
+
+def analytics_payload(post_id: int) -> dict:
+    """The EventAnalyticsView body, from the stored rollups plus one request aggregate."""
+    stats = EventStats.objects.filter(post_id=post_id).first() or rebuild(post_id)
+    requests = request_counts(post_id)
+
+    total_users = requests["accepted_requests"]
+    mwa_wallet_users = requests["mwa_wallet_users"]
+    web2_users = total_users - mwa_wallet_users
+
+    hourly_activity: List[dict] = [
+        {
+            "hour": row.hour.isoformat(),
+            "checkins": row.checkins,
+            "networking": row.networking,
+            "total": row.checkins + row.networking,
+        }
+        for row in EventActivityHour.objects.filter(post_id=post_id).order_by("hour")
+    ]
+
+    return {
+        "total_requests": requests["total_requests"],
+        "accepted_requests": requests["accepted_requests"],
+        "rejected_requests": requests["rejected_requests"],
+        "nfc_checkins": stats.nfc_checkins,
+        "total_irl_taps": stats.irl_taps,
+        "total_reputation_earned": stats.total_reputation,
+        "cnft_claims_count": stats.cnft_claims,
+        "cnft_claim_rate": round((stats.cnft_claims / stats.total_checkins * 100), 2) if stats.total_checkins > 0 else 0.0,
+        "ecosystem_stats": {
+            "total_users": total_users,
+            "mwa_wallet_users": mwa_wallet_users,
+            "web2_users": web2_users,
+            "mwa_percentage": round((mwa_wallet_users / total_users * 100), 2) if total_users > 0 else 0.0,
+            "web2_percentage": round((web2_users / total_users * 100), 2) if total_users > 0 else 0.0,
+        },
+        "hourly_activity": hourly_activity,
+    }
@@ -0,0 +1,63 @@
+"""
+Denormalized attendee counters for events (Post.approved_count / pending_count)
+and batched per-user request lookups for event listings.
+
+All EventRequest creation and status changes go through this module so the
+counters move in the same transaction as the request row.
+"""
+from typing import Dict, Iterable, Tuple
+from django.db import transaction
+from django.db.models import F
+from ..models import EventRequest, Post
+
+COUNTER_FIELDS = {
+    EventRequest.Status.PENDING: "pending_count",
+    EventRequest.Status.APPROVED: "approved_count",
+}
+
+
+def _move_counter(post_id: int, status: str, delta: int) -> None:
+    field = COUNTER_FIELDS.get(status)
+    if field:
+        Post.all_objects.filter(id=post_id).update(**{field: F(field) + delta})
+
+
+def create_request(user, post: Post) -> Tuple[EventRequest, bool]:
+    """get_or_create of a pending request; bumps pending_count only when a row was created."""
+    with transaction.atomic():
+        event_request, created = EventRequest.objects.get_or_create(
+            user=user,
+            post=post,
+            defaults={"status": EventRequest.Status.PENDING},
+        )
+        if created:
+            _move_counter(post.id, event_request.status, 1)
+    return event_request, created
+
+
+def set_request_status(request_id: int, new_status: str) -> EventRequest:
+    """
+    Changes a request's status under a row lock and moves the old and new
+    counters with it. A no-op change leaves the counters alone.
+    """
+    with transaction.atomic():
+        event_request = EventRequest.objects.select_for_update().get(id=request_id)
+        old_status = event_request.status
+        if old_status != new_status:
+            event_request.status = new_status
+            event_request.save(update_fields=["status"])
+            _move_counter(event_request.post_id, old_status, -1)
+            _move_counter(event_request.post_id, new_status, 1)
+    return event_request
+
+
+def request_statuses(user_id: int, post_ids: Iterable[int]) -> Dict[int, str]:
+    """The user's request status per event, for a whole page in one IN query."""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return {}
+    return dict(
+        EventRequest.objects
+        .filter(user_id=user_id, post_id__in=post_ids)
+        .values_list("post_id", "status")
+    )
@@ -0,0 +1,251 @@
+"""
+Per-user ranked feed candidates kept in Redis sorted sets.
+
+The full affinity ranking (follows, liked owners, commented owners, searched
+users) runs in `rebuild_feed_candidates` off the request path. Likes, comments,
+follows and post approvals then nudge the sorted set incrementally, and the feed
+view pops one page off its head. Posts the user has been served
+(posts.src.seen_posts) are left out both when the ranking is built and when
+an event lifts posts into it.
+
+Score = summed affinity weight + a fractional recency tiebreak, so a candidate
+never outranks one with a higher affinity just by being newer.
+"""
+import logging
+from typing import Iterable, List, Optional, Tuple
+from django.db.models import Case, IntegerField, Value, When
+from django_redis import get_redis_connection
+from user.models import Follow, HistorySearch
+from ..models import Comment, Post
+from .likes import recently_liked_post_ids
+from . import seen_posts
+
+logger = logging.getLogger(__name__)
+
+FOLLOW_WEIGHT = 100
+LIKED_OWNER_WEIGHT = 75
+COMMENTED_OWNER_WEIGHT = 60
+SEARCHED_WEIGHT = 50
+
+CANDIDATES_LIMIT = 500
+# Ranked rows read per rebuild = rounds * CANDIDATES_LIMIT, enough to get past the seen posts
+REBUILD_SCAN_ROUNDS = 10
+OWNER_RECENT_POSTS = 20
+CANDIDATES_TTL_SECONDS = 6 * 3600
+REBUILD_LOCK_SECONDS = 120
+FANOUT_BATCH_SIZE = 500
+MAX_POP_ROUNDS = 3
+
+
+def candidates_key(user_id: int) -> str:
+    return f"feed:candidates:{user_id}"
+
+
+def built_key(user_id: int) -> str:
+    return f"feed:candidates:{user_id}:built"
+
+
+def rebuild_lock_key(user_id: int) -> str:
+    return f"feed:candidates:{user_id}:rebuilding"
+
+
+def _score(weight: int, create_at) -> float:
+    # create_at.timestamp() < 1e10 until the year 2286, so the tiebreak stays below 1
+    return weight + create_at.timestamp() / 1e10
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def compute_candidates(user_id: int) -> List[Tuple[int, float]]:
+    """
+    The full ranking: every approved post scored by the owner's affinity to `user_id`,
+    minus the posts the user has already been served. The ranking is read in
+    CANDIDATES_LIMIT-sized slices until that many unseen posts are found, so a
+    user who has read their candidates gets the next ones instead of the same
+    seen set again. This is the expensive query the feed used to run on every request.
+    """
+    following_ids = Follow.objects.filter(follower_id=user_id).values("following_id")
+
+    last_5_search = list(
+        HistorySearch.objects
+        .filter(user__user_id=user_id)
+        .values_list('searched_user__user_id', flat=True)[:5]
+    )
+
+    liked_users = list(
+        Post.objects.filter(id__in=recently_liked_post_ids(user_id), is_hide=False)
+        .values_list('owner__user_id', flat=True)
+        .distinct()
+    )
+
+    commented_posts_user = list(
+        Comment.objects
+        .filter(owner__user_id=user_id)
+        .values_list('post__owner__user_id', flat=True)
+        .distinct()[:10]
+    )
+
+    rows = (
+        Post.objects
+        .exclude(owner__user_id=user_id)
+        .filter(moderation_status="approved", is_hide=False)
+        .annotate(
+            relevance_score=
+            Case(When(owner__user_id__in=following_ids, then=Value(FOLLOW_WEIGHT)), default=Value(0), output_field=IntegerField()) +
+            Case(When(owner__user_id__in=liked_users, then=Value(LIKED_OWNER_WEIGHT)), default=Value(0), output_field=IntegerField()) +
+            Case(When(owner__user_id__in=commented_posts_user, then=Value(COMMENTED_OWNER_WEIGHT)), default=Value(0), output_field=IntegerField()) +
+            Case(When(owner__user_id__in=last_5_search, then=Value(SEARCHED_WEIGHT)), default=Value(0), output_field=IntegerField())
+        )
+        .order_by('-relevance_score', '-count_likes', '-create_at', '-id')
+        .values_list('id', 'relevance_score', 'create_at')
+    )
+    candidates: List[Tuple[int, float]] = []
+    for offset in range(0, REBUILD_SCAN_ROUNDS * CANDIDATES_LIMIT, CANDIDATES_LIMIT):
+        chunk = list(rows[offset:offset + CANDIDATES_LIMIT])
+        unseen = set(seen_posts.filter_unseen(user_id, [post_id for post_id, _, _ in chunk]))
+        candidates.extend(
+            (post_id, _score(weight, create_at)) for post_id, weight, create_at in chunk if post_id in unseen
+        )
+        if len(candidates) >= CANDIDATES_LIMIT or len(chunk) < CANDIDATES_LIMIT:
+            break
+    return candidates[:CANDIDATES_LIMIT]
+
+
+def store_candidates(user_id: int, candidates: List[Tuple[int, float]]) -> None:
+    pipe = _redis().pipeline()
+    pipe.delete(candidates_key(user_id))
+    if candidates:
+        pipe.zadd(candidates_key(user_id), {str(post_id): score for post_id, score in candidates})
+        pipe.expire(candidates_key(user_id), CANDIDATES_TTL_SECONDS)
+    pipe.set(built_key(user_id), 1, ex=CANDIDATES_TTL_SECONDS)
+    pipe.delete(rebuild_lock_key(user_id))
+    pipe.execute()
+
+
+def request_rebuild(user_id: int) -> None:
+    """
+    Queues a rebuild unless one is already in flight for this user.
+    """
+    from ..tasks import rebuild_feed_candidates
+    try:
+        if _redis().set(rebuild_lock_key(user_id), 1, nx=True, ex=REBUILD_LOCK_SECONDS):
+            rebuild_feed_candidates.delay(user_id)
+    except Exception as e:
+        logger.error(f"Error queueing feed rebuild for user {user_id}: {e}")
+
+
+def reset(user_id: int) -> None:
+    """Start the feed over from a fresh ranking."""
+    try:
+        _redis().delete(candidates_key(user_id), built_key(user_id))
+    except Exception as e:
+        logger.error(f"Error resetting feed candidates for user {user_id}: {e}")
+
+
+def pop_page(user_id: int, count: int) -> Optional[List[int]]:
+    """
+    Pops up to `count` unseen post ids off the head of the user's ranking.
+    The head of the sorted set is the cursor: served posts leave the set, so
+    posts lifted by later events surface on the next page instead of being
+    stranded behind a score position. Returns None when the ranking has not
+    been built (or has expired); the caller falls back and a rebuild is queued.
+    """
+    try:
+        r = _redis()
+        if not r.exists(built_key(user_id)):
+            request_rebuild(user_id)
+            return None
+
+        page: List[int] = []
+        # The ranking is built from unseen posts; this catches the ones the fallback served since
+        for _ in range(MAX_POP_ROUNDS):
+            popped = r.zpopmax(candidates_key(user_id), count - len(page))
+            if not popped:
+                break
+            page.extend(seen_posts.filter_unseen(user_id, [int(member) for member, _ in popped]))
+            if len(page) >= count:
+                break
+        if len(page) < count:
+            # Ranking ran dry; the fallback fills this page and the next one gets a fresh ranking
+            request_rebuild(user_id)
+        return page
+    except Exception as e:
+        logger.error(f"Error reading feed candidates for user {user_id}: {e}")
+        return None
+
+
+def _built_users(r, user_ids: List[int]) -> List[int]:
+    pipe = r.pipeline(transaction=False)
+    for uid in user_ids:
+        pipe.exists(built_key(uid))
+    return [uid for uid, built in zip(user_ids, pipe.execute()) if built]
+
+
+def _raise_owner_posts(user_id: int, owner_id: int, weight: int) -> None:
+    """
+    Lifts the owner's recent unseen posts to at least `weight` in one user's ranking.
+    Incremental events use max() rather than sums so repeated likes of the same
+    owner don't stack; the next full rebuild restores the summed score.
+    """
+    if user_id == owner_id:
+        return
+    try:
+        r = _redis()
+        if not _built_users(r, [user_id]):
+            return
+        posts = list(
+            Post.objects
+            .filter(owner_id=owner_id, moderation_status="approved", is_hide=False)
+            .order_by('-create_at')
+            .values_list('id', 'create_at')[:OWNER_RECENT_POSTS]
+        )
+        unseen = set(seen_posts.filter_unseen(user_id, [post_id for post_id, _ in posts]))
+        mapping = {str(post_id): _score(weight, create_at) for post_id, create_at in posts if post_id in unseen}
+        if mapping:
+            r.zadd(candidates_key(user_id), mapping, gt=True)
+    except Exception as e:
+        logger.error(f"Error updating feed candidates for user {user_id}: {e}")
+
+
+def on_like(user_id: int, owner_id: int) -> None:
+    _raise_owner_posts(user_id, owner_id, LIKED_OWNER_WEIGHT)
+
+
+def on_comment(user_id: int, owner_id: int) -> None:
+    _raise_owner_posts(user_id, owner_id, COMMENTED_OWNER_WEIGHT)
+
+
+def on_follow(user_id: int, following_id: int) -> None:
+    _raise_owner_posts(user_id, following_id, FOLLOW_WEIGHT)
+
+
+def fan_out_post(post: Post) -> None:
+    """
+    Adds a newly approved post to the rankings of the owner's followers.
+    Only users with a live ranking are touched; everyone else picks the post
+    up on their next rebuild.
+    """
+    score = _score(FOLLOW_WEIGHT, post.create_at)
+    follower_ids = Follow.objects.filter(following_id=post.owner_id).order_by('id').values_list('follower_id', flat=True)
+    try:
+        r = _redis()
+        for batch in _batched(follower_ids.iterator(chunk_size=FANOUT_BATCH_SIZE), FANOUT_BATCH_SIZE):
+            pipe = r.pipeline(transaction=False)
+            for uid in _built_users(r, batch):
+                pipe.zadd(candidates_key(uid), {str(post.id): score}, gt=True)
+            pipe.execute()
+    except Exception as e:
+        logger.error(f"Error fanning out post {post.id} to feeds: {e}")
+
+
+def _batched(iterable: Iterable[int], size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
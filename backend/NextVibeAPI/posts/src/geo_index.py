@@ -0,0 +1,159 @@
+"""
+Viewport index for the Vibemap endpoints.
+
+Every geotagged post stores its decoded lat/lng plus its H3 parent cells at a
+few coarse resolutions (Post.geo_lat / geo_lng / h3_r3 / h3_r5 / h3_r7), kept in
+sync by Post.save(). Map requests filter on those columns instead of decoding
+every post in Python, and dense viewports are answered with per-cell clusters.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+import h3
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, QuerySet
+
+GEO_RESOLUTIONS = (3, 5, 7)
+# Above this many posts in a viewport the map gets clusters instead of points
+MAX_POINTS = 300
+MAX_CELLS = 50
+TILE_CACHE_SECONDS = 60
+
+
+def cell_field(resolution: int) -> str:
+    return f"h3_r{resolution}"
+
+
+def geo_fields(h3_geo: Optional[str]) -> Dict[str, Optional[object]]:
+    """Decoded lat/lng and parent cells for a post's h3_geo (all None if unset or invalid)."""
+    fields: Dict[str, Optional[object]] = {"geo_lat": None, "geo_lng": None}
+    fields.update({cell_field(res): None for res in GEO_RESOLUTIONS})
+    if not h3_geo:
+        return fields
+    try:
+        lat, lng = h3.cell_to_latlng(h3_geo)
+        cell_res = h3.get_resolution(h3_geo)
+    except Exception:
+        return fields
+
+    fields["geo_lat"], fields["geo_lng"] = float(lat), float(lng)
+    for res in GEO_RESOLUTIONS:
+        # A coarse post cell has no parent at a finer resolution; use the cell under its center
+        fields[cell_field(res)] = (
+            h3.cell_to_parent(h3_geo, res) if res <= cell_res else h3.latlng_to_cell(lat, lng, res)
+        )
+    return fields
+
+
+def resolution_for_zoom(zoom: float) -> int:
+    if zoom <= 5:
+        return 3
+    if zoom <= 9:
+        return 5
+    return 7
+
+
+def parse_bbox(raw: str) -> Tuple[float, float, float, float]:
+    """`min_lng,min_lat,max_lng,max_lat`; raises ValueError."""
+    min_lng, min_lat, max_lng, max_lat = (float(part) for part in raw.split(","))
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+        raise ValueError("bbox out of range")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def parse_cells(raw: str) -> Tuple[int, List[str]]:
+    """Comma-separated H3 cells of one indexed resolution; raises ValueError."""
+    cells = [cell.strip() for cell in raw.split(",") if cell.strip()]
+    if not cells or len(cells) > MAX_CELLS:
+        raise ValueError("between 1 and %d cells expected" % MAX_CELLS)
+    resolutions = set()
+    for cell in cells:
+        if not h3.is_valid_cell(cell):
+            raise ValueError(f"invalid cell {cell}")
+        resolutions.add(h3.get_resolution(cell))
+    if len(resolutions) != 1 or next(iter(resolutions)) not in GEO_RESOLUTIONS:
+        raise ValueError(f"cells must share one resolution of {GEO_RESOLUTIONS}")
+    return resolutions.pop(), cells
+
+
+def in_bbox(posts: QuerySet, bbox: Tuple[float, float, float, float]) -> QuerySet:
+    min_lng, min_lat, max_lng, max_lat = bbox
+    posts = posts.filter(geo_lat__gte=min_lat, geo_lat__lte=max_lat)
+    if min_lng <= max_lng:
+        return posts.filter(geo_lng__gte=min_lng, geo_lng__lte=max_lng)
+    # Viewport crosses the antimeridian
+    return posts.filter(Q(geo_lng__gte=min_lng) | Q(geo_lng__lte=max_lng))
+
+
+def in_cells(posts: QuerySet, resolution: int, cells: List[str]) -> QuerySet:
+    return posts.filter(**{f"{cell_field(resolution)}__in": cells})
+
+
+def clusters(posts: QuerySet, resolution: int) -> List[dict]:
+    """One row per H3 cell at `resolution`: post count and the centroid of its posts."""
+    field = cell_field(resolution)
+    rows = (
+        posts.prefetch_related(None).order_by()
+        .values(field)
+        .annotate(count=Count("id"), lat=Avg("geo_lat"), lng=Avg("geo_lng"))
+    )
+    return [
+        {"cell": row[field], "count": row["count"], "lat": row["lat"], "lng": row["lng"]}
+        for row in rows
+    ]
+
+
+def child_resolution(resolution: int) -> Optional[int]:
+    finer = [res for res in GEO_RESOLUTIONS if res > resolution]
+    return finer[0] if finer else None
+
+
+def viewport_payload(posts: QuerySet, cluster_resolution: Optional[int], build_points: Callable[[QuerySet], List[dict]]) -> dict:
+    """
+    Points for a sparse viewport, or clusters at `cluster_resolution` once it holds
+    more than MAX_POINTS posts. Without a cluster resolution points are capped instead.
+    """
+    if cluster_resolution is None:
+        return {"data": build_points(posts[:MAX_POINTS]), "clusters": []}
+    if posts.count() > MAX_POINTS:
+        return {"data": [], "clusters": clusters(posts, cluster_resolution)}
+    return {"data": build_points(posts), "clusters": []}
+
+
+def tiles_payload(kind: str, resolution: int, cells: List[str], posts: QuerySet,
+                  build_points: Callable[[QuerySet], List[dict]]) -> dict:
+    """
+    Merged payload for a set of H3 tiles. Each tile is cached on its own for
+    TILE_CACHE_SECONDS, so overlapping viewports share work.
+    """
+    keys = {cell: f"vibemap:{kind}:{cell}" for cell in cells}
+    cached = cache.get_many(list(keys.values()))
+    merged = {"data": [], "clusters": []}
+    fresh = {}
+    for cell, key in keys.items():
+        payload = cached.get(key)
+        if payload is None:
+            payload = viewport_payload(in_cells(posts, resolution, [cell]), child_resolution(resolution), build_points)
+            fresh[key] = payload
+        merged["data"].extend(payload["data"])
+        merged["clusters"].extend(payload["clusters"])
+    if fresh:
+        cache.set_many(fresh, TILE_CACHE_SECONDS)
+    return merged
+
+
+def map_payload(kind: str, params, posts: QuerySet, build_points: Callable[[QuerySet], List[dict]]) -> dict:
+    """
+    Answers a Vibemap request from `params`:
+      - `cells`: comma-separated H3 cells of one indexed resolution (cached per tile)
+      - `bbox` (+ optional `zoom`): min_lng,min_lat,max_lng,max_lat
+      - neither: every geotagged post, for clients that predate viewports
+    Raises ValueError on malformed parameters.
+    """
+    posts = posts.filter(geo_lat__isnull=False)
+    if params.get("cells"):
+        resolution, cells = parse_cells(params["cells"])
+        return tiles_payload(kind, resolution, cells, posts, build_points)
+    if params.get("bbox"):
+        bbox = parse_bbox(params["bbox"])
+        zoom = float(params.get("zoom", 10))
+        return viewport_payload(in_bbox(posts, bbox), resolution_for_zoom(zoom), build_points)
+    return {"data": build_points(posts), "clusters": []}
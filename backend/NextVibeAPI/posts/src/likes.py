@@ -0,0 +1,83 @@
+from typing import Iterable, List, Tuple
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from ..models import Comment, CommentLike, CommentReply, Post, PostLike
+
+
+def _toggle(ledger, counter_model, target_id: int, **edge) -> bool:
+    """
+    Deletes the ledger row if it exists, inserts it otherwise, and moves the
+    target's count_likes with an F() update in the same transaction.
+    Returns True when the call liked.
+    """
+    with transaction.atomic():
+        deleted, _ = ledger.filter(**edge).delete()
+        if deleted:
+            counter_model.all_objects.filter(id=target_id).update(
+                count_likes=Greatest(F("count_likes") - 1, 0)
+            )
+            return False
+
+        _, created = ledger.get_or_create(**edge)
+        if created:
+            counter_model.all_objects.filter(id=target_id).update(count_likes=F("count_likes") + 1)
+        return True
+
+
+def toggle_post_like(user_id: int, post_id: int) -> bool:
+    return _toggle(PostLike.objects, Post, post_id, user_id=user_id, post_id=post_id)
+
+
+def toggle_comment_like(user_id: int, comment_id: int, is_reply: bool = False) -> bool:
+    if is_reply:
+        return _toggle(CommentLike.objects, CommentReply, comment_id, user_id=user_id, reply_id=comment_id)
+    return _toggle(CommentLike.objects, Comment, comment_id, user_id=user_id, comment_id=comment_id)
+
+
+def recently_liked_post_ids(user_id: int, limit: int = 10) -> List[int]:
+    return list(
+        PostLike.objects
+        .filter(user_id=user_id)
+        .order_by("-created_at")
+        .values_list("post_id", flat=True)[:limit]
+    )
+
+
+def liked_post_ids(user_id: int, post_ids: Iterable[int]) -> List[int]:
+    """
+    The subset of `post_ids` the user has liked, in one IN query.
+    This is the per-page "liked by me" set returned as `liked_posts`.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return []
+    return list(
+        PostLike.objects
+        .filter(user_id=user_id, post_id__in=post_ids)
+        .values_list("post_id", flat=True)
+    )
+
+
+def liked_comment_ids(user_id: int, comment_ids: Iterable[int], reply_ids: Iterable[int]) -> Tuple[List[int], List[int]]:
+    """
+    The subsets of `comment_ids` and `reply_ids` the user has liked, in one query.
+    """
+    comment_ids, reply_ids = list(comment_ids), list(reply_ids)
+    if not comment_ids and not reply_ids:
+        return [], []
+
+    rows = (
+        CommentLike.objects
+        .filter(user_id=user_id)
+        .filter(Q(comment_id__in=comment_ids) | Q(reply_id__in=reply_ids))
+        .values_list("comment_id", "reply_id")
+    )
+    comments, replies = [], []
+    for comment_id, reply_id in rows:
+        if comment_id is not None:
+            comments.append(comment_id)
+        else:
+            replies.append(reply_id)
+    return comments, replies
+
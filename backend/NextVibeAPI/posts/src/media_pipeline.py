@@ -0,0 +1,359 @@
+"""
+Media transcode and rendition stage for posts.tasks.process_media_file.
+
+Objects move between R2 and local disk through boto3 managed transfers
+(chunked, multipart above MULTIPART_THRESHOLD), so worker memory stays at a
+few transfer chunks whatever the upload size. Each worker process reuses one
+S3 client and its connection pool.
+
+Every image (and every video poster) gets a width ladder in JPEG, WebP and,
+where Pillow supports it, AVIF; videos also get an HLS ladder. Keys are
+recorded on PostsMedia.variants:
+    {"image": {"jpeg": {"160": key, ...}, "webp": {...}}, "hls": master_key}
+The original key keeps a 1920px JPEG / 1280px MP4 for clients that predate variants.
+"""
+import os
+import tempfile
+import traceback
+from typing import Dict
+import boto3
+import ffmpeg
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from django.conf import settings
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+CHUNK_SIZE = 8 * 1024 * 1024
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+TRANSFER_CONCURRENCY = 4
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=MULTIPART_THRESHOLD,
+    multipart_chunksize=CHUNK_SIZE,
+    io_chunksize=1024 * 1024,
+    max_concurrency=TRANSFER_CONCURRENCY,
+)
+
+VIDEO_MAX_WIDTH = 1280
+THUMBNAIL_MAX_WIDTH = 640
+
+RENDITION_WIDTHS = (160, 480, 1080, 1920)
+IMAGE_QUALITY = {"jpeg": 85, "webp": 80, "avif": 60}
+IMAGE_EXTENSIONS = {"jpeg": "jpg", "webp": "webp", "avif": "avif"}
+RENDITION_CACHE_CONTROL = 'max-age=31536000'
+
+# The compressed MP4 is remuxed into the top HLS variant; lower ones are encoded in the same pass
+HLS_ENCODED_WIDTHS = (854,)
+HLS_SEGMENT_SECONDS = 4
+HLS_GOP = 48
+HLS_CONTENT_TYPES = {".m3u8": "application/vnd.apple.mpegurl", ".ts": "video/mp2t"}
+
+
+PRESIGNED_READ_SECONDS = 600
+
+# One client per process: clients are thread-safe, but their pools must not cross a fork
+_s3_clients = {}
+
+
+def get_s3_client():
+    """S3 client for R2, shared by everything in this process"""
+    pid = os.getpid()
+    client = _s3_clients.get(pid)
+    if client is None:
+        client = boto3.client(
+            's3',
+            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name='auto',
+            config=Config(signature_version='s3v4', max_pool_connections=TRANSFER_CONCURRENCY * 4)
+        )
+        _s3_clients.clear()
+        _s3_clients[pid] = client
+    return client
+
+
+def download_to_file(s3_client, key: str, path: str) -> None:
+    """Streams an R2 object to `path` in CHUNK_SIZE ranges."""
+    s3_client.download_file(settings.AWS_STORAGE_BUCKET_NAME, key, path, Config=TRANSFER_CONFIG)
+
+
+def upload_file(s3_client, path: str, key: str, content_type: str, cache_control: str) -> None:
+    """Uploads `path` to R2, as a multipart upload once it passes MULTIPART_THRESHOLD."""
+    s3_client.upload_file(
+        path,
+        settings.AWS_STORAGE_BUCKET_NAME,
+        key,
+        ExtraArgs={'ContentType': content_type, 'CacheControl': cache_control},
+        Config=TRANSFER_CONFIG,
+    )
+
+
+def image_formats():
+    # AVIF needs Pillow >= 11.2 built with libavif
+    return [fmt for fmt in IMAGE_QUALITY if fmt != "avif" or features.check("avif")]
+
+
+def rendition_prefix(media) -> str:
+    return f"renditions/{media.id}"
+
+
+def save_variants(media, variants: dict, **fields) -> None:
+    """
+    Merges `variants` into the stored ones under a row lock, so stages of the
+    same media never overwrite each other's keys.
+    """
+    from ..models import PostsMedia
+
+    with transaction.atomic():
+        fresh = PostsMedia.objects.select_for_update().get(id=media.id)
+        fresh.variants = {**(fresh.variants or {}), **variants}
+        for field, value in fields.items():
+            setattr(fresh, field, value)
+        fresh.save(update_fields=['variants', *fields])
+    media.variants = fresh.variants
+    for field, value in fields.items():
+        setattr(media, field, value)
+
+
+def normalize_image(img: Image.Image) -> Image.Image:
+    """Applies EXIF orientation and flattens transparency onto white RGB."""
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+        return background
+    return img.convert('RGB') if img.mode != 'RGB' else img
+
+
+def ladder_widths(width: int):
+    """RENDITION_WIDTHS below `width`, plus `width` itself capped at the top rung."""
+    return sorted({w for w in RENDITION_WIDTHS if w < width} | {min(width, RENDITION_WIDTHS[-1])})
+
+
+def render_image_ladder(s3_client, img: Image.Image, prefix: str, workdir: str) -> Dict[str, Dict[str, str]]:
+    """
+    Encodes `img` at every ladder width and format and uploads it under `prefix`.
+    Returns {format: {width: key}}; local files stay in `workdir` as `<width>.<ext>`.
+    """
+    variants: Dict[str, Dict[str, str]] = {}
+    for width in ladder_widths(img.width):
+        resized = img if width == img.width else img.resize(
+            (width, max(1, round(img.height * width / img.width))), Image.Resampling.LANCZOS
+        )
+        for fmt in image_formats():
+            name = f"{width}.{IMAGE_EXTENSIONS[fmt]}"
+            path = os.path.join(workdir, name)
+            options = {"optimize": True} if fmt == "jpeg" else {}
+            resized.save(path, format=fmt.upper(), quality=IMAGE_QUALITY[fmt], **options)
+            key = f"{prefix}/{name}"
+            upload_file(s3_client, path, key, f"image/{fmt}", RENDITION_CACHE_CONTROL)
+            variants.setdefault(fmt, {})[str(width)] = key
+    return variants
+
+
+def render_image(media) -> None:
+    """
+    Builds an image's rendition ladder and replaces the original with the
+    largest JPEG (max width 1920px, quality 85).
+    """
+    key = media.file.name
+    try:
+        s3_client = get_s3_client()
+        with tempfile.TemporaryDirectory(prefix=f"media_{media.id}_") as workdir:
+            source = os.path.join(workdir, "source" + os.path.splitext(key)[1].lower())
+            download_to_file(s3_client, key, source)
+            original_size_mb = os.path.getsize(source) / (1024 * 1024)
+
+            ladder_dir = os.path.join(workdir, "ladder")
+            os.mkdir(ladder_dir)
+            with Image.open(source) as opened:
+                img = normalize_image(opened)
+            variants = render_image_ladder(s3_client, img, rendition_prefix(media), ladder_dir)
+
+            largest = os.path.join(ladder_dir, f"{max(map(int, variants['jpeg']))}.jpg")
+            compressed_size_mb = os.path.getsize(largest) / (1024 * 1024)
+            upload_file(s3_client, largest, key, 'image/jpeg', 'max-age=86400')
+
+        save_variants(media, {"image": variants})
+        print(f"📊 Image {media.id}: {original_size_mb:.2f}MB -> {compressed_size_mb:.2f}MB, "
+              f"{sum(len(widths) for widths in variants.values())} renditions")
+        print(f"✅ Image {media.id} compressed successfully")
+
+    except Exception as e:
+        print(f"❌ Error compressing image {media.id}: {e}")
+        traceback.print_exc()
+        # The stage runner records the failure so a duplicate can retry the content
+        raise
+
+
+def _hls_output_args(hls_dir: str, name: str) -> dict:
+    return {
+        "format": "hls",
+        "hls_time": HLS_SEGMENT_SECONDS,
+        "hls_playlist_type": "vod",
+        "hls_segment_filename": os.path.join(hls_dir, f"{name}_%03d.ts"),
+    }
+
+
+def _write_master_playlist(hls_dir: str, names) -> str:
+    """Master playlist over the variant playlists in `hls_dir`, with bandwidth measured from their segments."""
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for name in names:
+        playlist = os.path.join(hls_dir, f"{name}.m3u8")
+        info = ffmpeg.probe(playlist)
+        duration = float(info["format"].get("duration") or 0) or 1.0
+        segment_bytes = sum(
+            os.path.getsize(os.path.join(hls_dir, f))
+            for f in os.listdir(hls_dir) if f.startswith(f"{name}_") and f.endswith(".ts")
+        )
+        video = next(st for st in info["streams"] if st["codec_type"] == "video")
+        lines.append(
+            f"#EXT-X-STREAM-INF:BANDWIDTH={int(segment_bytes * 8 / duration)},"
+            f"RESOLUTION={video['width']}x{video['height']}"
+        )
+        lines.append(f"{name}.m3u8")
+    master = os.path.join(hls_dir, "master.m3u8")
+    with open(master, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return master
+
+
+def render_video_poster(media) -> None:
+    """
+    First frame of a video (max width 640) as its `preview` and poster ladder.
+    ffmpeg reads the original through a presigned URL, so only the ranges
+    holding the header and first frame are fetched, not the whole file.
+    """
+    key = media.file.name
+    try:
+        s3_client = get_s3_client()
+        url = s3_client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Key': key},
+            ExpiresIn=PRESIGNED_READ_SECONDS,
+        )
+        with tempfile.TemporaryDirectory(prefix=f"media_{media.id}_") as workdir:
+            thumbnail = os.path.join(workdir, "thumbnail.jpg")
+            poster_dir = os.path.join(workdir, "poster")
+            os.mkdir(poster_dir)
+            try:
+                ffmpeg.input(url) \
+                    .video.filter('scale', f"min({THUMBNAIL_MAX_WIDTH},iw)", -2) \
+                    .output(thumbnail, vframes=1, **{"q:v": 5}) \
+                    .global_args("-loglevel", "error") \
+                    .run(overwrite_output=True, capture_stderr=True)
+            except ffmpeg.Error as e:
+                print(f"❌ FFmpeg error: {e.stderr.decode('utf8')}")
+                raise
+
+            if not os.path.exists(thumbnail) or os.path.getsize(thumbnail) == 0:
+                print(f"❌ Could not read frame from video {media.id}")
+                return
+
+            preview_path = f"previews/{media.id}_preview.jpg"
+            upload_file(s3_client, thumbnail, preview_path, 'image/jpeg', 'max-age=86400')
+            with Image.open(thumbnail) as opened:
+                poster = normalize_image(opened)
+            ladder = render_image_ladder(s3_client, poster, f"{rendition_prefix(media)}/poster", poster_dir)
+
+        save_variants(media, {"image": ladder}, preview=preview_path)
+        print(f"✅ Video thumbnail generated for {media.id}")
+
+    except Exception as e:
+        print(f"❌ Error in render_video_poster {media.id}: {e}")
+        traceback.print_exc()
+        raise
+
+
+def transcode_video(media) -> None:
+    """
+    Compresses a video in place and builds its HLS ladder:
+    - Resize to width 1280 (720p), CRF 23, AAC audio, +faststart
+    - HLS: 854px encoded in the same pass, 1280px remuxed from the MP4
+    One download of the original, one encoding ffmpeg pass. The poster is
+    rendered by the earlier render_video_poster stage.
+    """
+    key = media.file.name
+    print(f"🎥 Starting transcode for video {media.id}...")
+    try:
+        s3_client = get_s3_client()
+        prefix = rendition_prefix(media)
+        with tempfile.TemporaryDirectory(prefix=f"media_{media.id}_") as workdir:
+            source = os.path.join(workdir, "source" + (os.path.splitext(key)[1].lower() or ".mp4"))
+            compressed = os.path.join(workdir, "compressed.mp4")
+            hls_dir = os.path.join(workdir, "hls")
+            os.mkdir(hls_dir)
+
+            download_to_file(s3_client, key, source)
+            original_size_mb = os.path.getsize(source) / (1024 * 1024)
+            has_audio = any(st["codec_type"] == "audio" for st in ffmpeg.probe(source)["streams"])
+
+            input_stream = ffmpeg.input(source)
+            audio = [input_stream.audio] if has_audio else []
+            frames = input_stream.video.split()
+            outputs = [
+                ffmpeg.output(
+                    frames[0].filter('scale', VIDEO_MAX_WIDTH, -2),
+                    *audio,
+                    compressed,
+                    vcodec="libx264",
+                    acodec="aac",
+                    preset="fast",
+                    crf="23",
+                    g=HLS_GOP,
+                    sc_threshold=0,
+                    **{"b:a": "128k", "movflags": "+faststart"}
+                ),
+            ]
+            for i, width in enumerate(HLS_ENCODED_WIDTHS, start=1):
+                outputs.append(ffmpeg.output(
+                    frames[i].filter('scale', f"min({width},iw)", -2),
+                    *audio,
+                    os.path.join(hls_dir, f"{width}.m3u8"),
+                    vcodec="libx264",
+                    acodec="aac",
+                    preset="fast",
+                    crf="26",
+                    g=HLS_GOP,
+                    sc_threshold=0,
+                    **{"b:a": "96k"},
+                    **_hls_output_args(hls_dir, str(width))
+                ))
+            try:
+                ffmpeg.merge_outputs(*outputs) \
+                    .global_args("-loglevel", "error") \
+                    .run(overwrite_output=True, capture_stderr=True)
+                # Top HLS variant is the compressed MP4 itself, re-containerized
+                ffmpeg.input(compressed) \
+                    .output(os.path.join(hls_dir, f"{VIDEO_MAX_WIDTH}.m3u8"), c="copy",
+                            **_hls_output_args(hls_dir, str(VIDEO_MAX_WIDTH))) \
+                    .global_args("-loglevel", "error") \
+                    .run(overwrite_output=True, capture_stderr=True)
+            except ffmpeg.Error as e:
+                print(f"❌ FFmpeg error: {e.stderr.decode('utf8')}")
+                raise
+
+            compressed_size_mb = os.path.getsize(compressed) / (1024 * 1024)
+            saved_mb = original_size_mb - compressed_size_mb
+            saved_percent = (saved_mb / original_size_mb) * 100 if original_size_mb > 0 else 0
+            print(f"📊 Video {media.id}: {original_size_mb:.2f}MB -> {compressed_size_mb:.2f}MB "
+                  f"(saved {saved_mb:.2f}MB, {saved_percent:.1f}%)")
+
+            # Replaces the original
+            upload_file(s3_client, compressed, key, 'video/mp4', 'max-age=31536000')
+
+            master = _write_master_playlist(hls_dir, [str(w) for w in (*HLS_ENCODED_WIDTHS, VIDEO_MAX_WIDTH)])
+            for name in sorted(os.listdir(hls_dir)):
+                upload_file(s3_client, os.path.join(hls_dir, name), f"{prefix}/hls/{name}",
+                            HLS_CONTENT_TYPES[os.path.splitext(name)[1]], RENDITION_CACHE_CONTROL)
+
+        save_variants(media, {"hls": f"{prefix}/hls/{os.path.basename(master)}"})
+        print(f"✅ Video {media.id} transcoded successfully")
+
+    except Exception as e:
+        print(f"❌ Error transcoding video {media.id}: {e}")
+        traceback.print_exc()
+        raise
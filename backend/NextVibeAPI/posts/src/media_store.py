@@ -0,0 +1,186 @@
+"""
+Content-addressed store for post media.
+
+Uploads are hashed (SHA-256) before they are stored. The first upload of some
+content becomes a MediaBlob and is processed as usual; later uploads of the
+same bytes are attached to that blob without another upload, transcode or
+moderation call for their media. Renditions and verdicts are copied to every
+PostsMedia of the blob, and the stored objects are deleted only when the last
+reference goes.
+
+One PostsMedia of an unprocessed blob is its `processing_media`. Attaching,
+completing and releasing all lock the blob row, so a duplicate either sees the
+finished renditions or is updated when processing completes. If the processing
+media is deleted or its processing fails, a waiting duplicate takes over.
+"""
+import hashlib
+from typing import Iterable, List, Optional
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from ..models import MediaBlob, PostsMedia
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(upload) -> str:
+    """SHA-256 of an uploaded file, read in chunks; the file is rewound afterwards."""
+    digest = hashlib.sha256()
+    for chunk in upload.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def _hand_off(blob: MediaBlob, exclude_id: int) -> None:
+    """Makes a waiting duplicate process the blob's content (call with the blob locked)."""
+    from ..tasks import process_media_file
+
+    successor = (
+        PostsMedia.objects
+        .filter(blob_id=blob.id, processed_at__isnull=True)
+        .exclude(id=exclude_id)
+        .order_by("id")
+        .first()
+    )
+    MediaBlob.objects.filter(id=blob.id).update(processing_media=successor)
+    if successor is not None:
+        transaction.on_commit(lambda: process_media_file.delay(successor.id))
+
+
+def attach_existing(digest: str, post_id: int) -> Optional[PostsMedia]:
+    """
+    A new PostsMedia sharing the blob stored for `digest` and whatever renditions
+    it already has, or None if there is no such blob (anymore).
+    """
+    from ..tasks import process_media_file
+
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(sha256=digest).first()
+        if blob is None:
+            return None
+        media = PostsMedia.objects.create(
+            post_id=post_id,
+            file=blob.file_key,
+            preview=blob.preview_key,
+            variants=blob.variants,
+            blob=blob,
+            # Still in flight otherwise; complete() marks it
+            processed_at=timezone.now() if blob.processed else None,
+        )
+        fields = {"ref_count": F("ref_count") + 1}
+        takes_over = not blob.processed and blob.processing_media_id is None
+        if takes_over:
+            # Nobody is processing the content anymore
+            fields["processing_media"] = media
+            transaction.on_commit(lambda: process_media_file.delay(media.id))
+        MediaBlob.objects.filter(id=blob.id).update(**fields)
+    return media
+
+
+def register(media: PostsMedia, digest: str, size: int) -> None:
+    """Records a freshly stored upload as the first holder of its content."""
+    try:
+        with transaction.atomic():
+            blob = MediaBlob.objects.create(
+                sha256=digest, file_key=media.file.name, size=size, ref_count=1, processing_media=media,
+            )
+    except IntegrityError:
+        # The same content was registered concurrently; this copy stays standalone
+        return
+    PostsMedia.objects.filter(id=media.id).update(blob=blob)
+    media.blob = blob
+
+
+def complete(media: PostsMedia, failed: bool = False) -> List[int]:
+    """
+    Ends processing of `media` and returns the ids of posts whose media became
+    processed. On success the renditions go to the blob and all its media, which
+    are marked processed together. A failed run only marks `media` and hands the
+    content to a waiting duplicate.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        blob = (
+            MediaBlob.objects.select_for_update().filter(id=media.blob_id).first()
+            if media.blob_id else None
+        )
+        if blob is None or failed:
+            PostsMedia.objects.filter(id=media.id).update(processed_at=now)
+            if blob is not None and blob.processing_media_id in (None, media.id):
+                _hand_off(blob, exclude_id=media.id)
+            return [media.post_id]
+
+        preview_key = media.preview.name if media.preview else None
+        MediaBlob.objects.filter(id=blob.id).update(
+            processed=True, preview_key=preview_key, variants=media.variants, processing_media=None,
+        )
+        PostsMedia.objects.filter(blob_id=blob.id).exclude(id=media.id).update(
+            preview=preview_key, variants=media.variants,
+        )
+        pending = PostsMedia.objects.filter(Q(blob_id=blob.id) | Q(id=media.id), processed_at__isnull=True)
+        post_ids = set(pending.values_list("post_id", flat=True)) | {media.post_id}
+        pending.update(processed_at=now)
+    return list(post_ids)
+
+
+def stored_keys(blob: MediaBlob) -> List[str]:
+    keys = [blob.file_key]
+    if blob.preview_key:
+        keys.append(blob.preview_key)
+    for widths in (blob.variants or {}).get("image", {}).values():
+        keys.extend(widths.values())
+    return keys
+
+
+def rendition_prefixes(blob: MediaBlob) -> List[str]:
+    """`renditions/<media_id>/` prefixes, which also hold the HLS segments."""
+    keys = stored_keys(blob)
+    if (blob.variants or {}).get("hls"):
+        keys.append(blob.variants["hls"])
+    return sorted({"/".join(key.split("/")[:2]) + "/" for key in keys if key.startswith("renditions/")})
+
+
+def release(media: PostsMedia) -> None:
+    """
+    Drops a deleted PostsMedia's reference. The last one removes the blob and
+    queues deletion of its stored objects once the transaction commits.
+    """
+    if not media.blob_id:
+        return
+    from ..tasks import delete_media_objects
+
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(id=media.blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            MediaBlob.objects.filter(id=blob.id).update(ref_count=F("ref_count") - 1)
+            # The deleted media was processing the content (its FK is already nulled)
+            if not blob.processed and blob.processing_media_id in (None, media.id):
+                _hand_off(blob, exclude_id=media.id)
+            return
+        keys, prefixes = stored_keys(blob), rendition_prefixes(blob)
+        blob.delete()
+        transaction.on_commit(lambda: delete_media_objects.delay(keys, prefixes))
+
+
+def unmoderated(media_items: Iterable[PostsMedia]) -> List[PostsMedia]:
+    """Media whose content has no passing verdict yet, i.e. what still needs a moderation call."""
+    return [m for m in media_items if not (m.blob_id and m.blob.moderation_passed)]
+
+
+def known_failures(media_items: Iterable[PostsMedia]) -> List[PostsMedia]:
+    return [m for m in media_items if m.blob_id and m.blob.moderation_passed is False]
+
+
+def record_verdicts(sent_media: List[PostsMedia], file_results: list) -> None:
+    """
+    Stores per-file verdicts on the media's blobs. The moderation service
+    answers files in the order of media_urls; a length mismatch records nothing.
+    """
+    if not sent_media or len(file_results) != len(sent_media):
+        return
+    for media, result in zip(sent_media, file_results):
+        if media.blob_id:
+            MediaBlob.objects.filter(id=media.blob_id).update(moderation_passed=bool(result.get("passed", False)))
@@ -0,0 +1,115 @@
+"""
+Post-level media DAG and per-stage timing for the media worker pool.
+
+Media stages run on their own queues (CELERY_TASK_ROUTES): `media_fast` for
+images, video posters and bookkeeping, `media_video` for full transcodes, so
+images never wait behind a transcode and neither waits behind moderation.
+A video runs poster -> transcode -> finish, an image render -> finish.
+
+`finish` marks a media item (and any duplicates sharing its blob) processed;
+if one of its stages failed, a duplicate waiting on the same content retries.
+A post is moderated exactly once: when it has been finalized by the client
+and none of its media is still processing, whichever of the two happens last
+claims `moderation_queued` and queues the moderation task.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict
+from django.db import transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+from ..models import Post, PostsMedia
+from . import media_store
+
+logger = logging.getLogger(__name__)
+
+STAGE_SAMPLES_KEY = "media:stage_ms:{stage}"
+STAGE_SAMPLES = 1000
+FAILED_KEY = "media:failed:{media_id}"
+FAILED_TTL = 24 * 60 * 60
+
+
+@contextmanager
+def timed(stage: str, media_id: int):
+    """Records how long a stage took; the last STAGE_SAMPLES per stage are kept in Redis."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        print(f"⏱️ Media {media_id} {stage}: {elapsed_ms}ms")
+        record_timing(stage, elapsed_ms)
+
+
+def record_timing(stage: str, elapsed_ms: int) -> None:
+    """Adds one sample to a stage's Redis list (see stage_metrics)."""
+    try:
+        key = STAGE_SAMPLES_KEY.format(stage=stage)
+        pipe = get_redis_connection("default").pipeline()
+        pipe.lpush(key, elapsed_ms)
+        pipe.ltrim(key, 0, STAGE_SAMPLES - 1)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error recording {stage} timing: {e}")
+
+
+def stage_metrics(stages) -> Dict[str, dict]:
+    """count / avg / p50 / p95 / max (ms) over each stage's recent samples."""
+    r = get_redis_connection("default")
+    metrics = {}
+    for stage in stages:
+        samples = sorted(int(v) for v in r.lrange(STAGE_SAMPLES_KEY.format(stage=stage), 0, -1))
+        if not samples:
+            metrics[stage] = {"count": 0}
+            continue
+        metrics[stage] = {
+            "count": len(samples),
+            "avg_ms": sum(samples) // len(samples),
+            "p50_ms": samples[len(samples) // 2],
+            "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max_ms": samples[-1],
+        }
+    return metrics
+
+
+def mark_failed(media_id: int) -> None:
+    """Remembers that a stage of this media failed, for its finish stage."""
+    try:
+        get_redis_connection("default").set(FAILED_KEY.format(media_id=media_id), 1, ex=FAILED_TTL)
+    except Exception as e:
+        logger.error(f"Error recording media failure: {e}")
+
+
+def _take_failed(media_id: int) -> bool:
+    try:
+        r = get_redis_connection("default")
+        key = FAILED_KEY.format(media_id=media_id)
+        pipe = r.pipeline()
+        pipe.get(key)
+        pipe.delete(key)
+        return bool(pipe.execute()[0])
+    except Exception as e:
+        logger.error(f"Error reading media failure: {e}")
+        return False
+
+
+def finish(media: PostsMedia) -> None:
+    """Publishes renditions to the blob's duplicates and marks them all processed."""
+    for post_id in media_store.complete(media, failed=_take_failed(media.id)):
+        maybe_queue_moderation(post_id)
+
+
+def maybe_queue_moderation(post_id: int) -> bool:
+    """Queues moderation if the post is finalized, fully processed and not queued yet."""
+    from ..tasks import send_post_for_moderation
+
+    if PostsMedia.objects.filter(post_id=post_id, processed_at__isnull=True).exists():
+        return False
+    with transaction.atomic():
+        claimed = Post.all_objects.filter(
+            id=post_id, media_finalized=True, moderation_queued=False,
+        ).update(moderation_queued=True, moderation_queued_at=timezone.now())
+        if claimed:
+            transaction.on_commit(lambda: send_post_for_moderation.delay(post_id))
+    return bool(claimed)
@@ -0,0 +1,293 @@
+"""
+Client for the Go moderation service.
+
+Posts ready for moderation are queued in a Redis sorted set (scored by the time
+they were queued) and flushed in batches to /moderation/batch, which answers 202
+right away and delivers each post's result to ModerationCallbackView, so no
+worker waits on the moderation itself. A post that gets no result within
+RESUBMIT_AFTER_SECONDS is queued again.
+
+Verdicts are cached: media by content hash (MediaBlob.moderation_passed, see
+posts.src.media_store), text by the SHA-256 of its normalized form. A post whose
+text and media all have verdicts is decided without a call; otherwise only the
+unknown parts are sent.
+
+Queue lag (queued -> submitted or decided) and latency (submitted -> result)
+are recorded as media_worker timings, see `manage.py moderation_metrics`.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+from django_redis import get_redis_connection
+from user.models import Notification
+from ..models import Post, PostsMedia
+from . import media_store
+from .media_worker import record_timing
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+MODERATION_URL = "http://127.0.0.1:8080/moderation"
+BATCH_URL = f"{MODERATION_URL}/batch"
+SUBMIT_TIMEOUT = 5
+
+QUEUE_KEY = "moderation:queue"
+INFLIGHT_KEY = "moderation:inflight"
+SUBMISSION_KEY = "moderation:submission:{post_id}"
+SUBMISSION_TTL = 24 * 60 * 60
+TEXT_VERDICT_KEY = "moderation:text:{digest}"
+TEXT_VERDICT_TTL = 30 * 24 * 60 * 60
+
+BATCH_SIZE = 50
+# A lone post waits this long for company before its batch is sent
+BATCH_WINDOW_SECONDS = 5
+RESUBMIT_AFTER_SECONDS = 5 * 60
+
+LAG_STAGE = "moderation_lag"
+LATENCY_STAGE = "moderation_latency"
+MODERATION_STAGES = (LAG_STAGE, LATENCY_STAGE)
+
+
+def text_hash(content: str) -> str:
+    """SHA-256 of the text with whitespace runs collapsed."""
+    return hashlib.sha256(" ".join(content.split()).encode()).hexdigest()
+
+
+def cached_text_verdict(content: str) -> Optional[dict]:
+    """The stored `text` result for this text; empty text always passes."""
+    if not content.strip():
+        return {"passed": True, "details": {"categories": ["universal"]}}
+    return cache.get(TEXT_VERDICT_KEY.format(digest=text_hash(content)))
+
+
+def cache_text_verdict(content: str, text_result: dict) -> None:
+    if not content.strip() or "passed" not in text_result:
+        return
+    cache.set(
+        TEXT_VERDICT_KEY.format(digest=text_hash(content)),
+        {"passed": bool(text_result["passed"]), "details": {"categories": _categories(text_result)}},
+        TEXT_VERDICT_TTL,
+    )
+
+
+def _categories(text_result: dict) -> List[str]:
+    return (text_result.get("details") or {}).get("categories") or ["universal"]
+
+
+def enqueue(post_id: int) -> None:
+    """Queues a post for the next batch. Raises on Redis errors so the caller can retry."""
+    r = get_redis_connection("default")
+    added = r.zadd(QUEUE_KEY, {post_id: time.time()}, nx=True)
+    size = r.zcard(QUEUE_KEY)
+    if size >= BATCH_SIZE or (added and size == 1):
+        from ..tasks import flush_moderation_queue
+
+        flush_moderation_queue.apply_async(countdown=0 if size >= BATCH_SIZE else BATCH_WINDOW_SECONDS)
+
+
+def _media_url(media: PostsMedia) -> str:
+    url = media.file.url if hasattr(media.file, "url") else str(media.file)
+    if not url.startswith("http"):
+        from django.conf import settings
+        url = f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{url}"
+    return url
+
+
+def resolve_locally(post: Post, media_items: List[PostsMedia]) -> Optional[dict]:
+    """A full result when cached verdicts already decide the post, else None."""
+    known_failed = media_store.known_failures(media_items)
+    if known_failed:
+        return {
+            "passed": False,
+            "text": {"passed": True},
+            "files": [{"filename": os.path.basename(m.file.name), "passed": False} for m in known_failed],
+        }
+    text = cached_text_verdict(post.about or "")
+    if text is not None and not text["passed"]:
+        return {"passed": False, "text": text, "files": []}
+    if text is not None and not media_store.unmoderated(media_items):
+        return {"passed": True, "text": text, "files": []}
+    return None
+
+
+def build_request(post: Post, media_items: List[PostsMedia]) -> Tuple[dict, dict]:
+    """The service payload (text only if uncached, media only if unknown) and what the callback needs."""
+    to_send = media_store.unmoderated(media_items)
+    text_cached = cached_text_verdict(post.about or "") is not None
+    payload = {
+        "id": str(post.id),
+        "content": "" if text_cached else (post.about or ""),
+        "media_urls": [_media_url(m) for m in to_send],
+    }
+    submission = {"media_ids": [m.id for m in to_send], "text_cached": text_cached}
+    return payload, submission
+
+
+def _requeue_stale(r) -> None:
+    """Posts submitted long ago without a result go back to the queue."""
+    stale = r.zrangebyscore(INFLIGHT_KEY, 0, time.time() - RESUBMIT_AFTER_SECONDS)
+    for member in stale:
+        if not r.zrem(INFLIGHT_KEY, member):
+            continue
+        raw = r.get(SUBMISSION_KEY.format(post_id=int(member)))
+        queued_at = json.loads(raw)["queued_at"] if raw else time.time()
+        r.zadd(QUEUE_KEY, {member: queued_at}, nx=True)
+    if stale:
+        print(f"[MODERATION] Resubmitting {len(stale)} posts without a result")
+
+
+def flush(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Takes up to `batch_size` queued posts, decides those the caches already
+    cover and submits the rest in one request. Returns the number submitted;
+    a failed submission puts the posts back for the next flush.
+    """
+    r = get_redis_connection("default")
+    _requeue_stale(r)
+    entries = r.zpopmin(QUEUE_KEY, batch_size)
+    if not entries:
+        return 0
+    queued_at = {int(member): score for member, score in entries}
+    posts = Post.objects.select_related("owner").prefetch_related("media__blob").in_bulk(list(queued_at))
+
+    payloads = []
+    now = time.time()
+    pipe = r.pipeline()
+    for post_id, post in posts.items():
+        if post.moderation_status != "pending":
+            continue
+        media_items = list(post.media.all())
+        result = resolve_locally(post, media_items)
+        if result is not None:
+            record_timing(LAG_STAGE, int((now - queued_at[post_id]) * 1000))
+            apply_result(post, result)
+            continue
+        payload, submission = build_request(post, media_items)
+        submission.update(queued_at=queued_at[post_id], submitted_at=now)
+        # Stored before sending: the result may arrive before the request returns
+        pipe.set(SUBMISSION_KEY.format(post_id=post_id), json.dumps(submission), ex=SUBMISSION_TTL)
+        pipe.zadd(INFLIGHT_KEY, {post_id: now})
+        payloads.append(payload)
+    if not payloads:
+        return 0
+    pipe.execute()
+
+    try:
+        resp = requests.post(BATCH_URL, json={"posts": payloads}, timeout=SUBMIT_TIMEOUT)
+        resp.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error submitting moderation batch: {e}")
+        post_ids = [int(p["id"]) for p in payloads]
+        pipe = r.pipeline()
+        pipe.zrem(INFLIGHT_KEY, *post_ids)
+        pipe.zadd(QUEUE_KEY, {post_id: queued_at[post_id] for post_id in post_ids})
+        pipe.execute()
+        return 0
+
+    for payload in payloads:
+        record_timing(LAG_STAGE, int((now - queued_at[int(payload["id"])]) * 1000))
+    print(f"[MODERATION] Submitted batch of {len(payloads)} posts")
+    return len(payloads)
+
+
+def take_submission(post_id: int) -> Optional[dict]:
+    r = get_redis_connection("default")
+    key = SUBMISSION_KEY.format(post_id=post_id)
+    pipe = r.pipeline()
+    pipe.get(key)
+    pipe.delete(key)
+    pipe.zrem(INFLIGHT_KEY, post_id)
+    raw = pipe.execute()[0]
+    return json.loads(raw) if raw else None
+
+
+def handle_result(post: Post, result: dict) -> bool:
+    """A result from the service: updates the verdict caches, then the post."""
+    try:
+        submission = take_submission(post.id)
+    except Exception as e:
+        logger.error(f"Error reading moderation submission: {e}")
+        submission = None
+
+    if submission is None:
+        # Submitted by an older client: the unmoderated media were sent, in order
+        sent_media = media_store.unmoderated(post.media.select_related("blob"))
+        text_cached = False
+    else:
+        record_timing(LATENCY_STAGE, int((time.time() - submission["submitted_at"]) * 1000))
+        by_id = PostsMedia.objects.select_related("blob").in_bulk(submission["media_ids"])
+        sent_media = [by_id[media_id] for media_id in submission["media_ids"] if media_id in by_id]
+        text_cached = submission["text_cached"]
+
+    media_store.record_verdicts(sent_media, result.get("files", []))
+    if text_cached:
+        result = {**result, "text": cached_text_verdict(post.about or "") or result.get("text", {})}
+    else:
+        cache_text_verdict(post.about or "", result.get("text", {}))
+    return apply_result(post, result)
+
+
+def _rejection_reason(result: dict) -> str:
+    if result.get("reason"):
+        return result["reason"]
+    reasons = []
+    if not result.get("text", {}).get("passed", True):
+        reasons.append("inappropriate text content")
+    for file_result in result.get("files", []):
+        if not file_result.get("passed", True):
+            reasons.append(f"inappropriate media: {file_result.get('filename', 'media')}")
+    return ", ".join(reasons) if reasons else "violated community guidelines"
+
+
+def apply_result(post: Post, result: dict) -> bool:
+    """
+    Moves a pending post to approved/denied and runs the side effects once.
+    Returns False if the post was already decided (e.g. a repeated callback).
+    """
+    from ..tasks import fan_out_post_to_feeds
+
+    text_result = result.get("text", {})
+    passed = bool(text_result.get("passed", False)) and all(
+        f.get("passed", False) for f in result.get("files", [])
+    )
+    moderation_status = "approved" if passed else "denied"
+    claimed = Post.all_objects.filter(id=post.id, moderation_status="pending").update(
+        moderation_status=moderation_status,
+        is_approved=passed,
+        categories=_categories(text_result),
+    )
+    if not claimed:
+        return False
+    post.moderation_status, post.is_approved = moderation_status, passed
+    print(f"[MODERATION] Post {post.id} status: {moderation_status}")
+
+    if passed:
+        User.objects.filter(user_id=post.owner_id).update(post_count=F("post_count") + 1)
+        fan_out_post_to_feeds.delay(post.id)
+
+    if not Notification.objects.filter(recipient_id=post.owner_id, post=post).exists():
+        Notification.objects.create(
+            recipient_id=post.owner_id,
+            post=post,
+            notification_type="moderation_success" if passed else "moderation_fail",
+            text_preview="Post published successfully" if passed
+            else f"Your post was rejected: {_rejection_reason(result)}",
+        )
+    return True
+
+
+def queue_stats() -> Dict[str, int]:
+    r = get_redis_connection("default")
+    oldest = r.zrange(QUEUE_KEY, 0, 0, withscores=True)
+    return {
+        "queued": r.zcard(QUEUE_KEY),
+        "in_flight": r.zcard(INFLIGHT_KEY),
+        "oldest_queued_s": int(time.time() - oldest[0][1]) if oldest else 0,
+    }
@@ -0,0 +1,93 @@
+"""
+Which feed posts a user has already been served.
+
+Each user gets one Bloom filter per time window, stored as a Redis bitmap
+(SETBIT/GETBIT). A post counts as seen if every one of its bits is set in any
+live window; windows expire on their own, so old posts can come back after
+WINDOWS * WINDOW_SECONDS instead of the whole history being dropped at once.
+At 2**16 bits and 5 hashes a window stays at 8 KB and keeps the false-positive
+rate under 0.01% up to ~2000 posts.
+"""
+import hashlib
+import logging
+import time
+from typing import Iterable, List
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+FILTER_BITS = 1 << 16
+HASH_COUNT = 5
+WINDOW_SECONDS = 2 * 24 * 3600
+WINDOWS = 4
+
+
+def _window_keys(user_id: int) -> List[str]:
+    current = int(time.time() // WINDOW_SECONDS)
+    return [f"feed:seen:{user_id}:{window}" for window in range(current, current - WINDOWS, -1)]
+
+
+def _offsets(post_id: int) -> List[int]:
+    # Kirsch-Mitzenmacher double hashing: two 64-bit halves of one digest
+    digest = hashlib.blake2b(str(post_id).encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "big")
+    h2 = int.from_bytes(digest[8:], "big") | 1
+    return [(h1 + i * h2) % FILTER_BITS for i in range(HASH_COUNT)]
+
+
+def filter_unseen(user_id: int, post_ids: Iterable[int]) -> List[int]:
+    """
+    `post_ids` minus the ones the user has been served, order kept, in one
+    pipelined round trip. Returns everything if Redis is down.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return []
+    keys = _window_keys(user_id)
+    try:
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        for post_id in post_ids:
+            offsets = _offsets(post_id)
+            for key in keys:
+                for offset in offsets:
+                    pipe.getbit(key, offset)
+        bits = pipe.execute()
+    except Exception as e:
+        logger.error(f"Error reading seen posts for user {user_id}: {e}")
+        return post_ids
+
+    per_window = HASH_COUNT
+    per_post = HASH_COUNT * len(keys)
+    unseen = []
+    for i, post_id in enumerate(post_ids):
+        post_bits = bits[i * per_post:(i + 1) * per_post]
+        seen = any(
+            all(post_bits[w * per_window:(w + 1) * per_window])
+            for w in range(len(keys))
+        )
+        if not seen:
+            unseen.append(post_id)
+    return unseen
+
+
+def mark_seen(user_id: int, post_ids: Iterable[int]) -> None:
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    key = _window_keys(user_id)[0]
+    try:
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        for post_id in post_ids:
+            for offset in _offsets(post_id):
+                pipe.setbit(key, offset, 1)
+        pipe.expire(key, WINDOW_SECONDS * WINDOWS)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error storing seen posts for user {user_id}: {e}")
+
+
+def reset(user_id: int) -> None:
+    try:
+        get_redis_connection("default").delete(*_window_keys(user_id))
+    except Exception as e:
+        logger.error(f"Error resetting seen posts for user {user_id}: {e}")
@@ -1,37 +1,22 @@
-from celery import shared_task
-from PIL import Image, ImageOps
-import cv2
+from celery import chain, shared_task
 import os
-from io import BytesIO
-from .models import PostsMedia, Post
-import requests
+from .models import PostsMedia, Post, PopularPost
 from django.contrib.auth import get_user_model
-import boto3
-import ffmpeg  
-from django.core.files.temp import NamedTemporaryFile
 
 from django.conf import settings
 from django.utils import timezone
+from django.db import transaction
+from django.db.models import Q
 from datetime import timedelta
 
 # Image generation 
 from posts.src.generate_image import generate
+from posts.src.media_pipeline import get_s3_client, render_image, render_video_poster, transcode_video
+from posts.src import media_worker, moderation
 
-GO_MODERATION_URL = "http://127.0.0.1:8080/moderation"
 User = get_user_model()
 
 
-def get_s3_client():
-    """Create S3 cliend for R2"""
-    return boto3.client(
-        's3',
-        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        region_name='auto',
-        config=boto3.session.Config(signature_version='s3v4')
-    )
-
 # Task for image generation
 @shared_task(bind=True)
 def generate_image_task(self, prompt: str):
@@ -43,379 +28,179 @@ def generate_image_task(self, prompt: str):
         raise e
 
 
+VIDEO_EXTENSIONS = ['.mp4', '.mov', '.avi', '.mkv', '.webm']
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
+MEDIA_STAGES = ("image", "video_poster", "video_transcode", "finish")
+MEDIA_PROCESSING_GRACE = timedelta(hours=1)
+MODERATION_VERDICT_GRACE = timedelta(hours=1)
+
+
 @shared_task
 def process_media_file(media_id):
     """
-    Handle media file: compresses image/video or generate preview
+    Handle media file: starts its stage chain on the media queues
+    (see posts.src.media_worker)
     """
     try:
         media = PostsMedia.objects.get(id=media_id)
-        file_path = media.file.name
-        file_extension = os.path.splitext(file_path)[1].lower()
-        
-        video_extensions = ['.mp4', '.mov', '.avi', '.mkv', '.webm']
-        image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
-        
-        if file_extension in video_extensions:
-            compress_video(media)
-            generate_video_thumbnail(media)
-        elif file_extension in image_extensions:
-            compress_image(media)
-            
-        return f"Media {media_id} processed successfully"
     except PostsMedia.DoesNotExist:
         return f"Media {media_id} not found"
-    except Exception as e:
-        print(f"Error processing media {media_id}: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return f"Error processing media {media_id}: {str(e)}"
 
+    file_extension = os.path.splitext(media.file.name)[1].lower()
+    if file_extension in VIDEO_EXTENSIONS:
+        stages = [render_video_poster_stage.si(media_id), transcode_video_stage.si(media_id)]
+    elif file_extension in IMAGE_EXTENSIONS:
+        stages = [render_image_stage.si(media_id)]
+    else:
+        stages = []
+    chain(*stages, finish_media_stage.si(media_id)).apply_async()
+    return f"Media {media_id} queued for processing"
 
-def compress_video(media):
-    """
-    Compress video using FFmpeg:
-    - Resize to max width 1280 (720p)
-    - CRF 23 (Good balance for social media)
-    - AAC audio
-    - movflags=+faststart (Starts playing immediately on web)
-    """
-    temp_input = None
-    temp_output = None
-    
-    try:
-        print(f"🎥 Starting compression for video {media.id}...")
-        
-        # 1. Download original video to temp file
-        video_content = media.file.read()
-        media.file.seek(0)
-        
-        temp_input = NamedTemporaryFile(delete=False, suffix='.mp4')
-        temp_input.write(video_content)
-        temp_input.flush()
-        temp_input.close()
-        
-        # Get original size in MB
-        original_size = os.path.getsize(temp_input.name)
-        original_size_mb = original_size / (1024 * 1024)
-        
-        # Prepare output temp file
-        temp_output = NamedTemporaryFile(delete=False, suffix='.mp4')
-        temp_output.close() # We just need the name
-        
-        # 2. Run FFmpeg compression
-        try:
-            input_stream = ffmpeg.input(temp_input.name)
-
-            video = (
-                input_stream.video
-                .filter('scale', 1280, -2)
-            )
-
-            audio = input_stream.audio
-            
-            stream = ffmpeg.output(
-                video, 
-                audio,  
-                temp_output.name,
-                vcodec="libx264",
-                acodec="aac",
-                preset="fast",
-                crf="23",
-                **{
-                    "b:a": "128k",
-                    "movflags": "+faststart",
-                    "loglevel": "error"
-                }
-            )
-
-            
-            ffmpeg.run(stream, overwrite_output=True)
-            
-        except ffmpeg.Error as e:
-            print(f"❌ FFmpeg error: {e.stderr.decode('utf8')}")
-            raise e
-
-        # 3. Check results and upload
-        compressed_size = os.path.getsize(temp_output.name)
-        compressed_size_mb = compressed_size / (1024 * 1024)
-        
-        # Calculate savings
-        saved_mb = original_size_mb - compressed_size_mb
-        saved_percent = (saved_mb / original_size_mb) * 100 if original_size_mb > 0 else 0
-        
-        print(f"📊 Video {media.id} Compression Results:")
-        print(f"   Before: {original_size_mb:.2f} MB")
-        print(f"   After:  {compressed_size_mb:.2f} MB")
-        print(f"   Saved:  {saved_mb:.2f} MB ({saved_percent:.1f}%)")
-
-        # Upload back to S3/R2 (replacing original)
-        s3_client = get_s3_client()
-        with open(temp_output.name, 'rb') as data:
-            s3_client.put_object(
-                Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-                Key=media.file.name,
-                Body=data,
-                ContentType='video/mp4',
-                CacheControl='max-age=31536000'
-            )
-            
-        print(f"✅ Compressed video uploaded successfully")
 
+def _run_stage(stage, media_id, handler):
+    try:
+        media = PostsMedia.objects.get(id=media_id)
+    except PostsMedia.DoesNotExist:
+        return f"Media {media_id} not found"
+    try:
+        with media_worker.timed(stage, media_id):
+            handler(media)
     except Exception as e:
-        print(f"❌ Error compressing video {media.id}: {e}")
+        # Keep the chain going: finish must still run so the post gets moderated
+        print(f"Error processing media {media_id} ({stage}): {str(e)}")
+        media_worker.mark_failed(media_id)
         import traceback
         traceback.print_exc()
-        
-    finally:
-        # Cleanup
-        if temp_input and os.path.exists(temp_input.name):
-            os.unlink(temp_input.name)
-        if temp_output and os.path.exists(temp_output.name):
-            os.unlink(temp_output.name)
+        return f"Error processing media {media_id} ({stage}): {str(e)}"
+    return f"Media {media_id} {stage} done"
+
+
+@shared_task
+def render_image_stage(media_id):
+    return _run_stage("image", media_id, render_image)
 
 
-def compress_image(media):
+@shared_task
+def render_video_poster_stage(media_id):
+    return _run_stage("video_poster", media_id, render_video_poster)
+
+
+@shared_task
+def transcode_video_stage(media_id):
+    return _run_stage("video_transcode", media_id, transcode_video)
+
+
+@shared_task
+def finish_media_stage(media_id):
+    return _run_stage("finish", media_id, media_worker.finish)
+
+
+@shared_task
+def delete_media_objects(keys, prefixes=()):
     """
-    Compress image to max width 1920px with 85% quality
+    Removes a released MediaBlob's objects from R2: the given keys plus
+    everything under its rendition prefixes.
     """
-    try:
-        # Read file from R2
-        file_content = media.file.read()
-        media.file.seek(0)
-        
-        img = Image.open(BytesIO(file_content))
-        
-        # Calculate original size roughly
-        original_size_mb = len(file_content) / (1024 * 1024)
-
-        # Fix orientation
-        img = ImageOps.exif_transpose(img)
-        
-        # Convert RGBA to RGB 
-        if img.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-            img = background
-        
-        # Resize if more 1920px
-        max_width = 1920
-        if img.width > max_width:
-            ratio = max_width / img.width
-            new_height = int(img.height * ratio)
-            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Save compressed image
-        output = BytesIO()
-        img.save(output, format='JPEG', quality=85, optimize=True)
-        output.seek(0)
-        
-        compressed_size_mb = output.getbuffer().nbytes / (1024 * 1024)
-        
-        print(f"📊 Image {media.id}: {original_size_mb:.2f}MB -> {compressed_size_mb:.2f}MB")
-        
-        s3_client = get_s3_client()
-        file_name = media.file.name
-        
-        s3_client.put_object(
-            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-            Key=file_name,
-            Body=output.getvalue(),
-            ContentType='image/jpeg',
-            CacheControl='max-age=86400'
+    s3_client = get_s3_client()
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    keys = list(keys)
+    for prefix in prefixes:
+        for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+            keys.extend(obj['Key'] for obj in page.get('Contents', []))
+    keys = list(dict.fromkeys(keys))
+    # DeleteObjects takes at most 1000 keys
+    for i in range(0, len(keys), 1000):
+        s3_client.delete_objects(
+            Bucket=bucket,
+            Delete={'Objects': [{'Key': key} for key in keys[i:i + 1000]], 'Quiet': True},
         )
-        
-        print(f"✅ Image {media.id} compressed successfully")
-        
-    except Exception as e:
-        print(f"❌ Error compressing image {media.id}: {e}")
-        import traceback
-        traceback.print_exc()
+    print(f"🗑️ Deleted {len(keys)} media objects")
 
 
-def generate_video_thumbnail(media):
+@shared_task(bind=True, max_retries=3)
+def send_post_for_moderation(self, post_id):
     """
-    Generate thumbnail from first video frame 
+    Queue post for the next moderation batch (see posts.src.moderation)
     """
     try:
-        # NOTE: We can optimize this by passing the file path if it was just compressed locally,
-        # but for simplicity and robustness we download (it might be fast on server network)
-        
-        print(f"📥 Downloading video {media.id} for thumbnail...")
-        
-        video_content = media.file.read()
-        media.file.seek(0)
-        
-        temp_video = NamedTemporaryFile(delete=False, suffix='.mp4')
-        temp_video.write(video_content)
-        temp_video.flush()
-        temp_video.close()
-        video_path = temp_video.name
-        
-        try:
-            cap = cv2.VideoCapture(video_path)
-            
-            if not cap.isOpened():
-                print(f"❌ Could not open video {video_path}")
-                os.unlink(video_path)
-                return
-            
-            ret, frame = cap.read()
-            
-            if ret:
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame_rgb)
-                
-                max_width = 640
-                if img.width > max_width:
-                    ratio = max_width / img.width
-                    new_height = int(img.height * ratio)
-                    img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-                
-                output = BytesIO()
-                img.save(output, format='JPEG', quality=70, optimize=True)
-                output.seek(0)
-                
-                s3_client = get_s3_client()
-                
-                preview_path = f"previews/{media.id}_preview.jpg"
-                s3_client.put_object(
-                    Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-                    Key=preview_path,
-                    Body=output.getvalue(),
-                    ContentType='image/jpeg',
-                    CacheControl='max-age=86400'
-                )
-                
-                media.preview = preview_path
-                media.save(update_fields=['preview'])
-
-                print(f"✅ Video thumbnail generated")
-            else:
-                print(f"❌ Could not read frame from video {media.id}")
-            
-            cap.release()
-            
-        finally:
-            if os.path.exists(video_path):
-                os.unlink(video_path)
-                
+        moderation.enqueue(post_id)
     except Exception as e:
-        print(f"❌ Error in generate_video_thumbnail {media.id}: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"[MODERATION] Could not queue post {post_id}: {e}")
+        raise self.retry(countdown=60, exc=e)
+    print(f"[MODERATION] Post {post_id} queued for moderation")
 
-@shared_task(bind=True, max_retries=3)
-def send_post_for_moderation(self, post_id):
+
+@shared_task
+def flush_moderation_queue():
     """
-    Send post to go moderation service
+    Submit queued posts to the go moderation service in one batch
     """
-    print(f"[MODERATION] Starting moderation for post {post_id}")
-    
-    try:
-        post = Post.objects.select_related('owner').prefetch_related('media').get(id=post_id)
-    except Post.DoesNotExist:
-        print(f"[MODERATION] Post {post_id} not found")
-        return
-    
-    media_urls = []
-    for m in post.media.all():
-        if hasattr(m.file, 'url'):
-            url = m.file.url
-        else:
-            url = str(m.file)
-
-        if not url.startswith('http'):
-            from django.conf import settings
-            url = f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{url}"
-        
-        media_urls.append(url)
-        print(f"[MODERATION] Media URL: {url}")
-    
-    print(f"[MODERATION] Post {post_id} has {len(media_urls)} media files")
-    
-    data = {
-        "id": str(post.id),
-        "content": post.about or "",
-        "media_urls": media_urls
-    }
-    
-    print(f"[MODERATION] Sending data: {data}")
-    
-    try:
-        resp = requests.post(
-            GO_MODERATION_URL, 
-            json=data, 
-            headers={"Content-Type": "application/json"},
-            timeout=30
-        )
-        resp.raise_for_status()
-        result = resp.json()
-        
-        print(f"[MODERATION] Response for post {post_id}: {result}")
-        
-        passed = result.get("passed", False)
-        post.is_approved = passed
-        post.moderation_status = "approved" if passed else "denied"
-
-        # add post count if post passed true
-        if passed:
-            user = User.objects.get(user_id=post.owner.user_id)
-            user.post_count += 1
-            user.save(update_fields=['post_count'])
-
-        text_details = result.get("text", {}).get("details", {})
-        categories = text_details.get("categories", ["universal"])
-        post.categories = categories
-        
-        post.save(update_fields=['is_approved', 'moderation_status', 'categories'])
-        
-        print(f"[MODERATION] Post {post_id} status: {post.moderation_status} (passed={passed})")
-        
-        if not passed:
-            reasons = []
-            text_result = result.get("text", {})
-            if not text_result.get("passed", True):
-                reasons.append("inappropriate text content")
-            
-            for file_result in result.get("files", []):
-                if not file_result.get("passed", True):
-                    filename = file_result.get("filename", "media")
-                    reasons.append(f"inappropriate media: {filename}")
-            
-            reason = ", ".join(reasons) if reasons else "violated community guidelines"
-            print(f"[MODERATION] User notified about rejection: {reason}")
-            
-    except requests.exceptions.Timeout:
-        print(f"[MODERATION] Timeout for post {post_id}, retrying...")
-        post.moderation_status = "pending"
-        post.save(update_fields=['moderation_status'])
-        raise self.retry(countdown=60)
-        
-    except requests.exceptions.RequestException as e:
-        print(f"[MODERATION] Request error for post {post_id}: {e}")
-        post.moderation_status = "pending"
-        post.save(update_fields=['moderation_status'])
-        raise self.retry(countdown=120, exc=e)
-        
-    except Exception as e:
-        print(f"[MODERATION] Unexpected error for post {post_id}: {e}")
-        post.moderation_status = "pending"
-        post.save(update_fields=['moderation_status'])
-        import traceback
-        traceback.print_exc()
+    submitted = moderation.flush()
+    return f"Submitted {submitted} posts for moderation"
 
 
 @shared_task
 def auto_moderation_check():
-    limit_time = timezone.now() - timedelta(minutes=10)
-    outdated_posts = Post.objects.filter(
-        moderation_status="pending",
-        create_at__lt=limit_time
+    now = timezone.now()
+    outdated_posts = Post.objects.filter(moderation_status="pending").filter(
+        # Never finalized by the client (abandoned upload)
+        Q(media_finalized=False, create_at__lt=now - timedelta(minutes=10))
+        # Finalized, media still in the media queues
+        | Q(media_finalized=True, moderation_queued=False, create_at__lt=now - MEDIA_PROCESSING_GRACE)
+        # Queued for moderation, no verdict yet (batched, resubmitted if lost)
+        | Q(moderation_queued=True, moderation_queued_at__lt=now - MODERATION_VERDICT_GRACE)
     )
     
     count = outdated_posts.count()
     outdated_posts.delete()
-    print(f"Auto moderation removed {count} old pending posts")
\ No newline at end of file
+    print(f"Auto moderation removed {count} old pending posts")
+
+
+@shared_task
+def rebuild_feed_candidates(user_id: int):
+    """
+    Recompute one user's ranked feed candidates (see posts.src.feed_candidates)
+    """
+    from posts.src.feed_candidates import compute_candidates, store_candidates
+    store_candidates(user_id, compute_candidates(user_id))
+
+
+@shared_task
+def fan_out_post_to_feeds(post_id: int):
+    """
+    Push a freshly approved post into the followers' feed candidates
+    """
+    from posts.src.feed_candidates import fan_out_post
+    post = Post.objects.filter(id=post_id, moderation_status="approved", is_hide=False).first()
+    if post:
+        fan_out_post(post)
+
+
+POPULAR_POSTS_LIMIT = 300
+POPULAR_MIN_LIKES = 1000
+POPULAR_MIN_READERS = 50_000
+
+
+@shared_task
+def refresh_popular_posts():
+    """
+    Rebuild the PopularPost table: posts over 1000 likes and posts by popular
+    (50k+ readers) or official users, capped at POPULAR_POSTS_LIMIT by likes
+    """
+    rows = list(
+        Post.objects
+        .filter(moderation_status="approved", is_hide=False)
+        .filter(
+            Q(count_likes__gt=POPULAR_MIN_LIKES)
+            | Q(owner__readers_count__gt=POPULAR_MIN_READERS)
+            | Q(owner__official=True)
+        )
+        .order_by('-count_likes', '-create_at')
+        .values_list('id', 'count_likes')[:POPULAR_POSTS_LIMIT]
+    )
+    with transaction.atomic():
+        PopularPost.objects.all().delete()
+        PopularPost.objects.bulk_create(
+            [PopularPost(post_id=post_id, score=count_likes or 0) for post_id, count_likes in rows]
+        )
+    print(f"Popular posts refreshed: {len(rows)} posts")
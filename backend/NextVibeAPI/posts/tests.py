@@ -1,3 +1,284 @@
+import time
+from unittest import mock
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django_redis import get_redis_connection
+from rest_framework.test import APIClient
+from user.models import Notification
+from posts.management.commands.moderation_stub import stub_result
+from posts.models import MediaBlob, Post, PostsMedia
+from posts import tasks
+from posts.src import feed_candidates, media_store, moderation, seen_posts
 
-# Create your tests here.
+User = get_user_model()
+
+CALLBACK_URL = "/api/v1/posts/moderation-callback/"
+
+
+class ModerationClientTests(TestCase):
+    """
+    The batch client against the local moderation stub: submissions are
+    captured instead of sent, and the stub's verdicts are delivered to the
+    callback endpoint the way the service would deliver them.
+    """
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self._clear_queue()
+        cache.delete_pattern("moderation:text:*")
+        self.addCleanup(self._clear_queue)
+
+        self.user = User.objects.create_user(
+            email="author@example.com",
+            username="author",
+            password="Password123!"
+        )
+        self.client = APIClient()
+
+        self.batches = []
+        transport = mock.patch("posts.src.moderation.requests.post", side_effect=self._capture)
+        self.transport = transport.start()
+        self.addCleanup(transport.stop)
+        for target in ("posts.tasks.fan_out_post_to_feeds.delay", "posts.tasks.flush_moderation_queue.apply_async"):
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _clear_queue(self):
+        for key in self.redis.scan_iter("moderation:*"):
+            self.redis.delete(key)
+
+    def _capture(self, url, json=None, timeout=None):
+        self.batches.append(json["posts"])
+        resp = mock.Mock(status_code=202)
+        resp.raise_for_status.return_value = None
+        return resp
+
+    def _post(self, about, media=()):
+        post = Post.objects.create(
+            owner=self.user,
+            about=about,
+            media_finalized=True,
+            moderation_queued=True,
+        )
+        for name, passed in media:
+            blob = MediaBlob.objects.create(
+                sha256=name.ljust(64, "0"), file_key=f"posts_media/{name}", ref_count=1,
+                processed=True, moderation_passed=passed,
+            )
+            PostsMedia.objects.create(post=post, blob=blob, file=f"posts_media/{name}")
+        moderation.enqueue(post.id)
+        return post
+
+    def _deliver(self, batch):
+        for req in batch:
+            resp = self.client.post(CALLBACK_URL, stub_result(req), format="json")
+            self.assertEqual(resp.status_code, 200)
+
+    def _status(self, post):
+        post.refresh_from_db()
+        return post.moderation_status
+
+    def test_flush_submits_one_batch_and_callbacks_decide(self):
+        good = self._post("hello world", [("cat.jpg", None)])
+        bad = self._post("this is forbidden")
+
+        self.assertEqual(moderation.flush(), 2)
+        self.assertEqual(len(self.batches), 1)
+        batch = self.batches[0]
+        self.assertEqual({req["id"] for req in batch}, {str(good.id), str(bad.id)})
+        self.assertEqual(self.redis.zcard(moderation.QUEUE_KEY), 0)
+        self.assertEqual(self.redis.zcard(moderation.INFLIGHT_KEY), 2)
+
+        self._deliver(batch)
+
+        self.assertEqual(self._status(good), "approved")
+        self.assertEqual(self._status(bad), "denied")
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.post_count, 1)
+        self.assertEqual(self.redis.zcard(moderation.INFLIGHT_KEY), 0)
+        self.assertTrue(MediaBlob.objects.get(sha256="cat.jpg".ljust(64, "0")).moderation_passed)
+        self.assertEqual(
+            Notification.objects.get(post=bad).notification_type, "moderation_fail"
+        )
+
+    def test_duplicate_callback_is_applied_once(self):
+        post = self._post("hello again")
+        moderation.flush()
+        batch = self.batches[0]
+
+        self._deliver(batch)
+        self._deliver(batch)
+
+        self.assertEqual(self._status(post), "approved")
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.post_count, 1)
+        self.assertEqual(Notification.objects.filter(post=post).count(), 1)
+        self.assertFalse(moderation.handle_result(post, stub_result(batch[0])))
+
+    def test_cached_verdicts_decide_without_a_request(self):
+        moderation.cache_text_verdict("seen before", {"passed": True})
+        approved = self._post("seen  before", [("known.jpg", True)])
+        denied = self._post("", [("known-bad.jpg", False)])
+
+        self.assertEqual(moderation.flush(), 0)
+
+        self.transport.assert_not_called()
+        self.assertEqual(self._status(approved), "approved")
+        self.assertEqual(self._status(denied), "denied")
+        self.assertEqual(self.redis.zcard(moderation.INFLIGHT_KEY), 0)
+
+    def test_only_unknown_parts_are_sent(self):
+        moderation.cache_text_verdict("known text", {"passed": True})
+        post = self._post("known text", [("seen.jpg", True), ("new-nsfw.jpg", None)])
+
+        self.assertEqual(moderation.flush(), 1)
+        req = self.batches[0][0]
+        self.assertEqual(req["content"], "")
+        self.assertEqual(len(req["media_urls"]), 1)
+        self.assertIn("new-nsfw.jpg", req["media_urls"][0])
+
+        self._deliver(self.batches[0])
+
+        self.assertEqual(self._status(post), "denied")
+        self.assertFalse(MediaBlob.objects.get(sha256="new-nsfw.jpg".ljust(64, "0")).moderation_passed)
+
+    def test_stale_submission_is_resubmitted(self):
+        post = self._post("no answer yet")
+        moderation.flush()
+        self.redis.zadd(moderation.INFLIGHT_KEY, {post.id: time.time() - moderation.RESUBMIT_AFTER_SECONDS - 1})
+
+        self.assertEqual(moderation.flush(), 1)
+
+        self.assertEqual(len(self.batches), 2)
+        self.assertEqual(self.batches[1][0]["id"], str(post.id))
+        self._deliver(self.batches[1])
+        self.assertEqual(self._status(post), "approved")
+
+    def test_failed_submission_is_requeued(self):
+        post = self._post("service down")
+        queued_at = self.redis.zscore(moderation.QUEUE_KEY, post.id)
+        self.transport.side_effect = requests.exceptions.ConnectionError("refused")
+
+        self.assertEqual(moderation.flush(), 0)
+
+        self.assertEqual(self.redis.zscore(moderation.QUEUE_KEY, post.id), queued_at)
+        self.assertEqual(self.redis.zcard(moderation.INFLIGHT_KEY), 0)
+        self.assertEqual(self._status(post), "pending")
+
+
+class FeedCandidatesTests(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(
+            email="reader@example.com",
+            username="reader",
+            password="Password123!"
+        )
+        self.author = User.objects.create_user(
+            email="writer@example.com",
+            username="writer",
+            password="Password123!"
+        )
+        uid = self.reader.user_id
+        seen_posts.reset(uid)
+        feed_candidates.reset(uid)
+        self.addCleanup(seen_posts.reset, uid)
+        self.addCleanup(feed_candidates.reset, uid)
+        self.post_ids = [
+            Post.objects.create(owner=self.author, about=f"post {i}", moderation_status="approved").id
+            for i in range(6)
+        ]
+        limit = mock.patch.object(feed_candidates, "CANDIDATES_LIMIT", 3)
+        limit.start()
+        self.addCleanup(limit.stop)
+        rebuild = mock.patch("posts.tasks.rebuild_feed_candidates.delay")
+        rebuild.start()
+        self.addCleanup(rebuild.stop)
+
+    def _rebuild(self):
+        uid = self.reader.user_id
+        feed_candidates.store_candidates(uid, feed_candidates.compute_candidates(uid))
+
+    def _read_all(self):
+        served = []
+        while True:
+            page = feed_candidates.pop_page(self.reader.user_id, 3)
+            if not page:
+                return served
+            seen_posts.mark_seen(self.reader.user_id, page)
+            served.extend(page)
+
+    def test_rebuild_after_reading_every_candidate_returns_unseen_posts(self):
+        self._rebuild()
+        first = self._read_all()
+        self.assertEqual(len(first), 3)
+
+        self._rebuild()
+        second = self._read_all()
+
+        self.assertEqual(len(second), 3)
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(set(first) | set(second), set(self.post_ids))
+
+    def test_rebuild_is_empty_once_everything_is_seen(self):
+        seen_posts.mark_seen(self.reader.user_id, self.post_ids)
+
+        self.assertEqual(feed_candidates.compute_candidates(self.reader.user_id), [])
+
+    def test_events_do_not_lift_seen_posts_back_in(self):
+        uid = self.reader.user_id
+        feed_candidates.store_candidates(uid, [])
+        seen_posts.mark_seen(uid, self.post_ids[:4])
+
+        feed_candidates.on_like(uid, self.author.user_id)
+
+        ranked = get_redis_connection("default").zrange(feed_candidates.candidates_key(uid), 0, -1)
+        self.assertEqual({int(member) for member in ranked}, set(self.post_ids[4:]))
+
+
+class MediaStageFailureTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="uploader@example.com",
+            username="uploader",
+            password="Password123!"
+        )
+        first_post = Post.objects.create(owner=self.user, about="first")
+        second_post = Post.objects.create(owner=self.user, about="second")
+        self.original = PostsMedia.objects.create(post=first_post, file="posts_media/original.jpg")
+        media_store.register(self.original, "f" * 64, 1024)
+        self.duplicate = media_store.attach_existing("f" * 64, second_post.id)
+        self.blob = self.original.blob
+
+    @mock.patch("posts.tasks.process_media_file.delay")
+    @mock.patch("posts.tasks.render_image", side_effect=OSError("R2 unavailable"))
+    def test_failed_stage_hands_the_content_to_a_waiting_duplicate(self, render_image, process_media_file):
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.render_image_stage(self.original.id)
+            tasks.finish_media_stage(self.original.id)
+
+        render_image.assert_called_once()
+        process_media_file.assert_called_once_with(self.duplicate.id)
+        self.blob.refresh_from_db()
+        self.assertFalse(self.blob.processed)
+        self.assertEqual(self.blob.variants, {})
+        self.assertEqual(self.blob.processing_media_id, self.duplicate.id)
+        self.original.refresh_from_db()
+        self.duplicate.refresh_from_db()
+        self.assertIsNotNone(self.original.processed_at)
+        self.assertIsNone(self.duplicate.processed_at)
+
+    @mock.patch("posts.tasks.process_media_file.delay")
+    @mock.patch("posts.tasks.render_image")
+    def test_successful_stage_marks_the_duplicate_processed(self, render_image, process_media_file):
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.render_image_stage(self.original.id)
+            tasks.finish_media_stage(self.original.id)
+
+        process_media_file.assert_not_called()
+        self.blob.refresh_from_db()
+        self.assertTrue(self.blob.processed)
+        self.duplicate.refresh_from_db()
+        self.assertIsNotNone(self.duplicate.processed_at)
@@ -2,7 +2,7 @@ from django.urls import path, include
 from .view_pac import PostMenuView, LikePostView, PostViewSet, LikeCommentView
 from .view_pac import (
     CommentCreateView, CommentReplyView,
-    GetCommentView, AddMediaToPostView,
+    GetCommentView, GetCommentRepliesView, AddMediaToPostView,
     GenerateImage, RecomendationsView,
     ModerationCallbackView, RecommendationFeedView,
     DeletePostView, SendReportForPostView,
@@ -29,6 +29,7 @@ urlpatterns = [
     path("comment-create/", CommentCreateView.as_view(), name="comment_create"),
     path("comment-reply/<int:comment_id>/", CommentReplyView.as_view(), name="comment_reply"),
     path("get-comments/<int:post_id>/", GetCommentView.as_view(), name="get_comments"),
+    path("get-comment-replies/<int:comment_id>/", GetCommentRepliesView.as_view(), name="get_comment_replies"),
     path("generate-image/", GenerateImage.as_view(), name="generate_image"),
     path("generate-image/status/", GetGenerationImageStatusView.as_view(), name="generate_image_status"),
     path("recomendations/", RecomendationsView.as_view(), name="recomendations"),
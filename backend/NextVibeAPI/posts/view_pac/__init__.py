@@ -1,7 +1,7 @@
 from .posts_menu import PostMenuView
 from .like_post import LikePostView
 from .comment_create import CommentCreateView, CommentReplyView
-from .get_comments import GetCommentView
+from .get_comments import GetCommentView, GetCommentRepliesView
 from .post_create import PostViewSet
 from .add_media import AddMediaToPostView
 from .generate_image_view import GenerateImage
@@ -6,6 +6,7 @@ from ..serializers_pac import PostsMediaSerializer
 from ..tasks import send_post_for_moderation
 from ..models import Post, PostsMedia
 from rest_framework.throttling import ScopedRateThrottle
+from ..src.media_store import attach_existing, content_hash
 
 class AddMediaToPostView(APIView):
     permission_classes = [IsAuthenticated]
@@ -45,9 +46,16 @@ class AddMediaToPostView(APIView):
         created_media = []
         
         for media_file in media_files:
+            # Content stored before is shared instead of uploaded and processed again
+            digest = content_hash(media_file)
+            media_obj = attach_existing(digest, post.id)
+            if media_obj is not None:
+                created_media.append(PostsMediaSerializer(media_obj, context={'request': request}).data)
+                continue
+
             serializer = PostsMediaSerializer(
                 data={"post": post_id, "file": media_file},
-                context={'request': request}
+                context={'request': request, 'content_hash': digest}
             )
             
             if serializer.is_valid():
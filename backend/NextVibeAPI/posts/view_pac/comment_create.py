@@ -3,11 +3,13 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from ..models import Comment, CommentReply
+from ..models import Comment, CommentReply, Post
+from django.db.models import F
 from django.contrib.auth import get_user_model
 from user.models import Notification
 from user.src.clear_notify_cache import clear_notification_cache
 from rest_framework.throttling import ScopedRateThrottle
+from ..src import feed_candidates
 
 User = get_user_model()
 
@@ -25,7 +27,10 @@ class CommentCreateView(APIView):
 
         if comment.is_valid():
             comment_obj = comment.save()
+            if isinstance(comment_obj, Comment):
+                Post.all_objects.filter(id=comment_obj.post_id).update(count_comments=F("count_comments") + 1)
             user = User.objects.get(user_id=comment.data["owner"])
+            feed_candidates.on_comment(user.user_id, comment_obj.post.owner_id)
 
             if user != comment_obj.post.owner:
                 existing = Notification.objects.filter(
@@ -61,6 +66,7 @@ class CommentCreateView(APIView):
     def delete(self, request, *args, **kwargs):
         comment = Comment.objects.get(id=kwargs["comment_id"])
         comment.delete()
+        Post.all_objects.filter(id=comment.post_id, count_comments__gt=0).update(count_comments=F("count_comments") - 1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
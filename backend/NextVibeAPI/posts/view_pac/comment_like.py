@@ -8,6 +8,7 @@ from ..models import Comment, CommentReply
 from user.models import Notification
 from user.src.clear_notify_cache import clear_notification_cache
 from rest_framework.throttling import ScopedRateThrottle
+from ..src.likes import toggle_comment_like
 
 User = get_user_model()
 
@@ -33,48 +34,26 @@ class LikeCommentView(APIView):
         """
         is_reply = request.query_params.get("is_reply", "false").lower() == 'true'
         
-        try:
-            user = User.objects.get(user_id=request.user.user_id)
-        except User.DoesNotExist:
-            return Response(
-                {"data": "Error: user not exist"}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
+        user = request.user
         
         try:
             if is_reply:
                 comment = CommentReply.objects.select_related('comment', 'owner').get(id=comment_id)
-                liked_field = 'liked_comment_replies'
             else:
                 comment = Comment.objects.select_related('post', 'owner').get(id=comment_id)
-                liked_field = 'liked_comments'
         except (Comment.DoesNotExist, CommentReply.DoesNotExist):
             return Response(
                 {"data": f"{'Reply' if is_reply else 'Comment'} does not exist"}, 
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        liked_items = getattr(user, liked_field, [])
-        
-        if comment_id in liked_items:
-            liked_items.remove(comment_id)
-            comment.count_likes = max(0, comment.count_likes - 1)
-            setattr(user, liked_field, liked_items)
-            comment.save()
-            user.save()
-            
+        if not toggle_comment_like(user.user_id, comment_id, is_reply=is_reply):
             return Response(
                 {"data": f"{'Reply' if is_reply else 'Comment'} is unliked"}, 
                 status=status.HTTP_200_OK
             )
         
         else:
-            liked_items.append(comment_id)
-            comment.count_likes += 1
-            setattr(user, liked_field, liked_items)
-            comment.save()
-            user.save()
-            
             if user != comment.owner:
                 if is_reply:
                     post = comment.comment.post
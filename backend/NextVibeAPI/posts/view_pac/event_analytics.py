@@ -2,13 +2,16 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from ..models import Post, EventRequest, EventCheckin, Reputation, UserCollection
+from ..models import Post, EventRequest, EventCheckin, Reputation
+from ..src.event_analytics import analytics_payload
 from django.db.models import Sum, Count
 from django.conf import settings
 from collections import defaultdict
 from user.models import User, Notification
 import traceback
 
+TOP_USERS_LIMIT = 50
+
 
 class EventAnalyticsView(APIView):
     """
@@ -28,101 +31,7 @@ class EventAnalyticsView(APIView):
             if post.owner != request.user:
                 return Response({"error": "Only the event owner can view analytics"}, status=status.HTTP_403_FORBIDDEN)
 
-            # 1. Event Requests counts
-            total_requests = EventRequest.objects.filter(post=post).count()
-            accepted_requests = EventRequest.objects.filter(post=post, status=EventRequest.Status.APPROVED).count()
-            rejected_requests = EventRequest.objects.filter(post=post, status=EventRequest.Status.REJECTED).count()
-
-            # 2. NFC Check-ins
-            nfc_checkins = EventCheckin.objects.filter(post=post, is_registered=True).count()
-
-            # 3. Total IRL taps (NFC Networking)
-            networking_records_count = Reputation.objects.filter(event=post, is_checkin=False, post__isnull=True).count()
-            total_irl_taps = networking_records_count // 2
-
-            # 4. Total reputation earned at this event
-            total_reputation = Reputation.objects.filter(event=post).aggregate(total=Sum('points'))['total'] or 0
-
-            # 5. cNFT Claim Rate statistics
-            checked_in_users = EventCheckin.objects.filter(post=post).values_list('user_id', flat=True)
-            total_checkins = checked_in_users.count()
-            successful_claims = UserCollection.objects.filter(post=post, user_id__in=checked_in_users).count()
-            cnft_claim_rate = round((successful_claims / total_checkins * 100), 2) if total_checkins > 0 else 0.0
-
-            # 6. Ecosystem Statistics for accepted attendees (Wallet vs Web2 Auth Provider)
-            accepted_attendee_ids = EventRequest.objects.filter(
-                post=post,
-                status=EventRequest.Status.APPROVED
-            ).values_list('user_id', flat=True)
-
-            total_users = accepted_attendee_ids.count()
-            mwa_wallet_users = User.objects.filter(
-                user_id__in=accepted_attendee_ids,
-                auth_provider='wallet'
-            ).count()
-            web2_users = User.objects.filter(
-                user_id__in=accepted_attendee_ids
-            ).exclude(
-                auth_provider='wallet'
-            ).count()
-            mwa_percentage = round((mwa_wallet_users / total_users * 100), 2) if total_users > 0 else 0.0
-            web2_percentage = round((web2_users / total_users * 100), 2) if total_users > 0 else 0.0
-
-            ecosystem_stats = {
-                "total_users": total_users,
-                "mwa_wallet_users": mwa_wallet_users,
-                "web2_users": web2_users,
-                "mwa_percentage": mwa_percentage,
-                "web2_percentage": web2_percentage,
-            }
-
-            # 7. Peak Activity Timeline (hourly NFC interactions checkins + networking)
-            reps = Reputation.objects.filter(event=post)
-            hourly_map = {}
-            seen_networking_pairs = set()
-
-            for rep in reps:
-                # Guard against missing created_at in legacy data
-                if not rep.created_at:
-                    continue
-
-                # Group by hour (UTC)
-                hour_str = rep.created_at.replace(minute=0, second=0, microsecond=0).isoformat()
-                if hour_str not in hourly_map:
-                    hourly_map[hour_str] = {
-                        "hour": hour_str,
-                        "checkins": 0,
-                        "networking": 0,
-                        "total": 0
-                    }
-
-                if rep.is_checkin:
-                    hourly_map[hour_str]["checkins"] += 1
-                    hourly_map[hour_str]["total"] += 1
-                elif not rep.post_id:
-                    # Guard against missing given_by in legacy data
-                    if rep.user_id and rep.given_by_id:
-                        user_ids = sorted([rep.user_id, rep.given_by_id])
-                        pair_key = (hour_str, user_ids[0], user_ids[1])
-                        if pair_key not in seen_networking_pairs:
-                            seen_networking_pairs.add(pair_key)
-                            hourly_map[hour_str]["networking"] += 1
-                            hourly_map[hour_str]["total"] += 1
-
-            hourly_activity = sorted(hourly_map.values(), key=lambda x: x["hour"])
-
-            data = {
-                "total_requests": total_requests,
-                "accepted_requests": accepted_requests,
-                "rejected_requests": rejected_requests,
-                "nfc_checkins": nfc_checkins,
-                "total_irl_taps": total_irl_taps,
-                "total_reputation_earned": total_reputation,
-                "cnft_claims_count": successful_claims,
-                "cnft_claim_rate": cnft_claim_rate,
-                "ecosystem_stats": ecosystem_stats,
-                "hourly_activity": hourly_activity,
-            }
+            data = analytics_payload(post.id)
 
             return Response(data, status=status.HTTP_200_OK)
 
@@ -137,8 +46,8 @@ class EventAnalyticsView(APIView):
 
 class EventTopUsersView(APIView):
     """
-    GET /posts/event-top-users/<int:post_id>/
-    Returns top users at an event based on reputation and taps.
+    GET /posts/event-top-users/<int:post_id>/?limit=N
+    Returns top users at an event based on reputation and taps (at most TOP_USERS_LIMIT).
     """
     permission_classes = [IsAuthenticated]
 
@@ -149,6 +58,11 @@ class EventTopUsersView(APIView):
             except Post.DoesNotExist:
                 return Response({"error": "Event not found"}, status=status.HTTP_404_NOT_FOUND)
 
+            try:
+                limit = min(max(int(request.query_params.get("limit", TOP_USERS_LIMIT)), 1), TOP_USERS_LIMIT)
+            except ValueError:
+                return Response({"error": "Invalid limit"}, status=status.HTTP_400_BAD_REQUEST)
+
             top_users_qs = Reputation.objects.filter(
                 event=post
             ).values(
@@ -159,7 +73,7 @@ class EventTopUsersView(APIView):
             ).annotate(
                 total_reputation=Sum('points'),
                 total_taps=Count('id')
-            ).order_by('-total_reputation', '-total_taps')
+            ).order_by('-total_reputation', '-total_taps')[:limit]
 
             top_users = []
             for item in top_users_qs:
@@ -4,6 +4,7 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from ..models import Post, EventRequest, EventCheckin
+from ..src.event_analytics import record_claim
 
 
 class EventCheckinView(APIView):
@@ -125,7 +126,7 @@ class ClaimEventNftView(APIView):
                     price=0,
                 )
 
-                EventCheckin.objects.get_or_create(
+                checkin, new_checkin = EventCheckin.objects.get_or_create(
                     user=request.user,
                     post=post,
                     defaults={'is_registered': True}
@@ -149,6 +150,7 @@ class ClaimEventNftView(APIView):
 
                 if existing_rep:
                     earned_points = existing_rep.points
+                    new_points = 0
                 else:
                     earned_points = random.randint(5, 20)
                     Reputation.objects.create(
@@ -159,6 +161,9 @@ class ClaimEventNftView(APIView):
                         event=post,
                         h3_geo=user_h3_geo,
                     )
+                    new_points = earned_points
+
+                record_claim(post.id, new_checkin, checkin.is_registered, new_points)
 
                 return Response({
                     "success": True,
@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from ..models import EventCheckin, Reputation, Post
+from ..src.event_analytics import record_tap
 from user.models import User
 from django.db.models import Sum, Q
 from django.utils import timezone
@@ -374,6 +375,7 @@ class EventNFCConnectView(APIView):
             event=post,
             h3_geo=h3_geo_val
         )
+        record_tap(post.id, scanner_gains + scanned_gains)
 
         # Avatar URL for response
         avatar_url = None
@@ -3,9 +3,11 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.throttling import ScopedRateThrottle
-from posts.models import Post, UserCollection, EventRequest
+from posts.models import Post, UserCollection
+from posts.src.event_stats import request_statuses
 from posts.serializers_pac.recommendation_feed_serializer import PostFeedSerializer
-from user.models import InviteUser
+from user.src.user_cards import get_cards
+from posts.src.likes import liked_post_ids
 
 
 class EventPostsView(APIView):
@@ -42,7 +44,7 @@ class EventPostsView(APIView):
 
         posts_qs = (
             Post.objects
-            .select_related("owner", "owner__og_avatar")
+            .select_related("owner")
             .prefetch_related("media")
             .filter(on_event=event_post, is_hide=False)
             .exclude(moderation_status="denied")
@@ -57,7 +59,7 @@ class EventPostsView(APIView):
                 "count": 0,
                 "total": total_count,
                 "more_posts": False,
-                "liked_posts": user.liked_posts,
+                "liked_posts": [],
             }, status=status.HTTP_200_OK)
 
         # Build context for PostFeedSerializer (same pattern as recommendation_feed)
@@ -76,16 +78,9 @@ class EventPostsView(APIView):
             .values_list("post_id", flat=True)
         )
 
-        invite_counts = {
-            inv.owner_id: inv.invited_count
-            for inv in InviteUser.objects.filter(owner_id__in=owner_ids)
-        }
+        owner_cards = get_cards(owner_ids)
 
-        event_requests = EventRequest.objects.filter(
-            post_id__in=post_ids,
-            user=user,
-        ).values_list("post_id", "status")
-        event_request_statuses = dict(event_requests)
+        event_request_statuses = request_statuses(user.user_id, post_ids)
 
         serializer = PostFeedSerializer(
             posts_list,
@@ -94,7 +89,7 @@ class EventPostsView(APIView):
                 "request": request,
                 "nft_prices": nft_prices,
                 "claimed_post_ids": claimed_post_ids,
-                "invite_counts": invite_counts,
+                "owner_cards": owner_cards,
                 "event_request_statuses": event_request_statuses,
             },
         )
@@ -104,5 +99,5 @@ class EventPostsView(APIView):
             "count": len(posts_list),
             "total": total_count,
             "more_posts": (index + limit) < total_count,
-            "liked_posts": user.liked_posts,
+            "liked_posts": liked_post_ids(user.user_id, post_ids),
         }, status=status.HTTP_200_OK)
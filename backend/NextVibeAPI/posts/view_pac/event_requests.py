@@ -6,6 +6,7 @@ from django.shortcuts import get_object_or_404
 from ..models import Post, EventRequest
 from user.models import Notification
 from django.db import IntegrityError
+from ..src.event_stats import create_request, set_request_status
 
 class EventRequestCreateView(APIView):
     permission_classes = [IsAuthenticated]
@@ -17,11 +18,7 @@ class EventRequestCreateView(APIView):
             return Response({"error": "Cannot request your own event"}, status=status.HTTP_400_BAD_REQUEST)
             
         try:
-            event_request, created = EventRequest.objects.get_or_create(
-                user=request.user,
-                post=post,
-                defaults={'status': EventRequest.Status.PENDING}
-            )
+            event_request, created = create_request(request.user, post)
             if created:
                 Notification.objects.create(
                     sender=request.user,
@@ -66,13 +63,13 @@ class EventRequestActionView(APIView):
         event_request = get_object_or_404(EventRequest, id=request_id, post__owner=request.user)
         
         if action == 'approve':
-            event_request.status = EventRequest.Status.APPROVED
+            new_status = EventRequest.Status.APPROVED
             text_preview = f"Your request for event was approved!"
         else:
-            event_request.status = EventRequest.Status.REJECTED
+            new_status = EventRequest.Status.REJECTED
             text_preview = f"Your request for event was denied"
             
-        event_request.save(update_fields=['status'])
+        event_request = set_request_status(event_request.id, new_status)
         
         Notification.objects.create(
             sender=request.user,
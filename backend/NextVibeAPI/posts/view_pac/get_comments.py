@@ -4,10 +4,43 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.throttling import ScopedRateThrottle
 from ..models import Comment, Post
-from user.models import InviteUser
+from user.src.user_cards import get_cards
+from ..src.likes import liked_comment_ids
+from ..src.comment_threads import (
+    ORDER_NEW, ORDER_TOP, REPLIES_PREVIEW,
+    comments_page, replies_page, reply_counts, reply_cursor, reply_previews,
+)
+
+
+def build_user(owner, cards):
+    card = cards.get(owner.user_id, {})
+    return {
+        "username": owner.username,
+        "avatar": card.get("avatar"),
+        "official": card.get("official"),
+        "is_og": card.get("is_og", False),
+        "og_edition": card.get("og_edition"),
+        "invited_count": card.get("invited_count", 0),
+    }
+
+
+def build_reply(reply, cards):
+    return {
+        "user": build_user(reply.owner, cards),
+        "user_id": reply.owner.user_id,
+        "reply_id": reply.id,
+        "content": reply.content,
+        "create_at": reply.create_at,
+        "count_likes": reply.count_likes,
+    }
 
 
 class GetCommentView(APIView):
+    """
+    GET /get-comments/<post_id>/?order=new|top&cursor=...
+    One page of top-level comments, each with its first replies and a reply count.
+    Further replies come from GetCommentRepliesView.
+    """
     permission_classes = [IsAuthenticated]
     throttle_classes = [ScopedRateThrottle]
     throttle_scope = "comments_list"
@@ -22,65 +55,77 @@ class GetCommentView(APIView):
         if not post:
             return Response({"error": "Post not found"}, status=404)
 
-        comments = (
-            Comment.objects
-            .filter(post_id=post_id)
-            .select_related("owner", "owner__og_avatar")
-            .prefetch_related(
-                "replies",
-                "replies__owner",
-                "replies__owner__og_avatar",
-            )
-            .order_by("-create_at")
-        )
+        order = ORDER_TOP if request.query_params.get("order") == ORDER_TOP else ORDER_NEW
+        try:
+            comments, next_cursor = comments_page(post_id, order, request.query_params.get("cursor"))
+        except ValueError:
+            return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
 
-        all_owner_ids = set()
-        for comment in comments:
-            all_owner_ids.add(comment.owner.user_id)
-            for reply in comment.replies.all():
-                all_owner_ids.add(reply.owner.user_id)
+        comment_ids = [comment.id for comment in comments]
+        previews = reply_previews(comment_ids)
+        counts = reply_counts(comment_ids)
 
-        invite_counts = {
-            inv.owner_id: inv.invited_count
-            for inv in InviteUser.objects.filter(owner_id__in=all_owner_ids)
-        }
+        all_owner_ids = {comment.owner.user_id for comment in comments}
+        reply_ids = []
+        for replies in previews.values():
+            for reply in replies:
+                all_owner_ids.add(reply.owner.user_id)
+                reply_ids.append(reply.id)
 
-        def build_user(owner):
-            og = getattr(owner, 'og_avatar', None)
-            return {
-                "username": owner.username,
-                "avatar": owner.avatar.url if owner.avatar else None,
-                "official": owner.official,
-                "is_og": og is not None,
-                "og_edition": og.edition if og is not None else None,
-                "invited_count": invite_counts.get(owner.user_id, 0),
-            }
+        cards = get_cards(all_owner_ids)
+        liked_comments, liked_replies = liked_comment_ids(request.user.user_id, comment_ids, reply_ids)
 
         data = {
             "post_id": post_id,
             "author": post.owner.username,
-            "comments": []
+            "comments": [],
+            "liked_comments": liked_comments,
+            "liked_comment_replies": liked_replies,
+            "next_cursor": next_cursor,
         }
 
         for comment in comments:
-            comment_data = {
-                "user": build_user(comment.owner),
+            replies = previews.get(comment.id, [])
+            replies_count = counts.get(comment.id, 0)
+            data["comments"].append({
+                "user": build_user(comment.owner, cards),
                 "user_id": comment.owner.user_id,
                 "id": comment.id,
                 "content": comment.content,
                 "create_at": comment.create_at,
                 "count_likes": comment.count_likes,
-                "replies": []
-            }
-            for reply in comment.replies.all():
-                comment_data["replies"].append({
-                    "user": build_user(reply.owner),
-                    "user_id": reply.owner.user_id,
-                    "reply_id": reply.id,
-                    "content": reply.content,
-                    "create_at": reply.create_at,
-                    "count_likes": reply.count_likes,
-                })
-            data["comments"].append(comment_data)
-
-        return Response(data, status=status.HTTP_200_OK)
\ No newline at end of file
+                "replies": [build_reply(reply, cards) for reply in replies],
+                "replies_count": replies_count,
+                "replies_next_cursor": reply_cursor(replies[-1]) if replies_count > REPLIES_PREVIEW else None,
+            })
+
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class GetCommentRepliesView(APIView):
+    """
+    GET /get-comment-replies/<comment_id>/?cursor=...
+    One page of a comment's replies, oldest first.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "comments_list"
+
+    def get(self, request, comment_id: int) -> Response:
+        if not Comment.objects.filter(id=comment_id).exists():
+            return Response({"error": "Comment not found"}, status=404)
+
+        try:
+            replies, next_cursor = replies_page(comment_id, request.query_params.get("cursor"))
+        except ValueError:
+            return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+        cards = get_cards(reply.owner.user_id for reply in replies)
+        _, liked_replies = liked_comment_ids(request.user.user_id, [], [reply.id for reply in replies])
+
+        return Response({
+            "comment_id": comment_id,
+            "replies": [build_reply(reply, cards) for reply in replies],
+            "liked_comment_replies": liked_replies,
+            "next_cursor": next_cursor,
+        }, status=status.HTTP_200_OK)
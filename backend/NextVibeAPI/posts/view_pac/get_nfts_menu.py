@@ -6,6 +6,7 @@ from rest_framework.throttling import ScopedRateThrottle
 from django.contrib.auth import get_user_model
 from django.db.models import Prefetch
 from ..models import PostsMedia, UserCollection
+from ..src.likes import liked_post_ids
 
 User = get_user_model()
 OG_AVATAR_BASE_URL = "https://media.nextvibe.io/og-avatar-{edition}.jpg"
@@ -70,6 +71,8 @@ class UserCollectionView(APIView):
                             else str(m.file)
                         ),
                         "media_preview": m.preview.url if m.preview else None,
+                        "srcset": m.srcset,
+                        "hls_url": m.hls_url,
                     }
                     for m in col.post.media.all()
                 ],
@@ -108,6 +111,6 @@ class UserCollectionView(APIView):
             "data": data,
             "more_posts": (index + limit) < total,
             "total_posts": total,
-            "liked_posts": getattr(user_request, "liked_posts", []),
+            "liked_posts": liked_post_ids(user_request.user_id, [col.post_id for col in collections_qs]),
             "og_avatar": og_avatar,
         }, status=status.HTTP_200_OK)
\ No newline at end of file
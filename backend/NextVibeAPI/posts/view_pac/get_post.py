@@ -2,10 +2,12 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from ..models import Post, Comment, UserCollection
+from ..models import Post, UserCollection
 from django.contrib.auth import get_user_model
 from rest_framework.throttling import ScopedRateThrottle
-from user.models import InviteUser
+from user.src.user_cards import get_card
+from ..src.event_stats import request_statuses
+from ..src.likes import liked_post_ids
 
 User = get_user_model()
 
@@ -23,7 +25,7 @@ class GetPostView(APIView):
         post = (
             Post.objects
             .prefetch_related("media")
-            .select_related("owner", "owner__og_avatar")
+            .select_related("owner")
             .filter(id=post_id)
             .first()
         )
@@ -32,17 +34,7 @@ class GetPostView(APIView):
 
         owner = post.owner
 
-        avatar_url = None
-        if owner.avatar:
-            raw = str(owner.avatar)
-            avatar_url = raw if raw.startswith("https://") else owner.avatar.url
-
-        comments = (
-            Comment.objects
-            .filter(post=post_id)
-            .prefetch_related("replies")
-        )
-        comments_count = comments.count()
+        card = get_card(owner.user_id) or {}
 
         nft_price = None
         is_owner = post.owner == request.user
@@ -55,29 +47,21 @@ class GetPostView(APIView):
                 post=post
             ).exists()
 
-        og = getattr(owner, 'og_avatar', None)
-
-        try:
-            invite_data = InviteUser.objects.get(owner=owner)
-            invited_count = invite_data.invited_count
-        except InviteUser.DoesNotExist:
-            invited_count = 0
-
         return Response({
             "status": "ok",
             "data": {
                 "post_id": post.id,
                 "user_id": owner.user_id,
                 "username": owner.username,
-                "liked_posts": request.user.liked_posts,
-                "avatar": avatar_url,
-                "official": getattr(owner, "official", False),
-                "is_og": og is not None,
-                "og_edition": og.edition if og is not None else None,
-                "invited_count": invited_count,
+                "liked_posts": liked_post_ids(request.user.user_id, [post.id]),
+                "avatar": card.get("avatar"),
+                "official": card.get("official", False),
+                "is_og": card.get("is_og", False),
+                "og_edition": card.get("og_edition"),
+                "invited_count": card.get("invited_count", 0),
                 "about": post.about,
                 "count_likes": post.count_likes,
-                "comments_count": comments_count,
+                "comments_count": post.count_comments,
                 "media": [
                     {
                         "id": m.id,
@@ -106,6 +90,7 @@ class GetPostView(APIView):
                 "luma_event_verified": post.luma_event_verified,
                 "luma_event_start_time": post.luma_event_start_time,
                 "luma_event_end_time": post.luma_event_end_time,
-                "event_request_status": (lambda req: req.status if req else None)(post.event_requests.filter(user=request.user).first()),
+                "event_request_status": request_statuses(request.user.user_id, [post.id]).get(post.id) if post.is_luma_event else None,
+                "attendee_count": post.approved_count,
             }
         })
\ No newline at end of file
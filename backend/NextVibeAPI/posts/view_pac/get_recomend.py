@@ -3,6 +3,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.throttling import ScopedRateThrottle
+from ..src.likes import liked_post_ids
 
 class RecomendationsView(APIView):
     permission_classes = [IsAuthenticated]
@@ -15,4 +16,5 @@ class RecomendationsView(APIView):
                                     [122, 132, 140, 142, 129, 134, 138])
         posts = rec.format()
         
-        return Response({"data": posts, "liked_posts": request.user.liked_posts}, status=200)
\ No newline at end of file
+        liked_posts = liked_post_ids(request.user.user_id, [post["id"] for post in posts])
+        return Response({"data": posts, "liked_posts": liked_posts}, status=200)
\ No newline at end of file
@@ -1,4 +1,3 @@
-from django.conf import settings
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
@@ -6,11 +5,17 @@ from rest_framework.response import Response
 from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
 
-from ..models import Post, PostsMedia, EventRequest
-import h3
+from ..models import Post
+from ..src.geo_index import map_payload
+from ..src.event_stats import request_statuses
+from .get_vibemap_nfts import owner_avatar_url, post_image_url, post_thumbnail_url
 
 
 class GetVibemapEventsView(APIView):
+    """
+    GET /get-vibemap-events/?cells=<h3,...> | ?bbox=<min_lng,min_lat,max_lng,max_lat>&zoom=<z>
+    Same viewport contract as GetVibemapNFTsView, for Luma events.
+    """
     permission_classes = [IsAuthenticated]
     throttle_classes = [ScopedRateThrottle]
     throttle_scope = "get_vibemap_events"
@@ -24,76 +29,48 @@ class GetVibemapEventsView(APIView):
             .exclude(is_hide=True)
             .exclude(moderation_status="denied")
             .select_related("owner")
-            .prefetch_related("media", "event_requests")
+            .prefetch_related("media")
             .order_by("-id")
         )
 
-        def coords_from_h3(post: Post) -> tuple[float, float] | None:
-            try:
-                if not post.h3_geo:
-                    return None
-                lat, lng = h3.cell_to_latlng(post.h3_geo)
-                return float(lat), float(lng)
-            except Exception:
-                return None
+        def build_points(posts) -> list:
+            data = []
+            for post in posts:
+                # Determine if the event is still active
+                end_time = post.luma_event_end_time or post.luma_event_start_time
+                is_active = end_time > now if end_time else True
 
-        def owner_avatar_url(post: Post) -> str | None:
-            owner = post.owner
-            if not getattr(owner, "avatar", None):
-                return None
-            raw = str(owner.avatar)
-            if raw.startswith("https://res.cloudinary.com/") or raw.startswith("https://"):
-                return raw
-            return f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{owner.avatar}"
+                data.append(
+                    {
+                        "post_id": post.id,
+                        "lat": post.geo_lat,
+                        "lng": post.geo_lng,
+                        "image": post_image_url(post),
+                        "thumbnail": post_thumbnail_url(post),
+                        "owner_avatar": owner_avatar_url(post),
+                        "owner_username": post.owner.username,
+                        "owner_id": post.owner.user_id,
+                        "about": post.about or "",
+                        "luma_event_url": post.luma_event_url,
+                        "luma_event_start_time": post.luma_event_start_time,
+                        "luma_event_end_time": post.luma_event_end_time,
+                        "is_active": is_active,
+                        "attendee_count": post.approved_count,
+                    }
+                )
+            return data
 
-        def post_image_url(post: Post) -> str | None:
-            media_items = list(getattr(post, "media").all())
-            if not media_items:
-                return None
-            m: PostsMedia = media_items[0]
-            raw = str(m.file)
-            if raw.startswith("https://res.cloudinary.com/") or raw.startswith("https://"):
-                return raw
-            return m.file.url if m.file else None
+        try:
+            payload = map_payload("events", request.query_params, posts, build_points)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        data = []
-        user = request.user
+        # Per-user state is laid over the (shareable, tile-cached) points in one query
+        statuses = request_statuses(request.user.user_id, [point["post_id"] for point in payload["data"]])
+        payload["data"] = [
+            # null | 'pending' | 'approved' | 'rejected'
+            {**point, "request_status": statuses.get(point["post_id"])}
+            for point in payload["data"]
+        ]
 
-        for post in posts:
-            coords = coords_from_h3(post)
-            if not coords:
-                continue
-
-            # Determine if the event is still active
-            end_time = post.luma_event_end_time or post.luma_event_start_time
-            is_active = end_time > now if end_time else True
-
-            # Count approved attendees
-            attendee_count = post.event_requests.filter(
-                status=EventRequest.Status.APPROVED
-            ).count()
-
-            # Check current user's request status
-            user_request = post.event_requests.filter(user=user).first()
-            request_status = user_request.status if user_request else None
-
-            data.append(
-                {
-                    "post_id": post.id,
-                    "lat": coords[0],
-                    "lng": coords[1],
-                    "image": post_image_url(post),
-                    "owner_avatar": owner_avatar_url(post),
-                    "owner_username": post.owner.username,
-                    "owner_id": post.owner.user_id,
-                    "about": post.about or "",
-                    "luma_event_url": post.luma_event_url,
-                    "luma_event_start_time": post.luma_event_start_time,
-                    "luma_event_end_time": post.luma_event_end_time,
-                    "is_active": is_active,
-                    "attendee_count": attendee_count,
-                    "request_status": request_status,  # null | 'pending' | 'approved' | 'rejected'
-                }
-            )
-
-        return Response({"status": "ok", "data": data}, status=status.HTTP_200_OK)
+        return Response({"status": "ok", **payload}, status=status.HTTP_200_OK)
@@ -6,10 +6,49 @@ from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
 
 from ..models import Post, PostsMedia
-import h3
+from ..src.geo_index import map_payload
+
+# Map pins render at roughly 48-64pt; 160px covers 3x screens
+PIN_IMAGE_WIDTH = 160
+
+
+def owner_avatar_url(post: Post) -> str | None:
+    owner = post.owner
+    if not getattr(owner, "avatar", None):
+        return None
+    raw = str(owner.avatar)
+    if raw.startswith("https://res.cloudinary.com/") or raw.startswith("https://"):
+        return raw
+    return f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{owner.avatar}"
+
+
+def post_image_url(post: Post) -> str | None:
+    media_items = list(getattr(post, "media").all())
+    if not media_items:
+        return None
+    m: PostsMedia = media_items[0]
+    raw = str(m.file)
+    if raw.startswith("https://res.cloudinary.com/") or raw.startswith("https://"):
+        return raw
+    return m.file.url if m.file else None
+
+
+def post_thumbnail_url(post: Post) -> str | None:
+    """Pin-sized rendition of the first media item, falling back to the full image."""
+    media_items = list(getattr(post, "media").all())
+    if media_items:
+        thumbnail = media_items[0].image_url(PIN_IMAGE_WIDTH)
+        if thumbnail:
+            return thumbnail
+    return post_image_url(post)
 
 
 class GetVibemapNFTsView(APIView):
+    """
+    GET /get-vibemap-nfts/?cells=<h3,...> | ?bbox=<min_lng,min_lat,max_lng,max_lat>&zoom=<z>
+    Geotagged posts in the viewport, or per-cell clusters when it is dense
+    (see posts.src.geo_index). Without either parameter returns every geotagged post.
+    """
     permission_classes = [IsAuthenticated]
     throttle_classes = [ScopedRateThrottle]
     throttle_scope = "get_vibemap_nfts"
@@ -25,46 +64,23 @@ class GetVibemapNFTsView(APIView):
             .order_by("-id")
         )
 
-        def coords_from_h3(post: Post) -> tuple[float, float] | None:
-            try:
-                if not post.h3_geo:
-                    return None
-                lat, lng = h3.cell_to_latlng(post.h3_geo)
-                return float(lat), float(lng)
-            except Exception:
-                return None
-
-        def owner_avatar_url(post: Post) -> str | None:
-            owner = post.owner
-            if not getattr(owner, "avatar", None):
-                return None
-            raw = str(owner.avatar)
-            if raw.startswith("https://res.cloudinary.com/") or raw.startswith("https://"):
-                return raw
-            return f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{owner.avatar}"
-
-        def post_image_url(post: Post) -> str | None:
-            media_items = list(getattr(post, "media").all())
-            if not media_items:
-                return None
-            m: PostsMedia = media_items[0]
-            raw = str(m.file)
-            if raw.startswith("https://res.cloudinary.com/") or raw.startswith("https://"):
-                return raw
-            return m.file.url if m.file else None
-
-        data = []
-        for post in posts:
-            coords = coords_from_h3(post)
-            data.append(
+        def build_points(posts) -> list:
+            return [
                 {
                     "post_id": post.id,
-                    "lat": (coords[0] if coords else None),
-                    "lng": (coords[1] if coords else None),
+                    "lat": post.geo_lat,
+                    "lng": post.geo_lng,
                     "image": post_image_url(post),
+                    "thumbnail": post_thumbnail_url(post),
                     "owner_avatar": owner_avatar_url(post),
                     "is_nft": post.is_nft,
                 }
-            )
+                for post in posts
+            ]
+
+        try:
+            payload = map_payload("nfts", request.query_params, posts, build_points)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({"status": "ok", "data": data}, status=status.HTTP_200_OK)
+        return Response({"status": "ok", **payload}, status=status.HTTP_200_OK)
@@ -8,6 +8,8 @@ from user.models import Notification
 from user.src.clear_notify_cache import clear_notification_cache
 from rest_framework.throttling import ScopedRateThrottle
 from user.src.send_push_message import send
+from ..src.likes import toggle_post_like
+from ..src import feed_candidates
 
 
 User = get_user_model()
@@ -35,28 +37,16 @@ class LikePostView(APIView):
             Response: A data (success or not) and status
         """
         try:
-            post = Post.objects.get(id=post_id)
+            post = Post.objects.select_related("owner").get(id=post_id)
             
         except Post.DoesNotExist:
             return Response({"data": "Post does not exist"}, status=status.HTTP_404_NOT_FOUND)
-        try:
-            user = User.objects.get(user_id=request.user.user_id)
-        except User.DoesNotExist:
-            return Response({"data": "Error: user not exist"}, status=status.HTTP_404_NOT_FOUND)
+        user = request.user
 
-        if post_id in user.liked_posts:
-            user.liked_posts.remove(post_id)
-            if post.count_likes != 0:
-                post.count_likes -= 1
-                post.save()
-                user.save()
+        if not toggle_post_like(user.user_id, post_id):
             return Response({"data": "Post is unliked"}, status=status.HTTP_200_OK)
         else:
-            user.liked_posts.append(post_id)
-            post.count_likes += 1
-            post.save()
-            user.save()
-
+            feed_candidates.on_like(user.user_id, post.owner_id)
             if user != post.owner:
                 # Check and create notification
                 existing = Notification.objects.filter(
@@ -6,7 +6,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from rest_framework.throttling import ScopedRateThrottle
-from ..tasks import send_post_for_moderation
+from ..src.media_worker import maybe_queue_moderation
+from ..src.event_analytics import record_reputation
 import h3
 
 User = get_user_model()
@@ -97,6 +98,7 @@ class PostViewSet(viewsets.ModelViewSet):
                                 post=post,
                                 post_type="event_post"
                             )
+                            record_reputation(event.id, rep_points)
                             # Reward for the first matching event only
                             break
                     except Exception as e:
@@ -106,7 +108,8 @@ class PostViewSet(viewsets.ModelViewSet):
     def finalize_creation(self, request, pk=None):
         """
         Client call. when post and all medias uploaded.
-        Once start moderation.
+        Moderation starts once every media item has been processed
+        (right away if that already happened).
         """
         post = self.get_object()
         
@@ -119,11 +122,11 @@ class PostViewSet(viewsets.ModelViewSet):
 
         # Update status
         post.moderation_status = "pending"
-        post.save(update_fields=['moderation_status'])
+        post.media_finalized = True
+        post.save(update_fields=['moderation_status', 'media_finalized'])
         
-        # Start Celery task
-        print(f"🚀 Finalize called for post {post.id}. Triggering moderation task.")
-        send_post_for_moderation.delay(post.id)
+        queued = maybe_queue_moderation(post.id)
+        print(f"🚀 Finalize called for post {post.id}. Moderation {'queued' if queued else 'waits for media processing'}.")
         
         return Response({
             "status": "moderation_started",
@@ -7,6 +7,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
 from django.db.models import Prefetch
 from rest_framework.throttling import ScopedRateThrottle
+from ..src.likes import liked_post_ids
 
 User: AbstractUser = get_user_model()
 
@@ -64,7 +65,9 @@ class PostMenuView(APIView):
                 "media": [{
                     "id": m.id, 
                     "media_url": m.file.url if not str(m.file).startswith("https://res.cloudinary.com/") else str(m.file), # Check where media saved
-                    "media_preview": m.preview.url if m.preview else None # Get media if exists
+                    "media_preview": m.preview.url if m.preview else None, # Get media if exists
+                    "srcset": m.srcset,
+                    "hls_url": m.hls_url,
                     } for m in post.media.all()],
                 "create_at": post.create_at,
                 "is_ai_generated": post.is_ai_generated,
@@ -93,5 +96,5 @@ class PostMenuView(APIView):
             "data": data,
             "more_posts": (index + limit) < total_posts,
             "total_posts": total_posts,
-            "liked_posts": user_request.liked_posts
+            "liked_posts": liked_post_ids(user_request.user_id, [post.id for post in posts_qs])
         }, status=status.HTTP_200_OK)
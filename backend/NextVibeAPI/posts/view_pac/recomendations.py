@@ -1,10 +1,11 @@
 from typing import List, Optional
-from ..models import Post, PostsMedia
-from django.db.models import Q, F, Value, CharField
-from django.db.models.functions import Concat
+from ..models import Post, PopularPost
 from random import shuffle, sample
 from django.conf import settings
 
+SAMPLE_SIZE = 6
+USER_POSTS_WINDOW = 60
+
 class Recomendations:
     """
     A class that handles fetching recommendations based on user preferences and popular posts.
@@ -32,52 +33,51 @@ class Recomendations:
         Returns:
             List[dict]: A list of recommended posts with user info.
         """
-        base_queryset = Post.objects.select_related("owner").order_by('-create_at')
-
-        if popular_posts:
-            posts = base_queryset.filter(
-                Q(id__in=popular_posts) | Q(owner__user_id__in=self.users)
+        # Sample ids first from bounded, indexed lists; only the sampled posts are loaded
+        candidate_ids = set(popular_posts or [])
+        if self.users:
+            candidate_ids.update(
+                Post.objects
+                .filter(owner__user_id__in=self.users)
+                .order_by('-create_at')
+                .values_list("id", flat=True)[:USER_POSTS_WINDOW]
             )
-        else:
-            posts = base_queryset.filter(owner__user_id__in=self.users)
-        
-        posts = posts.annotate(
-            avatar_url=Concat(
-                Value(f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/"),
-                F('owner__avatar'),
-                output_field=CharField()
-            )
-        ).values(
-            "id", "about", "create_at", "location", "count_likes", 
-            "is_ai_generated", "moderation_status",
-            "owner__user_id", "owner__username", "avatar_url", "owner__official"
+        if not candidate_ids:
+            return []
+
+        sampled_ids = sample(list(candidate_ids), min(len(candidate_ids), SAMPLE_SIZE))
+        posts = (
+            Post.objects
+            .filter(id__in=sampled_ids)
+            .select_related("owner")
+            .prefetch_related("media")
         )
-        
+
         data = []
         for post in posts:
-            media = PostsMedia.objects.filter(post_id=post["id"])
+            media = post.media.all()
             media_data = [{
                 "id": m.id, 
                 "media_url": m.file.url if not str(m.file).startswith("https://res.cloudinary.com/") else str(m.file), # Check where media saved
                 "media_preview": m.preview.url if m.preview else None # Get media if exists
-                }for m in media] if media.exists() else None
+                }for m in media] if media else None
             data.append({
-                "owner__user_id": post["owner__user_id"],
-                "owner__username": post["owner__username"],
-                "owner__avatar": post["avatar_url"],
-                "owner__official": post["owner__official"],
-                "id": post["id"],
-                "about": post["about"],
-                "location": post["location"],
-                "count_likes": post["count_likes"],
+                "owner__user_id": post.owner.user_id,
+                "owner__username": post.owner.username,
+                "owner__avatar": f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{post.owner.avatar.name}",
+                "owner__official": post.owner.official,
+                "id": post.id,
+                "about": post.about,
+                "location": post.location,
+                "count_likes": post.count_likes,
                 "media": media_data,
-                "create_at": post["create_at"],
-                "is_ai_generated": post["is_ai_generated"],
-                "moderation_status": post["moderation_status"]
+                "create_at": post.create_at,
+                "is_ai_generated": post.is_ai_generated,
+                "moderation_status": post.moderation_status
             })
         
-        return sample(data, min(len(data), 6)) if data else []
-
+        shuffle(data)
+        return data
 
 class RecomendationsFormater:
     """
@@ -110,20 +110,15 @@ class RecomendationsFormater:
         self.__last_follows = last_follows
         self.__last_checked_profiles = last_checked_profiles
         
-        # Get popular posts with more than 1000 likes
-        self.__popular_posts = Post.objects.filter(count_likes__gt=1000).values_list("id", flat=True)
-        
-        # Get posts by popular users (those with more than 50,000 readers or official accounts)
-        self.__posts_by_popular_users = Post.objects.filter(
-            Q(owner__readers_count__gt=50_000) | Q(owner__official=True)
-        ).values_list("id", flat=True)
+        # Popular posts are maintained by posts.tasks.refresh_popular_posts
+        self.__popular_posts = PopularPost.objects.values_list("post_id", flat=True)
 
     def format(self) -> List[dict]:
         global_users = self.__last_search_history + self.__last_likes + self.__last_follows + self.__last_checked_profiles
         shuffle(global_users)  # Randomly shuffle the user data
         
-        # Combine popular posts and posts by popular users, but pass only the IDs
-        all_posts = list(self.__popular_posts) + list(self.__posts_by_popular_users)
+        # Pass only the IDs of the maintained popular posts
+        all_posts = list(self.__popular_posts)
         
         # Return the final recommendations based on shuffled user data and popular posts
         return Recomendations(global_users).get_recomendations_posts(all_posts)
\ No newline at end of file
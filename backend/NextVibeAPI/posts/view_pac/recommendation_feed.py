@@ -2,11 +2,12 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.throttling import ScopedRateThrottle
-from posts.models import Post, Comment, UserCollection, EventRequest
+from posts.models import Post, UserCollection
+from posts.src.event_stats import request_statuses
 from posts.serializers_pac.recommendation_feed_serializer import PostFeedSerializer
-from user.models import HistorySearch, InviteUser
-from django.db.models import Case, When, Value, IntegerField
-from django.core.cache import cache
+from user.src.user_cards import get_cards
+from posts.src.likes import liked_post_ids
+from posts.src import feed_candidates, seen_posts
 import random
 
 
@@ -18,78 +19,49 @@ class RecommendationFeedView(APIView):
     def get(self, request):
         user = request.user
         BATCH_SIZE = 3
+        FALLBACK_WINDOW = 200
+        FALLBACK_CHECK_SIZE = 24
 
-        cache_key = f"seen_posts:user_{user.user_id}"
         if request.query_params.get('reset') == 'true':
-            cache.delete(cache_key)
-            seen_ids = set()
-        else:
-            seen_ids = cache.get(cache_key, set())
-
-        if len(seen_ids) > 1000:
-            seen_ids = set()
-            cache.delete(cache_key)
-
-        following_ids = user.follow_for or []
-
-        last_5_search = list(
-            HistorySearch.objects
-            .filter(user__user_id=user.user_id)
-            .values_list('searched_user__user_id', flat=True)[:5]
-        )
-
-        liked_users = list(
-            Post.objects.filter(id__in=list(user.liked_posts)[:10], is_hide=False)
-            .values_list('owner__user_id', flat=True)
-            .distinct()
-        )
-
-        commented_posts_user = list(
-            Comment.objects
-            .filter(owner__user_id=user.user_id)
-            .select_related('post__owner')
-            .values_list('post__owner__user_id', flat=True)
-            .distinct()[:10]
-        )
-
-        posts_queryset = (
-            Post.objects
-            .select_related('owner', 'owner__og_avatar')
-            .prefetch_related('media')
-            .exclude(owner__user_id=user.user_id)
-            .filter(moderation_status="approved", is_hide=False)
-        )
-
-        if seen_ids:
-            posts_queryset = posts_queryset.exclude(id__in=seen_ids)
-
-        posts_queryset = posts_queryset.annotate(
-            relevance_score=
-            Case(When(owner__user_id__in=following_ids, then=Value(100)), default=Value(0), output_field=IntegerField()) +
-            Case(When(owner__user_id__in=liked_users, then=Value(75)), default=Value(0), output_field=IntegerField()) +
-            Case(When(owner__user_id__in=commented_posts_user, then=Value(60)), default=Value(0), output_field=IntegerField()) +
-            Case(When(owner__user_id__in=last_5_search, then=Value(50)), default=Value(0), output_field=IntegerField())
-        ).order_by('-relevance_score', '-count_likes', '-create_at')
-
-        posts_list = list(posts_queryset[:50])
+            seen_posts.reset(user.user_id)
+            feed_candidates.reset(user.user_id)
+
+        # O(page) read from the precomputed ranking; None until the first rebuild lands
+        candidate_ids = feed_candidates.pop_page(user.user_id, BATCH_SIZE)
+        posts_list = []
+        if candidate_ids:
+            by_id = {
+                p.id: p
+                for p in Post.objects
+                .select_related('owner')
+                .prefetch_related('media')
+                .filter(id__in=candidate_ids, moderation_status="approved", is_hide=False)
+            }
+            posts_list = [by_id[pid] for pid in candidate_ids if pid in by_id]
 
-        MIN_POSTS = 20
-        if len(posts_list) < MIN_POSTS:
-            random_count = MIN_POSTS - len(posts_list)
+        if len(posts_list) < BATCH_SIZE:
+            random_count = BATCH_SIZE - len(posts_list)
             candidate_ids = list(
                 Post.objects
                 .filter(moderation_status="approved", is_hide=False)
                 .exclude(owner__user_id=user.user_id)
-                .exclude(id__in=seen_ids)
-                .exclude(id__in=[p.id for p in posts_list])
-                .values_list('id', flat=True)[:500]
+                .order_by('-create_at')
+                .values_list('id', flat=True)[:FALLBACK_WINDOW]
             )
-            if candidate_ids:
-                sample_size = min(random_count, len(candidate_ids))
-                random_ids = random.sample(candidate_ids, sample_size)
+            # Seen posts are filtered after retrieval instead of shipping an id list to SQL
+            served = {p.id for p in posts_list}
+            random.shuffle(candidate_ids)
+            random_ids = []
+            for i in range(0, len(candidate_ids), FALLBACK_CHECK_SIZE):
+                chunk = [pid for pid in candidate_ids[i:i + FALLBACK_CHECK_SIZE] if pid not in served]
+                random_ids.extend(seen_posts.filter_unseen(user.user_id, chunk))
+                if len(random_ids) >= random_count:
+                    break
+            random_ids = random_ids[:random_count]
+            if random_ids:
                 additional = (
                     Post.objects
-                    .select_related('owner', 'owner__og_avatar')
+                    .select_related('owner')
                     .prefetch_related('media')
                     .filter(id__in=random_ids, moderation_status="approved")
                 )
@@ -113,16 +85,9 @@ class RecommendationFeedView(APIView):
             .values_list('post_id', flat=True)
         )
 
-        invite_counts = {
-            inv.owner_id: inv.invited_count
-            for inv in InviteUser.objects.filter(owner_id__in=owner_ids)
-        }
+        owner_cards = get_cards(owner_ids)
 
-        event_requests = EventRequest.objects.filter(
-            post_id__in=post_ids,
-            user=user
-        ).values_list('post_id', 'status')
-        event_request_statuses = dict(event_requests)
+        event_request_statuses = request_statuses(user.user_id, post_ids)
 
         serializer = PostFeedSerializer(
             final_batch,
@@ -131,17 +96,15 @@ class RecommendationFeedView(APIView):
                 'request': request,
                 'nft_prices': nft_prices,
                 'claimed_post_ids': claimed_post_ids,
-                'invite_counts': invite_counts,
+                'owner_cards': owner_cards,
                 'event_request_statuses': event_request_statuses,
             }
         )
 
-        new_ids = {p.id for p in final_batch}
-        if new_ids:
-            cache.set(cache_key, seen_ids.union(new_ids), timeout=3600)
+        seen_posts.mark_seen(user.user_id, post_ids)
 
         return Response({
             "results": serializer.data,
             "count": len(final_batch),
-            "liked_posts": user.liked_posts,
+            "liked_posts": liked_post_ids(user.user_id, post_ids),
         })
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, HistorySearch, Notification, UserOnlineSession, InviteUser, OgAvatarMint
+from .models import User, HistorySearch, Notification, UserOnlineSession, InviteUser, OgAvatarMint, Follow
 from django.contrib import admin
 
 @admin.register(User)
@@ -18,3 +18,4 @@ admin.site.register(Notification)
 admin.site.register(UserOnlineSession)
 admin.site.register(InviteUser)
 admin.site.register(OgAvatarMint)
+admin.site.register(Follow)
@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from datetime import timedelta
+from user.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the legacy User.readers / User.follow_for JSON arrays into the Follow edge table "
+        "and recompute readers_count / follows_count. Runs in small batches and is safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users read per batch')
+        parser.add_argument('--start-id', type=int, default=0, help='Resume from this user_id')
+        parser.add_argument('--skip-counters', action='store_true', help='Only copy edges')
+
+    def handle(self, *args, **options):
+        existing_ids = set(User.all_objects.values_list('user_id', flat=True))
+        # Backfilled edges are dated just before the run, so real follows made since sort first
+        started = timezone.now()
+
+        # Readers first: an edge takes its created_at from the array it is copied from, and
+        # the unique constraint makes the follow_for copy of the same edge a no-op
+        copied = self.copy_edges('readers', existing_ids, started, options)
+        copied += self.copy_edges('follow_for', existing_ids, started, options)
+
+        if not options['skip_counters']:
+            self.recompute_counters(options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"Follow backfill finished: {copied} array entries copied"))
+
+    def copy_edges(self, field: str, existing_ids: set, started, options) -> int:
+        """
+        Old arrays were appended in follow order, so entry i of n is dated
+        `started - (n - i)` seconds: a user's readers list keeps its old order
+        newest-first. The follows listing is ordered by the readers arrays'
+        dates and only matches its old follow_for order where the data agrees.
+        """
+        last_id = options['start_id'] - 1
+        copied = 0
+        while True:
+            batch = list(
+                User.all_objects
+                .filter(user_id__gt=last_id)
+                .order_by('user_id')
+                .values_list('user_id', field)[:options['batch_size']]
+            )
+            if not batch:
+                break
+
+            edges = []
+            for user_id, other_ids in batch:
+                other_ids = other_ids or []
+                for i, other_id in enumerate(other_ids):
+                    if other_id not in existing_ids or other_id == user_id:
+                        continue
+                    created_at = started - timedelta(seconds=len(other_ids) - i)
+                    if field == 'readers':
+                        edges.append(Follow(follower_id=other_id, following_id=user_id, created_at=created_at))
+                    else:
+                        edges.append(Follow(follower_id=user_id, following_id=other_id, created_at=created_at))
+
+            Follow.objects.bulk_create(edges, batch_size=1000, ignore_conflicts=True)
+            copied += len(edges)
+
+            last_id = batch[-1][0]
+            self.stdout.write(f"Processed {field} of users up to {last_id}")
+        return copied
+
+    def recompute_counters(self, batch_size: int):
+        readers = Follow.objects.filter(following_id=OuterRef('user_id')).order_by().values('following_id') \
+            .annotate(c=Count('id')).values('c')
+        follows = Follow.objects.filter(follower_id=OuterRef('user_id')).order_by().values('follower_id') \
+            .annotate(c=Count('id')).values('c')
+
+        last_id = -1
+        while True:
+            ids = list(
+                User.all_objects.filter(user_id__gt=last_id).order_by('user_id')
+                .values_list('user_id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            User.all_objects.filter(user_id__in=ids).update(
+                readers_count=Coalesce(Subquery(readers, output_field=IntegerField()), Value(0)),
+                follows_count=Coalesce(Subquery(follows, output_field=IntegerField()), Value(0)),
+            )
+            last_id = ids[-1]
+        self.stdout.write("Recomputed readers_count / follows_count")
@@ -101,6 +101,27 @@ class HistorySearch(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="user_history")
     searched_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="searched_user")
 
+class Follow(models.Model):
+    """
+    One row per follower -> following edge; replaces the follow_for/readers JSON arrays on User.
+    """
+    follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name="following_edges")
+    following = models.ForeignKey(User, on_delete=models.CASCADE, related_name="follower_edges")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["follower", "following"], name="user_follow_unique_edge"),
+        ]
+        indexes = [
+            # Keyset listings: readers of a user / users a user follows, newest first
+            models.Index(fields=["following", "-created_at", "-id"], name="user_follow_readers_idx"),
+            models.Index(fields=["follower", "-created_at", "-id"], name="user_follow_follows_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.follower_id} -> {self.following_id}"
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = (
         ('like', 'Like'),
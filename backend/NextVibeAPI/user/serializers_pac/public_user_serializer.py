@@ -13,7 +13,7 @@ class PublicUserDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = User
-        exclude = ('password',)
+        exclude = ('password', 'liked_posts', 'liked_comments', 'liked_comment_replies')
 
     def get_posts_count(self, obj):
         """
@@ -10,7 +10,7 @@ class UserDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = User
-        exclude = ('password',)
+        exclude = ('password', 'follow_for', 'readers', 'liked_posts', 'liked_comments', 'liked_comment_replies')
 
     def get_posts_count(self, obj):
         # get the current number of posts
@@ -3,10 +3,12 @@ import logging
 
 import httpx
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import Notification, User
+from .models import InviteUser, Notification, OgAvatarMint, User
+from user.src import user_cards
 from user.src.send_push_message import send
 from user.src.clear_notify_cache import clear_notification_cache
 
@@ -91,4 +93,21 @@ def sync_wallet_to_indexer(sender, instance, created, update_fields, **kwargs):
             "Indexer register failed for %s: %s",
             instance.wallet_address,
             error,
-        )
\ No newline at end of file
+        )
+
+CARD_FIELDS = {"username", "avatar", "official"}
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_card(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not CARD_FIELDS.intersection(update_fields):
+        return
+    # After commit, so a concurrent reader can't cache the pre-save row again
+    transaction.on_commit(lambda: user_cards.invalidate(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=InviteUser)
+@receiver([post_save, post_delete], sender=OgAvatarMint)
+def invalidate_owner_card(sender, instance, **kwargs):
+    owner_id = instance.owner_id if sender is InviteUser else instance.user_id
+    transaction.on_commit(lambda: user_cards.invalidate(owner_id))
@@ -0,0 +1,92 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, F, Q, Value
+from django.db.models.functions import Concat
+from ..models import Follow, User
+
+PAGE_SIZE = 12
+
+
+def following_ids(user_id: int) -> List[int]:
+    return list(Follow.objects.filter(follower_id=user_id).values_list("following_id", flat=True))
+
+
+def is_following(follower_id: int, following_id: int) -> bool:
+    return Follow.objects.filter(follower_id=follower_id, following_id=following_id).exists()
+
+
+def toggle_follow(follower_id: int, following_id: int) -> bool:
+    """
+    Deletes the edge if it exists, inserts it otherwise, and moves both counters
+    with F() updates in the same transaction. Returns True when the call followed.
+    """
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(follower_id=follower_id, following_id=following_id).delete()
+        if deleted:
+            User.all_objects.filter(user_id=follower_id).update(follows_count=F("follows_count") - 1)
+            User.all_objects.filter(user_id=following_id).update(readers_count=F("readers_count") - 1)
+            return False
+
+        _, created = Follow.objects.get_or_create(follower_id=follower_id, following_id=following_id)
+        if created:
+            User.all_objects.filter(user_id=follower_id).update(follows_count=F("follows_count") + 1)
+            User.all_objects.filter(user_id=following_id).update(readers_count=F("readers_count") + 1)
+        return True
+
+
+def encode_cursor(created_at: datetime, edge_id: int) -> str:
+    return f"{created_at.isoformat()}_{edge_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    # An unencoded "+" in the UTC offset arrives as a space
+    created_at, edge_id = cursor.replace(" ", "+").rsplit("_", 1)
+    return datetime.fromisoformat(created_at), int(edge_id)
+
+
+def list_page(user_id: int, side: str, cursor: Optional[str] = None, index: int = 0) -> Dict:
+    """
+    One page of a user's readers (side="follower") or follows (side="following"),
+    newest edge first. `cursor` is the keyset position from the previous page's
+    `next_cursor`; `index` is the legacy offset and is only used without a cursor.
+    Raises ValueError on a malformed cursor.
+    """
+    owner_field = "following_id" if side == "follower" else "follower_id"
+    edges = (
+        Follow.objects
+        .filter(**{owner_field: user_id, f"{side}__is_baned": False})
+        .order_by("-created_at", "-id")
+    )
+    offset = 0
+    if cursor:
+        created_at, edge_id = decode_cursor(cursor)
+        edges = edges.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=edge_id))
+    else:
+        offset = max(index, 0)
+
+    rows = list(
+        edges.annotate(
+            avatar_url=Concat(
+                Value(f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/"),
+                F(f"{side}__avatar"),
+                output_field=CharField()
+            )
+        ).values("id", "created_at", "avatar_url", f"{side}__username", f"{side}__user_id", f"{side}__official")
+        [offset:offset + PAGE_SIZE + 1]
+    )
+    has_more = len(rows) > PAGE_SIZE
+    rows = rows[:PAGE_SIZE]
+
+    data = [
+        {
+            "avatar": row["avatar_url"],
+            "username": row[f"{side}__username"],
+            "user_id": row[f"{side}__user_id"],
+            "official": row[f"{side}__official"],
+        }
+        for row in rows
+    ]
+    next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if has_more else None
+    return {"data": data, "end": not has_more, "next_cursor": next_cursor}
@@ -0,0 +1,134 @@
+"""
+Denormalized "user cards": the owner decorations every listing shows next to
+a post, comment or search hit (avatar URL, official, OG edition, invite count).
+
+Cards live as JSON in one Redis hash keyed by user_id, so a listing reads all
+of its owners with a single HMGET. Misses are built with one query and written
+back. Signals on User, InviteUser and OgAvatarMint drop the affected card.
+
+Each invalidation also bumps the user's generation key. A miss reads the
+generations before its query and writes back (under WATCH) only the cards
+whose generation is unchanged, so a reader that raced an update can't put the
+old card back.
+"""
+import json
+import logging
+from typing import Dict, Iterable, List, Optional
+import redis
+from django.conf import settings
+from django_redis import get_redis_connection
+from ..models import InviteUser, User
+
+logger = logging.getLogger(__name__)
+
+CARDS_KEY = "user:cards"
+GENERATION_KEY = "user:cards:gen:{user_id}"
+GENERATION_TTL = 24 * 60 * 60
+
+
+def generation_key(user_id: int) -> str:
+    return GENERATION_KEY.format(user_id=user_id)
+
+
+def build_avatar(user: User) -> Optional[str]:
+    if not user.avatar:
+        return None
+    raw = str(user.avatar)
+    return raw if raw.startswith("https://") else f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{raw}"
+
+
+def _build_cards(user_ids: Iterable[int]) -> Dict[int, dict]:
+    user_ids = list(user_ids)
+    users = (
+        User.all_objects
+        .filter(user_id__in=user_ids)
+        .select_related("og_avatar")
+    )
+    invite_counts = dict(
+        InviteUser.objects.filter(owner_id__in=user_ids).values_list("owner_id", "invited_count")
+    )
+    cards = {}
+    for u in users:
+        og = getattr(u, "og_avatar", None)
+        cards[u.user_id] = {
+            "user_id": u.user_id,
+            "username": u.username,
+            "avatar": build_avatar(u),
+            "official": u.official,
+            "is_og": og is not None,
+            "og_edition": og.edition if og is not None else None,
+            "invited_count": invite_counts.get(u.user_id) or 0,
+        }
+    return cards
+
+
+def get_cards(user_ids: Iterable[int]) -> Dict[int, dict]:
+    """
+    Cards for `user_ids` keyed by user_id: one HMGET, plus one query for misses.
+    Falls back to the database if Redis is down.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+
+    try:
+        r = get_redis_connection("default")
+        raw = r.hmget(CARDS_KEY, [str(uid) for uid in user_ids])
+    except Exception as e:
+        logger.error(f"Error reading user cards: {e}")
+        return _build_cards(user_ids)
+
+    cards = {uid: json.loads(value) for uid, value in zip(user_ids, raw) if value is not None}
+    missing = [uid for uid in user_ids if uid not in cards]
+    if missing:
+        try:
+            generations = r.mget([generation_key(uid) for uid in missing])
+        except Exception as e:
+            logger.error(f"Error reading user card generations: {e}")
+            generations = None
+        built = _build_cards(missing)
+        cards.update(built)
+        if built and generations is not None:
+            _store(r, missing, generations, built)
+    return cards
+
+
+def _store(r, user_ids: List[int], generations: list, built: Dict[int, dict]) -> None:
+    """Writes back the built cards whose user was not invalidated since `generations` was read."""
+    keys = [generation_key(uid) for uid in user_ids]
+    try:
+        with r.pipeline(transaction=True) as pipe:
+            pipe.watch(*keys)
+            current = pipe.mget(keys)
+            mapping = {
+                str(uid): json.dumps(built[uid])
+                for uid, before, now in zip(user_ids, generations, current)
+                if before == now and uid in built
+            }
+            if not mapping:
+                pipe.reset()
+                return
+            pipe.multi()
+            pipe.hset(CARDS_KEY, mapping=mapping)
+            pipe.execute()
+    except redis.WatchError:
+        # One of the users was invalidated while writing; the next read rebuilds
+        pass
+    except Exception as e:
+        logger.error(f"Error storing user cards: {e}")
+
+
+def get_card(user_id: int) -> Optional[dict]:
+    return get_cards([user_id]).get(user_id)
+
+
+def invalidate(user_id: int) -> None:
+    try:
+        pipe = get_redis_connection("default").pipeline(transaction=True)
+        # Makes in-flight misses skip writing back the old card
+        pipe.incr(generation_key(user_id))
+        pipe.expire(generation_key(user_id), GENERATION_TTL)
+        pipe.hdel(CARDS_KEY, str(user_id))
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error invalidating user card {user_id}: {e}")
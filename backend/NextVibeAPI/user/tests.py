@@ -1,9 +1,12 @@
+from unittest import mock
 from django.test import TestCase
+from django_redis import get_redis_connection
 from django.contrib.auth import get_user_model
 from user.models import InviteUser
 from posts.models import Reputation
 from user.serializers_pac.registration import UserRegistrationSerializer
 from user.src.grant_invite_reward import check_and_grant_invite_rewards
+from user.src import user_cards
 
 User = get_user_model()
 
@@ -100,3 +103,41 @@ class InviteSystemTest(TestCase):
         force_authenticate(request2, user=wallet_user)
         response2 = view(request2)
         self.assertEqual(response2.status_code, 400)
+
+
+class UserCardsCacheTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="card@example.com",
+            username="card",
+            password="Password123!"
+        )
+        self.redis = get_redis_connection("default")
+        self.redis.hdel(user_cards.CARDS_KEY, str(self.user.user_id))
+        self.addCleanup(self.redis.hdel, user_cards.CARDS_KEY, str(self.user.user_id))
+
+    def _cached(self):
+        return self.redis.hget(user_cards.CARDS_KEY, str(self.user.user_id))
+
+    def test_miss_is_written_back(self):
+        card = user_cards.get_card(self.user.user_id)
+
+        self.assertEqual(card["username"], "card")
+        self.assertIsNotNone(self._cached())
+
+    def test_card_invalidated_during_a_miss_is_not_written_back(self):
+        build = user_cards._build_cards
+
+        def build_then_update(user_ids):
+            cards = build(user_ids)
+            # The rename commits and invalidates after this reader's query
+            User.objects.filter(user_id=self.user.user_id).update(username="renamed")
+            user_cards.invalidate(self.user.user_id)
+            return cards
+
+        with mock.patch.object(user_cards, "_build_cards", side_effect=build_then_update):
+            stale = user_cards.get_card(self.user.user_id)
+
+        self.assertEqual(stale["username"], "card")
+        self.assertIsNone(self._cached())
+        self.assertEqual(user_cards.get_card(self.user.user_id)["username"], "renamed")
@@ -8,6 +8,8 @@ from ..models import Notification
 from datetime import timedelta
 from django.utils import timezone
 from user.src.clear_notify_cache import clear_notification_cache
+from user.src.follow_graph import toggle_follow
+from posts.src import feed_candidates
 
 from rest_framework.throttling import ScopedRateThrottle
 
@@ -26,25 +28,11 @@ class FollowView(APIView):
         except ObjectDoesNotExist:
             return Response({"error": "User not found"}, status=404)
         
-        if follow_id in user.follow_for:
-            # Unfollow
-            if id in user2.readers:
-                user2.readers.remove(id)
-            user2.readers_count = len(user2.readers)
-            
-            user.follow_for.remove(follow_id)
-            user.follows_count = len(user.follow_for)
+        followed = toggle_follow(id, follow_id)
 
-            user.save()
-            user2.save()
-        else:
-            # Follow
-            user.follow_for.append(follow_id)
-            user.follows_count = len(user.follow_for)
+        if followed:
+            feed_candidates.on_follow(id, follow_id)
 
-            user2.readers.append(id)
-            user2.readers_count = len(user2.readers)
-            
             # Notification logic
             recent = Notification.objects.filter(
                 sender=user,
@@ -60,14 +48,8 @@ class FollowView(APIView):
                     notification_type='follow',
                     text_preview=f"{user.username} followed you!"
                 )
-
-            user.save()
-            user2.save()
         
         # Clear cache
-        for page in range(5):
-            for end in ['True', 'False']:
-                cache.delete(f"readers_{follow_id}_page_{page}_end_{end}")
-                cache.delete(f"follows_{id}_page_{page}_end_{end}")
+        cache.delete_many([f"readers_{follow_id}_first_page", f"follows_{id}_first_page"])
         
         return Response({"message": "Success"}, status=200)
@@ -5,20 +5,12 @@ from rest_framework.permissions import IsAuthenticated
 from ..models import HistorySearch
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
-from django.conf import settings
 from rest_framework.throttling import ScopedRateThrottle
-from user.models import InviteUser
+from user.src.user_cards import get_cards
 
 User = get_user_model()
 
 
-def build_avatar(user):
-    if not user.avatar:
-        return None
-    raw = str(user.avatar)
-    return raw if raw.startswith("https://") else f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{raw}"
-
-
 class HistorySearchView(APIView):
     """
     A class for create and delete user history search
@@ -33,31 +25,26 @@ class HistorySearchView(APIView):
         history = (
             HistorySearch.objects
             .filter(user__user_id=user_id)
-            .select_related("searched_user", "searched_user__og_avatar")
+            .select_related("searched_user")
             .order_by("-id")[:5]
         )
 
         searched_users = [entry.searched_user for entry in history]
 
-        invite_counts = {
-            inv.owner_id: inv.invited_count
-            for inv in InviteUser.objects.filter(
-                owner_id__in=[u.user_id for u in searched_users]
-            )
-        }
+        cards = get_cards(u.user_id for u in searched_users)
 
         data = []
         for u in searched_users:
-            og = getattr(u, "og_avatar", None)
+            card = cards.get(u.user_id, {})
             data.append({
                 "user_id": u.user_id,
                 "username": u.username,
-                "avatar": build_avatar(u),
-                "official": u.official,
+                "avatar": card.get("avatar"),
+                "official": card.get("official"),
                 "readers_count": u.readers_count,
-                "is_og": og is not None,
-                "og_edition": og.edition if og is not None else None,
-                "invited_count": invite_counts.get(u.user_id, 0),
+                "is_og": card.get("is_og", False),
+                "og_edition": card.get("og_edition"),
+                "invited_count": card.get("invited_count", 0),
             })
 
         return Response({"data": data}, status=200)
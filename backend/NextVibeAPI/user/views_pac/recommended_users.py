@@ -2,7 +2,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
-from user.models import InviteUser
+from user.models import Follow
+from user.src.user_cards import get_cards
 import random
 
 User = get_user_model()
@@ -13,18 +14,17 @@ class RecommendedUsersView(APIView):
 
     def get(self, request, id):
         try:
-            user = User.objects.only("user_id", "follow_for").get(user_id=id)
+            user = User.objects.only("user_id").get(user_id=id)
         except User.DoesNotExist:
             return Response({"error": "User not found"}, status=404)
 
-        follow_for = user.follow_for or []
+        followed = Follow.objects.filter(follower_id=user.user_id).values("following_id")
 
         qs = list(
             User.objects
             .exclude(user_id=user.user_id)
-            .exclude(user_id__in=follow_for)
-            .select_related("og_avatar")
-            .only("user_id", "username", "avatar", "official", "about")
+            .exclude(user_id__in=followed)
+            .only("user_id", "username", "about")
             [:200]  
         )
 
@@ -36,8 +36,7 @@ class RecommendedUsersView(APIView):
                 User.objects
                 .exclude(user_id=user.user_id)
                 .exclude(user_id__in=[u.user_id for u in recommended_users])
-                .select_related("og_avatar")
-                .only("user_id", "username", "avatar", "official", "about")
+                .only("user_id", "username", "about")
                 [:50]
             )
             random.shuffle(fallback)
@@ -46,25 +45,28 @@ class RecommendedUsersView(APIView):
                 if len(recommended_users) >= 3:
                     break
 
-        # Bulk InviteUser
         owner_ids = [u.user_id for u in recommended_users]
-        invite_counts = {
-            inv.owner_id: inv.invited_count
-            for inv in InviteUser.objects.filter(owner_id__in=owner_ids)
-        }
+        cards = get_cards(owner_ids)
 
         data = []
         for u in recommended_users:
-            og = getattr(u, 'og_avatar', None)
+            card = cards.get(u.user_id, {})
             data.append({
                 "id": u.user_id,
                 "username": u.username,
-                "avatar": u.avatar.url if u.avatar else None,
-                "official": u.official,
+                "avatar": card.get("avatar"),
+                "official": card.get("official"),
                 "about": u.about,
-                "is_og": og is not None,
-                "og_edition": og.edition if og is not None else None,
-                "invited_count": invite_counts.get(u.user_id, 0),
+                "is_og": card.get("is_og", False),
+                "og_edition": card.get("og_edition"),
+                "invited_count": card.get("invited_count", 0),
             })
 
+        # Which of the returned users are already followed (only the fallback can contain them)
+        follow_for = list(
+            Follow.objects
+            .filter(follower_id=user.user_id, following_id__in=owner_ids)
+            .values_list("following_id", flat=True)
+        )
+
         return Response({"recommended_users": data, "follow_for": follow_for}, status=200)
\ No newline at end of file
@@ -4,6 +4,7 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
 from rest_framework.throttling import ScopedRateThrottle
+from chat.src.membership_cache import invalidate_chat_membership
 
 
 User = get_user_model()
@@ -28,8 +29,11 @@ class SavePushTokenView(APIView):
                 "error": "Token not found."
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        user.expo_push_token = token
-        user.save()
+        if user.expo_push_token != token:
+            user.expo_push_token = token
+            user.save()
+            # Cached chat memberships carry push tokens
+            invalidate_chat_membership(user.chats.values_list("id", flat=True))
         return Response({
             "data": "Token saved"
         }, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -8,6 +8,7 @@ from rest_framework.throttling import ScopedRateThrottle
 from ..serializers_pac import UserDetailSerializer
 from posts.models import UserCollection, Reputation
 from user.models import InviteUser, OgAvatarMint
+from user.src.follow_graph import is_following
 from django.db.models import Sum
 
 User = get_user_model()
@@ -49,9 +50,7 @@ class UserDetailView(APIView):
 
             is_subscribed = False
             if isProfile == "true":
-                owner = User.objects.get(user_id=request.user.user_id)
-                if data["user_id"] in owner.follow_for:
-                   is_subscribed = True
+                is_subscribed = is_following(request.user.user_id, data["user_id"])
 
             if id != request.user.user_id:
                 for banned_field in BANED_FIELDS:
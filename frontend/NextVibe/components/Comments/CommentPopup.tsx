@@ -17,6 +17,7 @@ import {
     useColorScheme,
 } from 'react-native';
 import getComments from '@/src/api/get.comments';
+import { appendComments, loadMoreReplies, mergeLiked, replyTotal } from '@/src/utils/commentPages';
 import { Heart, ChevronDown, ChevronUp, X, MessageSquareOff, MessageSquare, ArrowUp } from 'lucide-react-native';
 import timeAgo from '@/src/utils/formatTime';
 import { ActivityIndicator } from '../CustomActivityIndicator';
@@ -61,6 +62,8 @@ interface Reply extends BaseComment {
 interface Comment extends BaseComment {
     id: number;
     replies: Reply[];
+    replies_count?: number;
+    replies_next_cursor?: string | null;
 }
 
 interface UserData {
@@ -71,8 +74,6 @@ interface UserData {
     readers_count: number;
     follows_count: number;
     official: boolean;
-    liked_comments: number[];
-    liked_comment_replies: number[];
 }
 
 interface PopupModalProps {
@@ -93,6 +94,8 @@ const PopupModal = ({ post_id, isCommentsEnabled = true, onClose, isFocused }: P
     const [comments, setComments] = useState<Comment[]>([]);
     const [expandedComments, setExpandedComments] = useState<{ [key: number]: number }>({});
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [user, setUser] = useState<UserData>();
     const [owner, setOwner] = useState<string | null>(null);
     const [likedComments, setLikedComments] = useState<{
@@ -119,6 +122,8 @@ const PopupModal = ({ post_id, isCommentsEnabled = true, onClose, isFocused }: P
                 if (data && typeof data === 'object' && Array.isArray(data.comments)) {
                     setOwner(data.author ?? null);
                     setComments(data.comments);
+                    setNextCursor(data.next_cursor ?? null);
+                    setLikedComments(mergeLiked({ comments: {}, replies: {} }, data));
                 } else {
                     setComments([]);
                 }
@@ -132,20 +137,27 @@ const PopupModal = ({ post_id, isCommentsEnabled = true, onClose, isFocused }: P
         const getUser = async () => {
             const u = await getUserDetail();
             setUser(u);
-            setLikedComments({
-                comments: u.liked_comments.reduce(
-                    (acc: any, id: number) => ({ ...acc, [id]: true }), {}
-                ),
-                replies: u.liked_comment_replies.reduce(
-                    (acc: any, id: number) => ({ ...acc, [id]: true }), {}
-                ),
-            });
         };
 
         getUser();
         getData();
     }, [post_id]);
 
+    const loadMoreComments = async () => {
+        if (!nextCursor || loadingMore) return;
+        setLoadingMore(true);
+        try {
+            const data = await getComments(post_id, nextCursor);
+            if (data && Array.isArray(data.comments)) {
+                setComments(prev => appendComments(prev, data.comments));
+                setNextCursor(data.next_cursor ?? null);
+                setLikedComments(prev => mergeLiked(prev, data));
+            }
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleClose = () => {
         Animated.timing(slideAnim, {
             toValue: SCREEN_HEIGHT,
@@ -191,11 +203,21 @@ const PopupModal = ({ post_id, isCommentsEnabled = true, onClose, isFocused }: P
         );
     };
 
-    const showMoreReplies = (commentId: number, totalReplies: number) => {
+    const showMoreReplies = async (item: Comment) => {
+        let loaded = item.replies?.length || 0;
+        const wanted = (expandedComments[item.id] || 0) + REPLIES_BATCH_SIZE;
+        if (wanted > loaded && item.replies_next_cursor) {
+            const page = await loadMoreReplies<Reply, Comment>(item);
+            if (page) {
+                loaded = page.comment.replies.length;
+                setComments(prev => prev.map(c => (c.id === item.id ? page.comment : c)));
+                setLikedComments(prev => mergeLiked(prev, { liked_comment_replies: page.likedReplies }));
+            }
+        }
         LayoutAnimation.configureNext(LayoutAnimation.Presets.easeInEaseOut);
         setExpandedComments(prev => ({
             ...prev,
-            [commentId]: Math.min(totalReplies, (prev[commentId] || 0) + REPLIES_BATCH_SIZE),
+            [item.id]: Math.min(loaded, (prev[item.id] || 0) + REPLIES_BATCH_SIZE),
         }));
     };
 
@@ -232,7 +254,7 @@ const PopupModal = ({ post_id, isCommentsEnabled = true, onClose, isFocused }: P
                         if (c.id === commentId) {
                             const updated = [...(c.replies || []), response];
                             newTotal = updated.length;
-                            return { ...c, replies: updated };
+                            return { ...c, replies: updated, replies_count: replyTotal(c) + 1 };
                         }
                         return c;
                     })
@@ -302,8 +324,8 @@ const PopupModal = ({ post_id, isCommentsEnabled = true, onClose, isFocused }: P
 
     const renderComment = ({ item }: { item: Comment }) => {
         const visibleCount = expandedComments[item.id] || 0;
-        const totalReplies = item.replies?.length || 0;
-        const allShown = visibleCount === totalReplies;
+        const totalReplies = replyTotal(item);
+        const allShown = visibleCount >= totalReplies;
 
         return (
             <View style={styles.commentContainer}>
@@ -351,7 +373,7 @@ const PopupModal = ({ post_id, isCommentsEnabled = true, onClose, isFocused }: P
                         {totalReplies > 0 && (
                             <View style={styles.repliesButtonContainer}>
                                  {!allShown && (
-                                    <TouchableOpacity hitSlop={{ top: 8, bottom: 8, left: 8, right: 8 }} onPress={() => showMoreReplies(item.id, totalReplies)} style={styles.replyToggleBtn}>
+                                    <TouchableOpacity hitSlop={{ top: 8, bottom: 8, left: 8, right: 8 }} onPress={() => showMoreReplies(item)} style={styles.replyToggleBtn}>
                                         <Text style={styles.toggleRepliesText}>
                                             {visibleCount === 0 ? `View replies: ${totalReplies}` : `View ${totalReplies - visibleCount} more`}
                                         </Text>
@@ -372,7 +394,7 @@ const PopupModal = ({ post_id, isCommentsEnabled = true, onClose, isFocused }: P
         );
     };
 
-    const totalCount = comments.reduce((total, c) => total + 1 + (c.replies?.length || 0), 0);
+    const totalCount = comments.reduce((total, c) => total + 1 + replyTotal(c), 0);
 
     return (
         <Modal
@@ -424,6 +446,9 @@ const PopupModal = ({ post_id, isCommentsEnabled = true, onClose, isFocused }: P
                             contentContainerStyle={styles.listContent}
                             showsVerticalScrollIndicator={false}
                             keyboardShouldPersistTaps="handled"
+                            onEndReached={loadMoreComments}
+                            onEndReachedThreshold={0.5}
+                            ListFooterComponent={loadingMore ? <ActivityIndicator color="#A855F7" style={{ marginVertical: 12 }} /> : null}
                         />
                     )}
 
@@ -4,6 +4,7 @@ import { Heart, ChevronDown, ChevronUp } from "lucide-react-native";
 import { AvatarWithFrame } from "@/components/ProfilePage/AvatarWithFrame";
 import VerifyBadge from "@/components/VerifyBadge";
 import timeAgo from "@/src/utils/formatTime";
+import { replyTotal } from "@/src/utils/commentPages";
 
 const REPLIES_BATCH = 3;
 const TRUNCATE_AT = 200;
@@ -34,6 +35,8 @@ export interface Comment {
     create_at: string;
     count_likes: number;
     replies: Reply[];
+    replies_count?: number;
+    replies_next_cursor?: string | null;
 }
 
 export interface LikedComments {
@@ -137,20 +140,23 @@ interface CommentProps {
     isLast: boolean;
     highlightedCommentId?: number | null;
     highlightedReplyId?: number | null;
+    /** Fetches the next page of this thread's replies; resolves to how many are loaded now. */
+    onLoadMoreReplies?: (item: Comment) => Promise<number>;
 }
 
 /**
  * Replies are revealed in batches of {@link REPLIES_BATCH} to avoid rendering large threads
- * all at once. The thread line (left border) is only shown while at least one reply is visible,
+ * all at once; the response only carries the first few, the rest are fetched page by page
+ * through `onLoadMoreReplies` as the user expands. The thread line (left border) is only shown while at least one reply is visible,
  * visually connecting the avatar to its replies. `LayoutAnimation` makes expand/collapse smooth
  * without re-rendering the parent list.
  */
 export const CommentItem: React.FC<CommentProps> = ({
     item, likedComments, onLike, onReply, theme, isLast,
-    highlightedCommentId, highlightedReplyId,
+    highlightedCommentId, highlightedReplyId, onLoadMoreReplies,
 }) => {
     const [textExpanded, setTextExpanded] = useState(false);
-    const total = item.replies?.length ?? 0;
+    const total = replyTotal(item);
 
     const [visibleReplies, setVisibleReplies] = useState(() => {
         if (highlightedReplyId && item.replies) {
@@ -165,9 +171,13 @@ export const CommentItem: React.FC<CommentProps> = ({
     const isLong = item.content.length > TRUNCATE_AT;
     const allShown = visibleReplies >= total;
 
-    const expand = () => {
+    const expand = async () => {
+        let loaded = item.replies?.length ?? 0;
+        if (visibleReplies + REPLIES_BATCH > loaded && item.replies_next_cursor && onLoadMoreReplies) {
+            loaded = await onLoadMoreReplies(item);
+        }
         LayoutAnimation.configureNext(LayoutAnimation.Presets.easeInEaseOut);
-        setVisibleReplies((v) => Math.min(total, v + REPLIES_BATCH));
+        setVisibleReplies((v) => Math.min(loaded, v + REPLIES_BATCH));
     };
 
     const collapse = () => {
@@ -23,6 +23,7 @@ import Hyperlink from "react-native-hyperlink";
 
 import getPost from "@/src/api/get.post";
 import getComments from "@/src/api/get.comments";
+import { appendComments, loadMoreReplies, mergeLiked, replyTotal } from "@/src/utils/commentPages";
 import likePost from "@/src/api/like.post";
 import mintNFT from "@/src/api/mint.nft";
 import commentLike from "@/src/api/comment.like";
@@ -66,8 +67,6 @@ const { width: SW } = Dimensions.get("window");
 interface UserData {
     username: string;
     avatar: string | null;
-    liked_comments: number[];
-    liked_comment_replies: number[];
 }
 
 
@@ -125,6 +124,8 @@ export default function PostDetailsScreen() {
 
     const [comments, setComments] = useState<Comment[]>([]);
     const [commentsLoading, setCommentsLoading] = useState(true);
+    const [commentsCursor, setCommentsCursor] = useState<string | null>(null);
+    const [loadingMoreComments, setLoadingMoreComments] = useState(false);
     const [userData, setUserData] = useState<UserData | null>(null);
     const [likedComments, setLikedComments] = useState<LikedComments>({ comments: {}, replies: {} });
     const [replyingTo, setReplyingTo] = useState<Comment | Reply | null>(null);
@@ -179,17 +180,36 @@ export default function PostDetailsScreen() {
             if (data && Array.isArray(data.comments)) {
                 setPostAuthor(data.author ?? null);
                 setComments(data.comments);
+                setCommentsCursor(data.next_cursor ?? null);
+                setLikedComments(mergeLiked({ comments: {}, replies: {} }, data));
             }
         } finally { setCommentsLoading(false); }
     };
 
+    const fetchMoreComments = async () => {
+        if (!commentsCursor || loadingMoreComments) return;
+        setLoadingMoreComments(true);
+        try {
+            const data = await getComments(Number(id), commentsCursor);
+            if (data && Array.isArray(data.comments)) {
+                setComments((p) => appendComments(p, data.comments));
+                setCommentsCursor(data.next_cursor ?? null);
+                setLikedComments((p) => mergeLiked(p, data));
+            }
+        } finally { setLoadingMoreComments(false); }
+    };
+
+    const fetchMoreReplies = async (comment: Comment): Promise<number> => {
+        const page = await loadMoreReplies<Reply, Comment>(comment);
+        if (!page) return comment.replies?.length ?? 0;
+        setComments((p) => p.map((c) => (c.id === comment.id ? page.comment : c)));
+        setLikedComments((p) => mergeLiked(p, { liked_comment_replies: page.likedReplies }));
+        return page.comment.replies.length;
+    };
+
     const fetchUser = async () => {
         const u = await getUserDetail();
         setUserData(u);
-        setLikedComments({
-            comments: u.liked_comments.reduce((a: Record<number, boolean>, id: number) => ({ ...a, [id]: true }), {}),
-            replies: u.liked_comment_replies.reduce((a: Record<number, boolean>, id: number) => ({ ...a, [id]: true }), {}),
-        });
     };
 
     const handleSharePost = useCallback(async () => {
@@ -292,7 +312,9 @@ export default function PostDetailsScreen() {
 
             const res = await createCommentReply(commentText, commentId);
             if (res) {
-                setComments((p) => p.map((c) => c.id === commentId ? { ...c, replies: [...c.replies, res] } : c));
+                setComments((p) => p.map((c) => c.id === commentId
+                    ? { ...c, replies: [...c.replies, res], replies_count: replyTotal(c) + 1 }
+                    : c));
             }
             setReplyingTo(null);
         }
@@ -345,7 +367,7 @@ export default function PostDetailsScreen() {
 
     const mediaItems = post.media ?? [];
     const hasMedia = mediaItems.length > 0;
-    const totalComments = comments.reduce((t, c) => t + 1 + (c.replies?.length ?? 0), 0);
+    const totalComments = comments.reduce((t, c) => t + 1 + replyTotal(c), 0);
 
     let collectState: CollectState | null = null;
     if (post.is_nft || post.is_owner) {
@@ -609,9 +631,17 @@ export default function PostDetailsScreen() {
                             isLast={idx === comments.length - 1}
                             highlightedCommentId={highlightedCommentId}
                             highlightedReplyId={highlightedReplyId}
+                            onLoadMoreReplies={fetchMoreReplies}
                         />
                     ))
                 )}
+                {commentsCursor && !commentsLoading && (
+                    <TouchableOpacity onPress={fetchMoreComments} style={{ paddingVertical: 16, alignItems: "center" }}>
+                        {loadingMoreComments
+                            ? <CustomActivityIndicator size="small" color="#A855F7" />
+                            : <Text style={{ color: "#A855F7", fontSize: 14 }}>Load more comments</Text>}
+                    </TouchableOpacity>
+                )}
             </ScrollView>
 
             {post.is_comments_enabled && (
@@ -15,6 +15,7 @@ import getCollectionsMenu from "@/src/api/get.collections.menu";
 import { memo, useCallback, useState, useEffect, useRef } from 'react';
 import { useIsFocused } from "@react-navigation/native";
 import { Image as ExpoImage } from 'expo-image';
+import pickRendition, { Srcset } from '@/src/utils/pickRendition';
 import GlassPill from "@/components/Shared/GlassPill";
 import { Image, Video, Sparkles, Gem, Crown, CheckCircle2, UserCircle2, Calendar } from "lucide-react-native";
 import { useColorScheme } from "react-native";
@@ -32,6 +33,7 @@ const POSTS_PER_PAGE = 9;
 interface PostMedia {
     media_url: string;
     media_preview: string | null;
+    srcset?: Srcset;
 }
 
 interface CollectionItem {
@@ -276,6 +278,8 @@ const CollectionGridCell = memo(({ item, isFocused, accentColor, onPress }: Coll
     const hasMedia = item.media && Array.isArray(item.media) && item.media.length > 0 && item.media[0]?.media_url;
     const isMediaVideo = hasMedia && item.media ? isVideo(item.media[0].media_url) : false;
     const mediaUrl = hasMedia && item.media ? item.media[0].media_url : null;
+    // Grid-sized rendition (image or video poster) when the backend has produced one
+    const gridUrl = hasMedia && item.media ? pickRendition(item.media[0].srcset, imageSize) : null;
 
     return (
         <TouchableOpacity
@@ -288,12 +292,12 @@ const CollectionGridCell = memo(({ item, isFocused, accentColor, onPress }: Coll
                     <View style={styles.videoContainer}>
                         {item.is_luma_event && isFocused && (
                             <>
-                                <ExpoImage source={{ uri: getPreviewUrl(mediaUrl!, item as any) }} style={StyleSheet.absoluteFill} contentFit="cover" />
+                                <ExpoImage source={{ uri: gridUrl || getPreviewUrl(mediaUrl!, item as any) }} style={StyleSheet.absoluteFill} contentFit="cover" />
                                 <View style={[StyleSheet.absoluteFill, { backgroundColor: 'rgba(0,0,0,0.45)' }]} pointerEvents="none" />
                             </>
                         )}
                         <ExpoImage
-                            source={{ uri: getPreviewUrl(mediaUrl!, item as any) }}
+                            source={{ uri: gridUrl || getPreviewUrl(mediaUrl!, item as any) }}
                             style={styles.media}
                             contentFit={item.is_luma_event ? "contain" : "cover"}
                         />
@@ -302,12 +306,12 @@ const CollectionGridCell = memo(({ item, isFocused, accentColor, onPress }: Coll
                     <View style={styles.videoContainer}>
                         {item.is_luma_event && isFocused && (
                             <>
-                                <ExpoImage source={{ uri: mediaUrl! }} style={StyleSheet.absoluteFill} contentFit="cover" />
+                                <ExpoImage source={{ uri: gridUrl || mediaUrl! }} style={StyleSheet.absoluteFill} contentFit="cover" />
                                 <View style={[StyleSheet.absoluteFill, { backgroundColor: 'rgba(0,0,0,0.45)' }]} pointerEvents="none" />
                             </>
                         )}
                         <ExpoImage
-                            source={{ uri: mediaUrl! }}
+                            source={{ uri: gridUrl || mediaUrl! }}
                             style={styles.media}
                             contentFit={item.is_luma_event ? "contain" : "cover"}
                         />
@@ -19,6 +19,7 @@ import { BlurView } from "expo-blur";
 import LiquidGlassView from '@/components/Shared/LiquidGlassView';
 import GlassBadge from "@/components/Shared/GlassBadge";
 import { Image } from 'expo-image';
+import pickRendition, { Srcset } from '@/src/utils/pickRendition';
 import { ImageIcon, Video, Clock3, Sparkles, Gem, Calendar } from "lucide-react-native";
 import { LinearGradient } from "expo-linear-gradient";
 import { storage } from '@/src/utils/storage';
@@ -39,6 +40,7 @@ const POSTS_PER_PAGE = 9;
 interface PostMedia {
     media_url: string;
     media_preview: string | null;
+    srcset?: Srcset;
 }
 
 interface Post {
@@ -148,6 +150,8 @@ const PostGridCell = memo(({ item, isFocused, currentUserId, onPress }: PostGrid
     const hasMedia = item.media && Array.isArray(item.media) && item.media.length > 0 && item.media[0]?.media_url;
     const isMediaVideo = hasMedia && item.media ? isVideo(item.media[0].media_url) : false;
     const mediaUrl = hasMedia && item.media ? item.media[0].media_url : null;
+    // Grid-sized rendition (image or video poster) when the backend has produced one
+    const gridUrl = hasMedia && item.media ? pickRendition(item.media[0].srcset, imageSize) : null;
     const isApproved = item.moderation_status === "approved";
     const isPending = item.moderation_status === "pending" && item.user_id === currentUserId;
     const hasBadges = item.is_nft || item.is_ai_generated || item.is_luma_event;
@@ -164,12 +168,12 @@ const PostGridCell = memo(({ item, isFocused, currentUserId, onPress }: PostGrid
                     <View style={styles.videoContainer}>
                         {item.is_luma_event && (
                             <>
-                                <Image source={{ uri: getPreviewUrl(mediaUrl!, item) }} style={StyleSheet.absoluteFill} contentFit="cover" />
+                                <Image source={{ uri: gridUrl || getPreviewUrl(mediaUrl!, item) }} style={StyleSheet.absoluteFill} contentFit="cover" />
                                 <View style={[StyleSheet.absoluteFill, { backgroundColor: 'rgba(0,0,0,0.45)' }]} />
                             </>
                         )}
                         <Image
-                            source={{ uri: getPreviewUrl(mediaUrl!, item) }}
+                            source={{ uri: gridUrl || getPreviewUrl(mediaUrl!, item) }}
                             style={styles.media}
                             contentFit={item.is_luma_event ? "contain" : "cover"}
                         />
@@ -178,12 +182,12 @@ const PostGridCell = memo(({ item, isFocused, currentUserId, onPress }: PostGrid
                     <View style={styles.videoContainer}>
                         {item.is_luma_event && (
                             <>
-                                <Image source={{ uri: mediaUrl! }} style={StyleSheet.absoluteFill} contentFit="cover" />
+                                <Image source={{ uri: gridUrl || mediaUrl! }} style={StyleSheet.absoluteFill} contentFit="cover" />
                                 <View style={[StyleSheet.absoluteFill, { backgroundColor: 'rgba(0,0,0,0.45)' }]} />
                             </>
                         )}
                         <Image
-                            source={{ uri: mediaUrl! }}
+                            source={{ uri: gridUrl || mediaUrl! }}
                             style={styles.media}
                             contentFit={item.is_luma_event ? "contain" : "cover"}
                         />
@@ -0,0 +1,28 @@
+import axios, { AxiosError } from "axios";
+import { storage } from "../utils/storage";
+import GetApiUrl from "../utils/url_api";
+
+
+/**
+ * The next page of a comment's replies, oldest first. `cursor` is the
+ * comment's `replies_next_cursor` or the previous page's `next_cursor`.
+ */
+export default async function getCommentReplies(comment_id: number, cursor: string) {
+    try {
+        const token = await storage.getItem("access");
+        if (token) {
+            const response = await axios.get(`${GetApiUrl()}/posts/get-comment-replies/${comment_id}/`, {
+                headers: {
+                    Authorization: `Bearer ${token}`,
+                },
+                params: { cursor },
+            });
+            return response.data;
+        } else {
+            return null;
+        }
+    } catch (error) {
+        const err = error as AxiosError;
+        return err.response?.data;
+    }
+}
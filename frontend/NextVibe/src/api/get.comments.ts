@@ -3,7 +3,11 @@ import { storage } from "../utils/storage";
 import GetApiUrl from "../utils/url_api";
 
 
-export default async function getComments(post_id: number) {
+/**
+ * One page of a post's top-level comments; pass the previous page's
+ * `next_cursor` to continue.
+ */
+export default async function getComments(post_id: number, cursor: string | null = null) {
     try {
         const token = await storage.getItem("access");
         if (token) {
@@ -11,6 +15,7 @@ export default async function getComments(post_id: number) {
                 headers: {
                     Authorization: `Bearer ${token}`,
                 },
+                params: cursor ? { cursor } : undefined,
             });
             return response.data;
         } else {
@@ -20,4 +25,4 @@ export default async function getComments(post_id: number) {
         const err = error as AxiosError;
         return err.response?.data;
     }
-}
\ No newline at end of file
+}
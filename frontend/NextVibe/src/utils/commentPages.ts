@@ -0,0 +1,63 @@
+import getCommentReplies from "../api/get.comment.replies";
+
+interface PagedReply {
+    reply_id: number;
+}
+
+interface PagedComment<R extends PagedReply> {
+    id: number;
+    replies: R[];
+    replies_count?: number;
+    replies_next_cursor?: string | null;
+}
+
+export interface LikedIds {
+    comments: Record<number, boolean>;
+    replies: Record<number, boolean>;
+}
+
+const toLookup = (ids: number[] | undefined) =>
+    (ids ?? []).reduce((acc: Record<number, boolean>, id: number) => ({ ...acc, [id]: true }), {});
+
+/** Adds the liked ids of a comments/replies page to the ones already known. */
+export function mergeLiked(prev: LikedIds, page: { liked_comments?: number[]; liked_comment_replies?: number[] }): LikedIds {
+    return {
+        comments: { ...prev.comments, ...toLookup(page.liked_comments) },
+        replies: { ...prev.replies, ...toLookup(page.liked_comment_replies) },
+    };
+}
+
+/** Appends a page of top-level comments, skipping ones already shown (e.g. just posted). */
+export function appendComments<C extends { id: number }>(prev: C[], page: C[]): C[] {
+    const seen = new Set(prev.map((c) => c.id));
+    return [...prev, ...page.filter((c) => !seen.has(c.id))];
+}
+
+/** Total replies of a thread, including ones not loaded yet. */
+export function replyTotal<R extends PagedReply>(comment: PagedComment<R>): number {
+    return Math.max(comment.replies_count ?? 0, comment.replies?.length ?? 0);
+}
+
+/**
+ * Fetches the next page of `comment`'s replies. Resolves to the updated comment
+ * (replies appended, cursor moved) and the page's liked reply ids, or null when
+ * there is nothing more to load or the request failed.
+ */
+export async function loadMoreReplies<R extends PagedReply, C extends PagedComment<R>>(
+    comment: C,
+): Promise<{ comment: C; likedReplies: number[] } | null> {
+    if (!comment.replies_next_cursor) return null;
+    const page = await getCommentReplies(comment.id, comment.replies_next_cursor);
+    if (!page || !Array.isArray(page.replies)) return null;
+
+    const loaded = comment.replies ?? [];
+    const seen = new Set(loaded.map((r) => r.reply_id));
+    return {
+        comment: {
+            ...comment,
+            replies: [...loaded, ...page.replies.filter((r: R) => !seen.has(r.reply_id))],
+            replies_next_cursor: page.next_cursor ?? null,
+        },
+        likedReplies: page.liked_comment_replies ?? [],
+    };
+}
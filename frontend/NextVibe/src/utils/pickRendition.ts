@@ -0,0 +1,23 @@
+import { PixelRatio } from "react-native";
+
+export type Srcset = Record<string, Record<string, string>>;
+
+// Formats the backend may render, in order of preference
+const FORMATS = ["webp", "jpeg"];
+
+/**
+ * Smallest rendition at least `displayWidth` points wide on this screen,
+ * or null when the media has no renditions yet.
+ */
+export default function pickRendition(srcset: Srcset | null | undefined, displayWidth: number): string | null {
+    const needed = displayWidth * PixelRatio.get();
+    for (const format of FORMATS) {
+        const widths = srcset?.[format];
+        if (!widths) continue;
+        const sizes = Object.keys(widths).map(Number).sort((a, b) => a - b);
+        if (!sizes.length) continue;
+        const chosen = sizes.find((w) => w >= needed) ?? sizes[sizes.length - 1];
+        return widths[String(chosen)];
+    }
+    return null;
+}
@@ -7,6 +7,8 @@ import (
 	"log"
 	"net/http"
 	"os"
+	"strings"
+	"sync"
 
 	"github.com/joho/godotenv"
 )
@@ -19,6 +21,12 @@ type ModerationRequest struct {
 	MediaURLs []string `json:"media_urls"`
 }
 
+// BatchRequest is accepted by /moderation/batch; every post's result is
+// delivered through the callback, none in the HTTP response.
+type BatchRequest struct {
+	Posts []ModerationRequest `json:"posts"`
+}
+
 type ModerationError struct {
 	Type       string  `json:"type"`
 	Message    string  `json:"message"`
@@ -57,6 +65,10 @@ type openAIResponse struct {
 // ─── Helpers ──────────────────────────────────────────────────────────────────
 
 func moderateText(content string) FileResult {
+	if strings.TrimSpace(content) == "" {
+		// Nothing to check (e.g. the caller already has a verdict for this text)
+		return FileResult{Passed: true, Details: map[string]interface{}{}}
+	}
 	isBanned, reason := OpenAiModerateText(content)
 	result := FileResult{
 		Passed:  !isBanned,
@@ -102,6 +114,57 @@ func moderationHandler(w http.ResponseWriter, r *http.Request) {
 		return
 	}
 
+	resp := moderatePost(req)
+
+	w.Header().Set("Content-Type", "application/json")
+	json.NewEncoder(w).Encode(resp)
+
+	sendCallback(resp)
+}
+
+// batchWorkers bounds how many posts of a batch are moderated at once
+const batchWorkers = 4
+
+func batchHandler(w http.ResponseWriter, r *http.Request) {
+	if r.Method != http.MethodPost {
+		http.Error(w, "Only POST method allowed", http.StatusMethodNotAllowed)
+		return
+	}
+
+	var batch BatchRequest
+	if err := json.NewDecoder(r.Body).Decode(&batch); err != nil {
+		http.Error(w, "Failed to parse JSON: "+err.Error(), http.StatusBadRequest)
+		return
+	}
+	for _, req := range batch.Posts {
+		if req.ID == "" {
+			http.Error(w, "Missing id field", http.StatusBadRequest)
+			return
+		}
+	}
+
+	log.Printf("Accepted batch of %d posts", len(batch.Posts))
+	w.Header().Set("Content-Type", "application/json")
+	w.WriteHeader(http.StatusAccepted)
+	json.NewEncoder(w).Encode(map[string]int{"accepted": len(batch.Posts)})
+
+	go func(posts []ModerationRequest) {
+		sem := make(chan struct{}, batchWorkers)
+		var wg sync.WaitGroup
+		for _, req := range posts {
+			wg.Add(1)
+			sem <- struct{}{}
+			go func(req ModerationRequest) {
+				defer wg.Done()
+				defer func() { <-sem }()
+				sendCallback(moderatePost(req))
+			}(req)
+		}
+		wg.Wait()
+	}(batch.Posts)
+}
+
+func moderatePost(req ModerationRequest) Response {
 	log.Printf("Received request for post ID %s with %d media URLs", req.ID, len(req.MediaURLs))
 
 	// Moderate text
@@ -134,16 +197,12 @@ func moderationHandler(w http.ResponseWriter, r *http.Request) {
 		Passed:  postPassed,
 	}
 
-	w.Header().Set("Content-Type", "application/json")
-	json.NewEncoder(w).Encode(resp)
-
 	if postPassed {
 		log.Printf("✅ Post ID %s PASSED moderation", req.ID)
 	} else {
 		log.Printf("❌ Post ID %s FAILED moderation", req.ID)
 	}
-
-	sendCallback(resp)
+	return resp
 }
 
 func sendCallback(resp Response) {
@@ -210,6 +269,7 @@ func main() {
 	}
 
 	http.HandleFunc("/moderation", moderationHandler)
+	http.HandleFunc("/moderation/batch", batchHandler)
 	http.HandleFunc("/health", healthHandler)
 	log.Printf("🚀 Moderation service running on http://localhost:%s", port)
 	log.Fatal(http.ListenAndServe(":"+port, nil))
@@ -14,6 +14,20 @@ class Settings(BaseSettings):
     MAX_CONNECTIONS_PER_USER: int = 5
     MAX_TEXT_LENGTH: int = 10000
     MAX_EVENTS_PER_SECOND: int = 10
+    MAX_EPHEMERAL_EVENTS_PER_SECOND: int = 30
+    TYPING_REFRESH_SECONDS: float = 3.0
+    FANOUT_BATCH_WINDOW_MS: int = 2
+    FANOUT_MAX_BATCH: int = 500
+    SEND_QUEUE_SIZE: int = 256
+    SEND_TIMEOUT_SECONDS: float = 10.0
+    SLOW_CONSUMER_POLICY: str = "drop_oldest"  # or "disconnect"
+    HISTORY_CACHE_TTL_SECONDS: int = 600
+    EXPO_PUSH_URL: str = "https://exp.host/--/api/v2/push/send"
+    EXPO_RECEIPTS_URL: str = "https://exp.host/--/api/v2/push/getReceipts"
+    EXPO_ACCESS_TOKEN: str = ""
+    PUSH_BATCH_WINDOW_MS: int = 250
+    PUSH_MAX_RETRIES: int = 3
+    PUSH_RECEIPT_DELAY_SECONDS: float = 900.0
     CORS_ORIGINS: list[str] = []
 
     model_config = SettingsConfigDict(
@@ -8,38 +8,75 @@ import time
 import asyncio
 import redis
 import redis.asyncio as aioredis
+from delivery import ConnectionSender, DeliveryStats, POLICY_DROP_OLDEST
+from fanout import FanoutEngine, LEGACY_CHANNEL, EPHEMERAL_CHANNEL_PREFIX, pod_channel, publish_events
+from membership import MembershipCache, INVALIDATION_CHANNEL
+from presence import PresenceIndex
 
 logger = logging.getLogger("connection_manager")
 
 
 class ConnectionManager:
-    def __init__(self, redis_client: Optional[redis.Redis] = None, pod_id: Optional[str] = None):
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        pod_id: Optional[str] = None,
+        fanout_batch_window_ms: int = 2,
+        fanout_max_batch: int = 500,
+        send_queue_size: int = 256,
+        send_timeout: float = 10.0,
+        slow_consumer_policy: str = POLICY_DROP_OLDEST,
+        presence_sweep_interval: float = 60.0,
+    ):
         self.pod_id = pod_id or os.getenv("POD_ID", f"pod-{uuid.uuid4().hex[:8]}")
         # Local connection mapping: user_id -> {conn_id: websocket}
         self.active_connections: Dict[int, Dict[str, WebSocket]] = {}
+        # Per-connection outbound queues: conn_id -> sender
+        self.senders: Dict[str, ConnectionSender] = {}
+        self.delivery_stats = DeliveryStats()
+        self.send_queue_size = send_queue_size
+        self.send_timeout = send_timeout
+        self.slow_consumer_policy = slow_consumer_policy
         self.redis = redis_client
         self.async_redis: Optional[aioredis.Redis] = None
         self.pubsub_task: Optional[asyncio.Task] = None
-        self.channel_name = "chat_pubsub_events"
+        self.sweep_task: Optional[asyncio.Task] = None
+        self.presence_sweep_interval = presence_sweep_interval
+        self.channel_name = pod_channel(self.pod_id)
+        self.ephemeral_channel_name = pod_channel(self.pod_id, EPHEMERAL_CHANNEL_PREFIX)
+        self.fanout = FanoutEngine(self.pod_id, fanout_batch_window_ms, fanout_max_batch)
+        self.ephemeral_fanout = FanoutEngine(
+            self.pod_id, fanout_batch_window_ms, fanout_max_batch, channel_prefix=EPHEMERAL_CHANNEL_PREFIX
+        )
+        self.membership = MembershipCache(redis_client)
+        self.presence = PresenceIndex(redis_client)
 
     def set_redis(self, redis_client: redis.Redis):
         self.redis = redis_client
+        self.membership.redis = redis_client
+        self.presence.redis = redis_client
 
     async def init_async_redis(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0):
         try:
             self.async_redis = aioredis.Redis(host=host, port=port, db=db, decode_responses=True)
             self.pubsub_task = asyncio.create_task(self._listen_pubsub())
+            self.fanout.start(self.async_redis)
+            self.ephemeral_fanout.start(self.async_redis)
+            self.sweep_task = asyncio.create_task(self._sweep_presence())
             logger.info(f"📡 PubSub listener started for pod {self.pod_id}")
         except Exception as e:
             logger.error(f"❌ Failed to init async redis pubsub: {e}")
 
     async def close(self):
-        if self.pubsub_task:
-            self.pubsub_task.cancel()
-            try:
-                await self.pubsub_task
-            except asyncio.CancelledError:
-                pass
+        await self.fanout.stop()
+        await self.ephemeral_fanout.stop()
+        for task in (self.pubsub_task, self.sweep_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
         if self.async_redis:
             if hasattr(self.async_redis, "aclose"):
                 await self.async_redis.aclose()
@@ -50,7 +87,8 @@ class ConnectionManager:
         if not self.async_redis:
             return
         pubsub = self.async_redis.pubsub()
-        await pubsub.subscribe(self.channel_name)
+        channels = (self.channel_name, self.ephemeral_channel_name, LEGACY_CHANNEL, INVALIDATION_CHANNEL)
+        await pubsub.subscribe(*channels)
         try:
             async for message in pubsub.listen():
                 if message and message.get("type") == "message":
@@ -58,20 +96,26 @@ class ConnectionManager:
                         raw_data = message["data"]
                         if isinstance(raw_data, bytes):
                             raw_data = raw_data.decode("utf-8")
+                        if message.get("channel") == INVALIDATION_CHANNEL:
+                            self.membership.invalidate_local(int(raw_data))
+                            continue
                         data = json.loads(raw_data)
                         sender_pod = data.get("sender_pod_id")
                         if sender_pod == self.pod_id:
                             continue  # Skip events published by this pod
 
-                        target_users = data.get("target_user_ids", [])
-                        envelope = data.get("envelope")
-                        if envelope:
-                            await self._deliver_local(target_users, json.dumps(envelope))
+                        # Pod channels carry a batch; the legacy channel carries a single event
+                        events = data.get("events") or [data]
+                        for event in events:
+                            target_users = [uid for uid in event.get("target_user_ids", []) if uid in self.active_connections]
+                            envelope = event.get("envelope")
+                            if envelope and target_users:
+                                await self._deliver_local(target_users, json.dumps(envelope))
                     except Exception as e:
                         logger.error(f"❌ Error processing PubSub event: {e}")
         except asyncio.CancelledError:
             try:
-                await pubsub.unsubscribe(self.channel_name)
+                await pubsub.unsubscribe(*channels)
                 if hasattr(pubsub, "aclose"):
                     await pubsub.aclose()
                 else:
@@ -89,11 +133,12 @@ class ConnectionManager:
             self.active_connections[user_id] = {}
 
         self.active_connections[user_id][conn_id] = websocket
+        self._get_sender(user_id, conn_id, websocket)
 
-        # Presence key in Redis
+        # Presence key + fan-out route in Redis
         if self.redis:
             try:
-                self.redis.setex(f"presence:{user_id}:{conn_id}", 120, self.pod_id)
+                self._write_presence(user_id, conn_id)
             except Exception as e:
                 logger.error(f"❌ Redis presence set error for user {user_id}: {e}")
 
@@ -111,9 +156,12 @@ class ConnectionManager:
 
             if target_conn_id and target_conn_id in self.active_connections[user_id]:
                 del self.active_connections[user_id][target_conn_id]
+                sender = self.senders.pop(target_conn_id, None)
+                if sender:
+                    sender.close()
                 if self.redis:
                     try:
-                        self.redis.delete(f"presence:{user_id}:{target_conn_id}")
+                        self.presence.remove(user_id, target_conn_id)
                     except Exception as e:
                         logger.error(f"❌ Redis presence delete error for user {user_id}: {e}")
                 logger.info(f"👋 User {user_id} disconnected conn {target_conn_id}. Remaining: {len(self.active_connections[user_id])}")
@@ -122,10 +170,13 @@ class ConnectionManager:
                 del self.active_connections[user_id]
                 logger.info(f"🗑️ User {user_id} removed from local active connections")
 
+    def _write_presence(self, user_id: int, conn_id: str):
+        self.presence.heartbeat(user_id, conn_id, self.pod_id)
+
     def refresh_presence(self, user_id: int, conn_id: str):
         if self.redis:
             try:
-                self.redis.setex(f"presence:{user_id}:{conn_id}", 120, self.pod_id)
+                self._write_presence(user_id, conn_id)
             except Exception as e:
                 logger.error(f"❌ Redis presence refresh error: {e}")
 
@@ -133,18 +184,10 @@ class ConnectionManager:
         return len(self.active_connections.get(user_id, {}))
 
     def get_online_user_ids(self) -> List[int]:
-        """Returns online user IDs across all pods using Redis keys if available, else local."""
+        """Returns online user IDs across all pods from the presence index if available, else local."""
         if self.redis:
             try:
-                keys = self.redis.keys("presence:*")
-                user_ids = set()
-                for key in keys:
-                    if isinstance(key, bytes):
-                        key = key.decode("utf-8")
-                    parts = key.split(":")
-                    if len(parts) >= 2:
-                        user_ids.add(int(parts[1]))
-                return list(user_ids)
+                return self.presence.online_user_ids()
             except Exception as e:
                 logger.error(f"❌ Error fetching online users from Redis: {e}")
         return list(self.active_connections.keys())
@@ -154,12 +197,32 @@ class ConnectionManager:
             return True
         if self.redis:
             try:
-                keys = self.redis.keys(f"presence:{user_id}:*")
-                return len(keys) > 0
+                return self.presence.is_online(user_id)
             except Exception as e:
                 logger.error(f"❌ Error checking online status in Redis: {e}")
         return False
 
+    def online_among(self, user_ids: List[int]) -> Set[int]:
+        """Which of `user_ids` are online anywhere: local sockets first, one Redis round trip for the rest."""
+        online = {uid for uid in user_ids if self.active_connections.get(uid)}
+        remote = [uid for uid in user_ids if uid not in online]
+        if remote and self.redis:
+            try:
+                online |= self.presence.online_among(remote)
+            except Exception as e:
+                logger.error(f"❌ Error checking online status in Redis: {e}")
+        return online
+
+    async def _sweep_presence(self):
+        while True:
+            await asyncio.sleep(self.presence_sweep_interval)
+            try:
+                swept = self.presence.sweep()
+                if swept:
+                    logger.info(f"🧹 Swept {swept} stale users from presence index")
+            except Exception as e:
+                logger.error(f"❌ Presence sweep error: {e}")
+
     def check_rate_limit(self, user_id: int, max_events_per_sec: int = 10) -> bool:
         """Sliding window rate limiter using Redis."""
         now = int(time.time())
@@ -175,19 +238,55 @@ class ConnectionManager:
                 return True
         return True
 
+    def _get_sender(self, user_id: int, conn_id: str, websocket: WebSocket) -> ConnectionSender:
+        sender = self.senders.get(conn_id)
+        if sender is None or sender.websocket is not websocket:
+            sender = ConnectionSender(
+                websocket,
+                user_id,
+                conn_id,
+                stats=self.delivery_stats,
+                on_dead=self._on_sender_dead,
+                max_queue=self.send_queue_size,
+                send_timeout=self.send_timeout,
+                policy=self.slow_consumer_policy,
+            )
+            self.senders[conn_id] = sender
+        return sender
+
+    def _on_sender_dead(self, sender: ConnectionSender):
+        self.disconnect(sender.websocket, sender.user_id, sender.conn_id)
+
     async def _deliver_local(self, user_ids: List[int], message_json: str):
-        disconnected = []
+        """Enqueues onto each target connection's outbound queue; never awaits a socket write."""
         for uid in user_ids:
             if uid in self.active_connections:
                 for conn_id, websocket in list(self.active_connections[uid].items()):
-                    try:
-                        await websocket.send_text(message_json)
-                    except Exception as e:
-                        logger.error(f"❌ Error sending to user {uid} (conn {conn_id}): {e}")
-                        disconnected.append((websocket, uid, conn_id))
+                    self._get_sender(uid, conn_id, websocket).offer(message_json)
+
+    async def send_to_connection(self, user_id: int, conn_id: str, payload: dict):
+        """Replies to a single connection through its queue, preserving order with fan-out frames."""
+        websocket = self.active_connections.get(user_id, {}).get(conn_id)
+        if websocket is None:
+            return
+        self._get_sender(user_id, conn_id, websocket).offer(json.dumps(payload))
 
-        for ws, uid, cid in disconnected:
-            self.disconnect(ws, uid, cid)
+    def delivery_metrics(self) -> Dict[str, Any]:
+        depths = [sender.depth for sender in self.senders.values()]
+        stats = self.delivery_stats
+        return {
+            "pod_id": self.pod_id,
+            "connections": len(self.senders),
+            "queued_total": sum(depths),
+            "max_queue_depth": max(depths) if depths else 0,
+            "queue_capacity": self.send_queue_size,
+            "slow_consumer_policy": self.slow_consumer_policy,
+            "enqueued": stats.enqueued,
+            "sent": stats.sent,
+            "dropped": stats.dropped,
+            "send_failures": stats.send_failures,
+            "slow_consumer_disconnects": stats.slow_consumer_disconnects,
+        }
 
     async def send_to_users(self, user_ids: List[int], payload: dict):
         """Scope fan-out to specific target user_ids (local + cross-pod via Redis PubSub)."""
@@ -195,38 +294,31 @@ class ConnectionManager:
         # 1. Deliver to local sockets
         await self._deliver_local(user_ids, message_json)
 
-        # 2. Publish to Redis PubSub for cross-pod delivery
-        pubsub_payload = {
-            "sender_pod_id": self.pod_id,
-            "target_user_ids": user_ids,
-            "envelope": payload
-        }
-        if self.async_redis:
-            try:
-                await self.async_redis.publish(self.channel_name, json.dumps(pubsub_payload))
-            except Exception as e:
-                logger.error(f"❌ Async Redis publish error: {e}")
+        # 2. Hand off to the fan-out engine: batched, pipelined, routed to the pods holding targets
+        if self.fanout.running:
+            self.fanout.enqueue(user_ids, payload)
         elif self.redis:
-            try:
-                self.redis.publish(self.channel_name, json.dumps(pubsub_payload))
-            except Exception as e:
-                logger.error(f"❌ Redis publish error: {e}")
+            publish_events(self.redis, [(user_ids, payload)], sender_pod_id=self.pod_id, skip_pod_id=self.pod_id)
+
+    async def send_ephemeral(self, user_ids: List[int], payload: dict):
+        """Typing/signaling fan-out: same routing as send_to_users but on the ephemeral pod channels."""
+        await self._deliver_local(user_ids, json.dumps(payload))
+        if self.ephemeral_fanout.running:
+            self.ephemeral_fanout.enqueue(user_ids, payload)
+        elif self.redis:
+            publish_events(
+                self.redis, [(user_ids, payload)], sender_pod_id=self.pod_id,
+                skip_pod_id=self.pod_id, channel_prefix=EPHEMERAL_CHANNEL_PREFIX
+            )
 
     async def broadcast(self, message: str):
         """Broadcast to ALL local connections (reserved for system announcements only)."""
         payload = {"type": "system_announcement", "content": message}
         message_json = json.dumps(payload)
-        disconnected = []
+        # Enqueue-only: completes in O(connections) regardless of how slow any client is
         for uid, conns in list(self.active_connections.items()):
             for cid, websocket in list(conns.items()):
-                try:
-                    await websocket.send_text(message_json)
-                except Exception as e:
-                    logger.error(f"❌ Error broadcasting to user {uid}: {e}")
-                    disconnected.append((websocket, uid, cid))
-
-        for ws, uid, cid in disconnected:
-            self.disconnect(ws, uid, cid)
+                self._get_sender(uid, cid, websocket).offer(message_json)
 
     async def send_personal_message(self, message: str, user_id: int):
         try:
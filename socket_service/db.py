@@ -1,5 +1,7 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 from dotenv import load_dotenv
 import os
 
@@ -25,3 +27,38 @@ engine = create_engine(
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+# Async engine for the WebSocket hot path (aiomysql / asyncpg / aiosqlite)
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql+mysqldb": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+if "sqlite" in ASYNC_DATABASE_URL:
+    # Each event opens a short-lived session; pooling sqlite files only pins stale handles
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+else:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pool_pre_ping=True,
+    )
+
+# expire_on_commit=False: attributes stay readable after commit without implicit (sync) lazy loads
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
@@ -0,0 +1,112 @@
+from fastapi import WebSocket
+from typing import Callable, Optional
+import logging
+import asyncio
+
+logger = logging.getLogger("delivery")
+
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_DISCONNECT = "disconnect"
+
+# Close code for "try again later" when a consumer cannot keep up
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class DeliveryStats:
+    def __init__(self):
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.send_failures = 0
+        self.slow_consumer_disconnects = 0
+
+
+class ConnectionSender:
+    """
+    Bounded outbound queue plus a dedicated writer task for one WebSocket, so a
+    slow client only backs up its own queue instead of every fan-out loop.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: int,
+        conn_id: str,
+        stats: DeliveryStats,
+        on_dead: Callable[["ConnectionSender"], None],
+        max_queue: int = 256,
+        send_timeout: float = 10.0,
+        policy: str = POLICY_DROP_OLDEST,
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.conn_id = conn_id
+        self.stats = stats
+        self.on_dead = on_dead
+        self.send_timeout = send_timeout
+        self.policy = policy
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+        self.task: Optional[asyncio.Task] = asyncio.create_task(self._writer())
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def offer(self, message_json: str) -> bool:
+        """Non-blocking enqueue; applies the slow-consumer policy when the queue is full."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message_json)
+        except asyncio.QueueFull:
+            if self.policy == POLICY_DISCONNECT:
+                logger.warning(f"🐢 Slow consumer user {self.user_id} (conn {self.conn_id}): queue full, disconnecting")
+                self.stats.slow_consumer_disconnects += 1
+                self._die(close_code=SLOW_CONSUMER_CLOSE_CODE)
+                return False
+            # Drop the oldest frame to make room; clients resync from history on gaps
+            self.queue.get_nowait()
+            self.queue.put_nowait(message_json)
+            self.stats.dropped += 1
+        self.stats.enqueued += 1
+        return True
+
+    async def _writer(self):
+        while True:
+            message_json = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(message_json), self.send_timeout)
+                self.stats.sent += 1
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                logger.warning(f"🐢 Send timeout for user {self.user_id} (conn {self.conn_id}), disconnecting")
+                self.stats.slow_consumer_disconnects += 1
+                self._die(close_code=SLOW_CONSUMER_CLOSE_CODE)
+                return
+            except Exception as e:
+                logger.error(f"❌ Error sending to user {self.user_id} (conn {self.conn_id}): {e}")
+                self.stats.send_failures += 1
+                self._die()
+                return
+
+    def _die(self, close_code: Optional[int] = None):
+        if self.closed:
+            return
+        self.closed = True
+        if close_code is not None:
+            asyncio.create_task(self._close_socket(close_code))
+        self.on_dead(self)
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    def close(self):
+        self.closed = True
+        if self.task and not self.task.done() and self.task is not asyncio.current_task():
+            self.task.cancel()
+        self.task = None
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+import time
+
+
+class TypingDebouncer:
+    """
+    Coalesces typing state per (chat, user): only state changes go out, plus a
+    typing_start refresh every `refresh_interval` seconds while the user keeps typing.
+    """
+
+    def __init__(self, refresh_interval: float = 3.0, max_entries: int = 100000):
+        self.refresh_interval = refresh_interval
+        self.max_entries = max_entries
+        self._state: "OrderedDict[Tuple[int, int], Tuple[bool, float]]" = OrderedDict()
+        self._chats_by_user: Dict[int, Set[int]] = {}
+        self.emitted = 0
+        self.suppressed = 0
+
+    def should_emit(self, chat_id: int, user_id: int, is_typing: bool, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        key = (chat_id, user_id)
+        previous = self._state.get(key)
+        if previous is not None:
+            was_typing, emitted_at = previous
+            if was_typing == is_typing and (not is_typing or now - emitted_at < self.refresh_interval):
+                self.suppressed += 1
+                return False
+
+        self._state[key] = (is_typing, now)
+        self._state.move_to_end(key)
+        self._chats_by_user.setdefault(user_id, set()).add(chat_id)
+        while len(self._state) > self.max_entries:
+            (old_chat, old_user), _ = self._state.popitem(last=False)
+            chats = self._chats_by_user.get(old_user)
+            if chats is not None:
+                chats.discard(old_chat)
+                if not chats:
+                    del self._chats_by_user[old_user]
+        self.emitted += 1
+        return True
+
+    def forget_user(self, user_id: int):
+        """Called once a user's last connection closes so a reconnect starts clean."""
+        for chat_id in self._chats_by_user.pop(user_id, ()):
+            self._state.pop((chat_id, user_id), None)
+
+
+class SignalRateLimiter:
+    """
+    In-process token bucket per user for ephemeral signals, kept apart from the
+    Redis-backed message budget so typing never starves real messages.
+    """
+
+    def __init__(self, rate_per_sec: float = 30.0, burst: Optional[float] = None):
+        self.rate = rate_per_sec
+        self.burst = burst if burst is not None else rate_per_sec
+        self._buckets: Dict[int, Tuple[float, float]] = {}
+
+    def allow(self, user_id: int, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        tokens, updated_at = self._buckets.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        if tokens < 1:
+            self._buckets[user_id] = (tokens, now)
+            return False
+        self._buckets[user_id] = (tokens - 1, now)
+        return True
+
+    def forget_user(self, user_id: int):
+        self._buckets.pop(user_id, None)
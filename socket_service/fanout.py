@@ -0,0 +1,210 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Any
+import logging
+import json
+import asyncio
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger("fanout")
+
+# Legacy single channel every pod used to decode; still subscribed during rolling deploys
+LEGACY_CHANNEL = "chat_pubsub_events"
+POD_CHANNEL_PREFIX = "chat_pubsub_events:pod:"
+# Typing and WebRTC signaling travel on their own per-pod channels, apart from durable messages
+EPHEMERAL_CHANNEL_PREFIX = "chat_ephemeral:pod:"
+ROUTE_KEY_PREFIX = "presence_pods:"
+ROUTE_TTL_SECONDS = 120
+
+FanoutEvent = Tuple[List[int], Dict[str, Any]]
+
+
+def pod_channel(pod_id: str, prefix: str = POD_CHANNEL_PREFIX) -> str:
+    return f"{prefix}{pod_id}"
+
+
+def route_key(user_id: int) -> str:
+    """Per-user hash of conn_id -> pod_id, maintained by presence.PresenceIndex."""
+    return f"{ROUTE_KEY_PREFIX}{user_id}"
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def collect_user_ids(events: Iterable[FanoutEvent]) -> List[int]:
+    seen: Set[int] = set()
+    ordered = []
+    for user_ids, _ in events:
+        for uid in user_ids:
+            if uid not in seen:
+                seen.add(uid)
+                ordered.append(uid)
+    return ordered
+
+
+def build_pod_batches(
+    events: List[FanoutEvent],
+    routes: Dict[int, Set[str]],
+    sender_pod_id: str,
+    skip_pod_id: Optional[str] = None,
+    channel_prefix: str = POD_CHANNEL_PREFIX,
+) -> Dict[str, str]:
+    """Groups events by the pods holding their targets and JSON-encodes one body per pod channel."""
+    per_pod: Dict[str, List[Dict[str, Any]]] = {}
+    for user_ids, envelope in events:
+        targets_by_pod: Dict[str, List[int]] = {}
+        for uid in user_ids:
+            for pod_id in routes.get(uid, ()):
+                if pod_id == skip_pod_id:
+                    continue
+                targets_by_pod.setdefault(pod_id, []).append(uid)
+        for pod_id, targets in targets_by_pod.items():
+            per_pod.setdefault(pod_id, []).append({
+                "target_user_ids": targets,
+                "envelope": envelope
+            })
+
+    return {
+        pod_channel(pod_id, channel_prefix): json.dumps({"sender_pod_id": sender_pod_id, "events": pod_events})
+        for pod_id, pod_events in per_pod.items()
+    }
+
+
+def parse_routes(user_ids: List[int], results: List[Any]) -> Dict[int, Set[str]]:
+    routes: Dict[int, Set[str]] = {}
+    for uid, pods in zip(user_ids, results):
+        if pods:
+            routes[uid] = {_decode(p) for p in pods}
+    return routes
+
+
+def publish_events(
+    redis_client: redis.Redis,
+    events: List[FanoutEvent],
+    sender_pod_id: str = "api",
+    skip_pod_id: Optional[str] = None,
+    channel_prefix: str = POD_CHANNEL_PREFIX,
+) -> int:
+    """
+    Sync fan-out for REST handlers: one pipelined route lookup plus one pipelined
+    PUBLISH per pod that holds at least one target. Returns the number of publishes.
+    """
+    events = [(list(uids), env) for uids, env in events if uids]
+    if not events or not redis_client:
+        return 0
+    try:
+        user_ids = collect_user_ids(events)
+        pipe = redis_client.pipeline(transaction=False)
+        for uid in user_ids:
+            pipe.hvals(route_key(uid))
+        routes = parse_routes(user_ids, pipe.execute())
+
+        batches = build_pod_batches(events, routes, sender_pod_id, skip_pod_id=skip_pod_id, channel_prefix=channel_prefix)
+        if not batches:
+            return 0
+        pipe = redis_client.pipeline(transaction=False)
+        for channel, body in batches.items():
+            pipe.publish(channel, body)
+        pipe.execute()
+        return len(batches)
+    except Exception as e:
+        logger.error(f"❌ Fan-out publish error: {e}")
+        return 0
+
+
+class FanoutEngine:
+    """
+    Coalesces outgoing cross-pod events into micro-batches and publishes them
+    through a single pipeline per flush, routed to per-pod channels.
+    """
+
+    def __init__(
+        self,
+        pod_id: str,
+        batch_window_ms: int = 2,
+        max_batch_size: int = 500,
+        channel_prefix: str = POD_CHANNEL_PREFIX,
+    ):
+        self.pod_id = pod_id
+        self.channel_prefix = channel_prefix
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.async_redis: Optional[aioredis.Redis] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.published_batches = 0
+        self.published_events = 0
+
+    def start(self, async_redis: aioredis.Redis):
+        self.async_redis = async_redis
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def enqueue(self, user_ids: List[int], payload: Dict[str, Any]):
+        if user_ids and self.queue is not None:
+            self.queue.put_nowait((list(user_ids), payload))
+
+    async def stop(self, timeout: float = 2.0):
+        if not self.task:
+            return
+        # Sentinel lets the flusher drain instead of being cancelled mid-pipeline
+        self.queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(self.task, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            logger.error(f"❌ Fan-out flusher stopped with error: {e}")
+        self.task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                if not self.queue.empty():
+                    item = self.queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[FanoutEvent]):
+        try:
+            user_ids = collect_user_ids(batch)
+            pipe = self.async_redis.pipeline(transaction=False)
+            for uid in user_ids:
+                pipe.hvals(route_key(uid))
+            routes = parse_routes(user_ids, await pipe.execute())
+
+            batches = build_pod_batches(
+                batch, routes, self.pod_id, skip_pod_id=self.pod_id, channel_prefix=self.channel_prefix
+            )
+            if not batches:
+                return
+            pipe = self.async_redis.pipeline(transaction=False)
+            for channel, body in batches.items():
+                pipe.publish(channel, body)
+            await pipe.execute()
+            self.published_batches += len(batches)
+            self.published_events += len(batch)
+        except Exception as e:
+            logger.error(f"❌ Fan-out flush error ({len(batch)} events): {e}")
@@ -3,16 +3,26 @@ import os
 import uuid
 import json
 import base64
+import hashlib
 import redis
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Optional
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from connection_manager import ConnectionManager
-from db import SessionLocal
-from src.models import Message, MediaAttachment, User, Chat, UserOnlineSession, MessageReaction, MessageReceipt
+from membership import ChatMembership
+from ephemeral import TypingDebouncer, SignalRateLimiter
+from db import SessionLocal, AsyncSessionLocal, async_engine
+from metrics import handler_metrics
+from src.models import Message, MediaAttachment, User, UserOnlineSession, MessageReaction, MessageReceipt
 from src.messages import router as messages_router, invalidate_chat_cache
 from src.keys import router as keys_router
-from src.notifications import send_chat_push_notification
+from src.history import router as history_router
+from src.notifications import send_chat_push_notification, push_dispatcher
+from src.receipts import mark_chat_read
 from r2_storage import r2_storage  
 from auth import auth_jwt
 from config import settings
@@ -52,7 +62,29 @@ r = redis.Redis(
     port=settings.REDIS_PORT,
     db=settings.REDIS_DB
 )
-manager = ConnectionManager(redis_client=r)
+manager = ConnectionManager(
+    redis_client=r,
+    fanout_batch_window_ms=settings.FANOUT_BATCH_WINDOW_MS,
+    fanout_max_batch=settings.FANOUT_MAX_BATCH,
+    send_queue_size=settings.SEND_QUEUE_SIZE,
+    send_timeout=settings.SEND_TIMEOUT_SECONDS,
+    slow_consumer_policy=settings.SLOW_CONSUMER_POLICY
+)
+typing_debouncer = TypingDebouncer(refresh_interval=settings.TYPING_REFRESH_SECONDS)
+signal_limiter = SignalRateLimiter(rate_per_sec=settings.MAX_EPHEMERAL_EVENTS_PER_SECOND)
+
+
+async def prune_push_tokens(tokens, chat_ids):
+    """Clears tokens Expo reports as unregistered and drops cached memberships carrying them."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(User).where(User.expo_push_token.in_(tokens)).values(expo_push_token=None)
+        )
+        await db.commit()
+    for chat_id in chat_ids:
+        manager.membership.invalidate(chat_id)
+
+push_dispatcher.on_dead_tokens = prune_push_tokens
 
 
 @app.on_event("startup")
@@ -64,16 +96,19 @@ async def startup_event():
         db=settings.REDIS_DB
     )
     logger.info("🚀 ConnectionManager Redis PubSub initialized")
+    push_dispatcher.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await push_dispatcher.stop()
     await manager.close()
     logger.info("🔌 ConnectionManager closed")
 
 
 app.include_router(messages_router, prefix="/api/v2", tags=["Messages"])
 app.include_router(keys_router, prefix="/api/v2", tags=["Keys"])
+app.include_router(history_router, prefix="/api/v3", tags=["History"])
 app.add_middleware(
     CORSMiddleware,
     allow_origins=CORS_ORIGINS,  
@@ -84,6 +119,25 @@ app.add_middleware(
 )
 
 
+@app.get("/metrics/delivery")
+async def delivery_metrics():
+    return manager.delivery_metrics()
+
+
+@app.get("/metrics/push")
+async def push_metrics():
+    return push_dispatcher.metrics()
+
+
+@app.get("/metrics/handlers")
+async def handlers_metrics():
+    pool = async_engine.pool
+    return {
+        "db_pool": pool.status() if hasattr(pool, "status") else None,
+        "handlers": handler_metrics.snapshot()
+    }
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -92,6 +146,546 @@ def get_db():
         db.close()
 
 
+# Histogram names per WebSocket event type
+HANDLER_NAMES = {
+    "enter_chat": "read_receipt",
+    "mark_read": "read_receipt",
+    "read_status": "read_receipt",
+    "reaction_add": "reaction",
+    "reaction_remove": "reaction",
+    "typing_start": "typing",
+    "typing_stop": "typing",
+    "leave_chat": "leave_chat",
+    "webrtc_offer": "webrtc",
+    "webrtc_answer": "webrtc",
+    "webrtc_ice_candidate": "webrtc",
+    "edit_message": "edit_message",
+    "delete_message": "delete_message",
+}
+
+
+async def load_membership(db: AsyncSession, chat_id) -> Optional[ChatMembership]:
+    """Participant ids and push tokens from the membership cache, one query on a miss."""
+    if chat_id is None:
+        return None
+    return await manager.membership.load(db, chat_id)
+
+
+async def load_message_for_envelope(db: AsyncSession, message_id: int) -> Optional[Message]:
+    result = await db.execute(
+        select(Message)
+        .options(
+            selectinload(Message.reply_to).selectinload(Message.sender),
+            selectinload(Message.receipts),
+            selectinload(Message.media),
+        )
+        .where(Message.id == message_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
+async def get_username(db: AsyncSession, user_id: int) -> Optional[str]:
+    result = await db.execute(select(User.username).where(User.user_id == user_id))
+    return result.scalar_one_or_none()
+
+
+async def reply(user_id: int, conn_id: str, payload: dict):
+    await manager.send_to_connection(user_id, conn_id, payload)
+
+
+async def handle_read_status(db: AsyncSession, user_id: int, conn_id: str, message_type: str, data: dict):
+    chat_id = data.get("chat_id")
+
+    membership = await load_membership(db, chat_id)
+    if not membership or not membership.is_member(user_id):
+        await reply(user_id, conn_id, {"type": "error", "detail": "Not authorized or chat not found"})
+        return
+
+    now = datetime.utcnow()
+    try:
+        read_msg_ids = await db.run_sync(mark_chat_read, membership.chat_id, user_id, now)
+        await db.commit()
+    except Exception as e:
+        logger.error(f"❌ Error persisting read receipts: {e}")
+        await db.rollback()
+        read_msg_ids = []
+
+    if read_msg_ids:
+        invalidate_chat_cache(chat_id)
+
+    participant_ids = list(membership.participant_ids)
+    response_data = {
+        "type": "read_receipt",
+        "chat_id": chat_id,
+        "reader_id": user_id,
+        "message_ids": read_msg_ids,
+        "read_at": now.isoformat(),
+        "timestamp": now.isoformat()
+    }
+    await manager.send_to_users(participant_ids, response_data)
+
+
+async def handle_reaction(db: AsyncSession, user_id: int, conn_id: str, message_type: str, data: dict):
+    try:
+        chat_id = int(data.get("chat_id")) if data.get("chat_id") is not None else None
+        message_id = int(data.get("message_id")) if data.get("message_id") is not None else None
+    except (ValueError, TypeError):
+        await reply(user_id, conn_id, {"type": "error", "detail": "Invalid chat_id or message_id"})
+        return
+
+    emoji = data.get("emoji")
+    if not chat_id or not message_id or not emoji:
+        await reply(user_id, conn_id, {"type": "error", "detail": "Missing chat_id, message_id or emoji"})
+        return
+
+    membership = await load_membership(db, chat_id)
+    if not membership or not membership.is_member(user_id):
+        await reply(user_id, conn_id, {"type": "error", "detail": "Not authorized"})
+        return
+
+    message = await db.get(Message, message_id)
+    if not message:
+        await reply(user_id, conn_id, {"type": "error", "detail": "Message not found"})
+        return
+
+    existing = (await db.execute(
+        select(MessageReaction).where(
+            MessageReaction.message_id == message_id,
+            MessageReaction.user_id == user_id,
+            MessageReaction.emoji == emoji
+        )
+    )).scalars().first()
+
+    if message_type == "reaction_add":
+        if not existing:
+            db.add(MessageReaction(message_id=message_id, user_id=user_id, emoji=emoji, created_at=datetime.utcnow()))
+            await db.commit()
+
+            # Push notification for recipient if offline
+            sender_name = await get_username(db, user_id) or "User"
+
+            others = membership.others(user_id)
+            online = manager.online_among(others)
+            recipient_tokens = membership.tokens_for(uid for uid in others if uid not in online)
+
+            if recipient_tokens:
+                await send_chat_push_notification(
+                    recipient_tokens=recipient_tokens,
+                    sender_name=sender_name,
+                    message_text=f"reacted {emoji} to your message",
+                    chat_id=message.chat_id,
+                    message_id=message_id
+                )
+    else:
+        if existing:
+            await db.delete(existing)
+            await db.commit()
+
+    invalidate_chat_cache(message.chat_id)
+
+    reactions = (await db.execute(
+        select(MessageReaction).where(MessageReaction.message_id == message_id)
+    )).scalars().all()
+    for p_id in membership.participant_ids:
+        summary = {}
+        for r_item in reactions:
+            if r_item.emoji not in summary:
+                summary[r_item.emoji] = {"emoji": r_item.emoji, "count": 0, "reacted_by_me": False}
+            summary[r_item.emoji]["count"] += 1
+            if r_item.user_id == p_id:
+                summary[r_item.emoji]["reacted_by_me"] = True
+
+        await manager.send_to_users([p_id], {
+            "type": "reaction_update",
+            "chat_id": message.chat_id,
+            "message_id": message_id,
+            "server_msg_id": message_id,
+            "reactions": list(summary.values())
+        })
+
+
+async def lookup_membership(chat_id) -> Optional[ChatMembership]:
+    """Membership for ephemeral signals: a session is only opened on a cache miss."""
+    try:
+        chat_id = int(chat_id)
+    except (ValueError, TypeError):
+        return None
+    membership = manager.membership.get(chat_id)
+    if membership is None:
+        async with AsyncSessionLocal() as db:
+            membership = await load_membership(db, chat_id)
+    return membership
+
+
+async def handle_typing(user_id: int, conn_id: str, message_type: str, data: dict):
+    chat_id = data.get("chat_id")
+    membership = await lookup_membership(chat_id)
+    if not membership or not membership.is_member(user_id):
+        return
+
+    is_typing = (message_type == "typing_start")
+    if not typing_debouncer.should_emit(membership.chat_id, user_id, is_typing):
+        return
+
+    await manager.send_ephemeral(membership.others(user_id), {
+        "type": "typing_status",
+        "chat_id": chat_id,
+        "user_id": user_id,
+        "is_typing": is_typing
+    })
+
+
+async def handle_webrtc_signal(user_id: int, conn_id: str, message_type: str, data: dict):
+    chat_id = data.get("chat_id")
+    target_user_id = data.get("target_user_id")
+
+    if not chat_id or not target_user_id:
+        await reply(user_id, conn_id, {"type": "error", "detail": "Missing chat_id or target_user_id"})
+        return
+
+    membership = await lookup_membership(chat_id)
+    if not membership or not membership.is_member(user_id):
+        await reply(user_id, conn_id, {"type": "error", "detail": "Not authorized"})
+        return
+
+    if not membership.is_member(target_user_id):
+        await reply(user_id, conn_id, {"type": "error", "detail": "Target user not in chat"})
+        return
+
+    # Forward signaling payload directly to target user
+    signal_payload = {
+        "type": message_type,
+        "chat_id": chat_id,
+        "sender_user_id": user_id,
+        "target_user_id": target_user_id,
+        "sdp": data.get("sdp"),
+        "candidate": data.get("candidate"),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    await manager.send_ephemeral([target_user_id], signal_payload)
+
+
+async def handle_edit_message(db: AsyncSession, user_id: int, conn_id: str, message_type: str, data: dict):
+    try:
+        chat_id = int(data.get("chat_id")) if data.get("chat_id") is not None else None
+        message_id = int(data.get("message_id")) if data.get("message_id") is not None else None
+    except (ValueError, TypeError):
+        await reply(user_id, conn_id, {"type": "error", "detail": "Invalid chat_id or message_id"})
+        return
+
+    new_text = data.get("text") if data.get("text") is not None else (data.get("content") or data.get("message") or "")
+
+    if not message_id:
+        await reply(user_id, conn_id, {"type": "error", "detail": "Missing message_id"})
+        return
+
+    message = await db.get(Message, message_id)
+    if not message:
+        await reply(user_id, conn_id, {"type": "error", "detail": "Message not found"})
+        return
+
+    if int(message.sender_id) != int(user_id):
+        await reply(user_id, conn_id, {"type": "error", "detail": "Only sender can edit message"})
+        return
+
+    if message.deleted_at is not None:
+        await reply(user_id, conn_id, {"type": "error", "detail": "Cannot edit deleted message"})
+        return
+
+    created_at = message.created_at
+    if created_at:
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+        time_diff = (datetime.utcnow() - created_at).total_seconds()
+        if time_diff > 900:
+            await reply(user_id, conn_id, {"type": "error", "detail": "Edit time window expired"})
+            return
+
+    message.text = new_text
+    message.edited_at = datetime.utcnow()
+    await db.commit()
+
+    invalidate_chat_cache(message.chat_id)
+
+    membership = await load_membership(db, message.chat_id)
+    participant_ids = list(membership.participant_ids) if membership else [user_id]
+    await manager.send_to_users(participant_ids, {
+        "type": "message_edited",
+        "chat_id": message.chat_id,
+        "message_id": message.id,
+        "server_msg_id": message.id,
+        "content": new_text,
+        "text": new_text,
+        "edited_at": message.edited_at.isoformat()
+    })
+
+
+async def handle_delete_message(db: AsyncSession, user_id: int, conn_id: str, message_type: str, data: dict):
+    chat_id = data.get("chat_id")
+    message_id = data.get("message_id")
+
+    message = (await db.execute(
+        select(Message).where(Message.id == message_id, Message.chat_id == chat_id)
+    )).scalars().first()
+    if not message:
+        await reply(user_id, conn_id, {"type": "error", "detail": "Message not found"})
+        return
+
+    if int(message.sender_id) != int(user_id):
+        await reply(user_id, conn_id, {"type": "error", "detail": "Only sender can delete message"})
+        return
+
+    message.deleted_at = datetime.utcnow()
+    await db.commit()
+
+    invalidate_chat_cache(chat_id)
+
+    membership = await load_membership(db, message.chat_id)
+    participant_ids = list(membership.participant_ids) if membership else [user_id]
+    await manager.send_to_users(participant_ids, {
+        "type": "message_deleted",
+        "chat_id": chat_id,
+        "message_id": message_id,
+        "server_msg_id": message_id,
+        "deleted_at": message.deleted_at.isoformat()
+    })
+
+
+async def handle_new_message(db: AsyncSession, user_id: int, conn_id: str, message_type: str, data: dict):
+    chat_id = data.get("chat_id")
+    membership = await load_membership(db, chat_id)
+
+    if not membership:
+        await reply(user_id, conn_id, {"type": "error", "detail": "Chat not found"})
+        return
+
+    participant_ids = list(membership.participant_ids)
+    if not membership.is_member(user_id):
+        await reply(user_id, conn_id, {"type": "error", "detail": "Not allowed"})
+        return
+
+    reply_to_id = data.get("reply_to_id")
+    if reply_to_id:
+        reply_msg = (await db.execute(
+            select(Message.id).where(Message.id == reply_to_id, Message.chat_id == chat_id)
+        )).scalar_one_or_none()
+        if not reply_msg:
+            await reply(user_id, conn_id, {"type": "error", "detail": "Invalid reply_to_id"})
+            return
+
+    message_text = data.get("message") or data.get("content", "")
+    if len(message_text) > settings.MAX_TEXT_LENGTH:
+        await reply(user_id, conn_id, {
+            "type": "error",
+            "code": "payload_too_large",
+            "detail": f"Message text exceeds maximum allowed length of {settings.MAX_TEXT_LENGTH}"
+        })
+        return
+
+    client_msg_id = data.get("client_msg_id") or str(uuid.uuid4())
+
+    # One presence round trip serves both delivery receipts and push targeting
+    recipient_ids = membership.others(user_id)
+    online_recipient_ids = manager.online_among(recipient_ids)
+
+    # Workstream A3: Idempotency check
+    existing_message = (await db.execute(
+        select(Message)
+        .options(selectinload(Message.media))
+        .where(
+            Message.chat_id == chat_id,
+            Message.sender_id == user_id,
+            Message.client_msg_id == client_msg_id
+        )
+    )).scalars().first()
+
+    if existing_message:
+        message = existing_message
+        media_attachments = [
+            {"id": m.id, "file_url": m.file_url, "preview_url": m.preview_url} for m in message.media
+        ]
+    else:
+        message = Message(
+            chat_id=chat_id,
+            sender_id=user_id,
+            client_msg_id=client_msg_id,
+            reply_to_id=reply_to_id,
+            text=message_text,
+            created_at=datetime.utcnow(),
+            is_read=False
+        )
+        db.add(message)
+        await db.commit()
+
+        # Clear cache
+        invalidate_chat_cache(chat_id)
+
+        media_attachments = []
+
+        # 1. Process off-WS pre-signed upload media_keys (Workstream C1)
+        media_keys = data.get("media_keys", [])
+        for key in media_keys:
+            # Only keys issued for this chat; others' media can't be attached by name
+            if r2_storage.belongs_to_chat(key, membership.chat_id) and r2_storage.verify_object_exists(key):
+                media_attachment = MediaAttachment(
+                    message_id=message.id,
+                    file=key
+                )
+                db.add(media_attachment)
+                await db.commit()
+                media_attachments.append({
+                    'id': media_attachment.id,
+                    'file_url': media_attachment.file_url,
+                    'preview_url': media_attachment.preview_url
+                })
+
+        # 2. Legacy base64 media fallback
+        media_list = data.get("media", [])
+        for idx, media in enumerate(media_list):
+            try:
+                if not isinstance(media, dict) or 'data' not in media or not media['data']:
+                    continue
+
+                file_data = base64.b64decode(media['data'])
+                if len(file_data) > MAX_MEDIA_SIZE_MB * 1024 * 1024:
+                    continue
+
+                file_ext = "jpg" if "image" in media.get('type', '') else "mp4"
+                relative_path = r2_storage.content_key(membership.chat_id, hashlib.sha256(file_data).hexdigest(), file_ext)
+                content_type = "image/jpeg" if "image" in media.get('type', '') else "video/mp4"
+                # Content already sent in this chat is stored under its hash
+                if r2_storage.object_exists(relative_path):
+                    file_url = f"https://{r2_storage.custom_domain or 'media.nextvibe.io'}/{relative_path}"
+                else:
+                    file_url = r2_storage.upload_file(file_data, relative_path, content_type)
+
+                media_attachment = MediaAttachment(
+                    message_id=message.id,
+                    file=relative_path
+                )
+                db.add(media_attachment)
+                await db.commit()
+
+                media_attachments.append({
+                    'id': media_attachment.id,
+                    'file_url': file_url,
+                    'preview_url': media_attachment.preview_url
+                })
+
+            except Exception as e:
+                logger.error(f"❌ Media upload error: {e}")
+                await db.rollback()
+
+        # Receipts creation
+        now = datetime.utcnow()
+        sender_rcpt = MessageReceipt(message_id=message.id, user_id=user_id, delivered_at=now, read_at=now)
+        db.add(sender_rcpt)
+
+        delivered_user_ids = []
+        for p_id in recipient_ids:
+            if p_id in online_recipient_ids:
+                db.add(MessageReceipt(message_id=message.id, user_id=p_id, delivered_at=now))
+                delivered_user_ids.append(p_id)
+        await db.commit()
+
+    message = await load_message_for_envelope(db, message.id)
+
+    # Build quote snippet if reply_to exists
+    reply_snippet = None
+    if message.reply_to:
+        reply_sender_name = f"User {message.reply_to.sender_id}"
+        if message.reply_to.sender:
+            reply_sender_name = getattr(message.reply_to.sender, "username", reply_sender_name)
+        reply_snippet = {
+            "id": message.reply_to.id,
+            "sender_id": message.reply_to.sender_id,
+            "sender_name": reply_sender_name,
+            "text": (message.reply_to.text[:100] + "...") if message.reply_to.text and len(message.reply_to.text) > 100 else message.reply_to.text,
+            "is_deleted": message.reply_to.deleted_at is not None
+        }
+
+    # Receipts payload
+    receipts_data = [
+        {
+            "user_id": rcpt.user_id,
+            "delivered_at": rcpt.delivered_at.isoformat() if rcpt.delivered_at else None,
+            "read_at": rcpt.read_at.isoformat() if rcpt.read_at else None
+        }
+        for rcpt in message.receipts
+    ]
+
+    # Workstream A3 & Phase 2: Standardized envelope format
+    response_envelope = {
+        "type": "message",
+        "client_msg_id": message.client_msg_id,
+        "server_msg_id": message.id,
+        "message_id": message.id,  # backward compatibility
+        "chat_id": chat_id,
+        "sender_id": user_id,
+        "content": message.text,
+        "reply_to_id": message.reply_to_id,
+        "reply_to_snippet": reply_snippet,
+        "created_at": message.created_at.isoformat(),
+        "edited_at": message.edited_at.isoformat() if message.edited_at else None,
+        "deleted_at": message.deleted_at.isoformat() if message.deleted_at else None,
+        "is_read": message.is_read,
+        "reactions": [],
+        "receipts": receipts_data,
+        "media": media_attachments,
+        "ts": message.created_at.isoformat()
+    }
+
+    # Workstream A2: Scoped fan-out to chat participants ONLY
+    await manager.send_to_users(participant_ids, response_envelope)
+
+    # Trigger Expo Push Notifications for offline recipients
+    sender_name = await get_username(db, user_id) or "User"
+
+    offline_tokens = membership.tokens_for(uid for uid in recipient_ids if uid not in online_recipient_ids)
+
+    if offline_tokens:
+        push_text = message.text or ""
+        if media_attachments:
+            count = len(media_attachments)
+            is_video = any(".mp4" in str(m.get("file_url", "")) for m in media_attachments)
+            media_label = ("🎥 Video" if count == 1 else f"🎥 {count} videos") if is_video else ("📷 Photo" if count == 1 else f"📷 {count} photos")
+            push_text = f"{media_label} {push_text}".strip() if push_text else media_label
+
+        await send_chat_push_notification(
+            recipient_tokens=offline_tokens,
+            sender_name=sender_name,
+            message_text=push_text,
+            chat_id=chat_id,
+            message_id=message.id
+        )
+
+
+async def handle_noop(db: AsyncSession, user_id: int, conn_id: str, message_type: str, data: dict):
+    pass
+
+
+EVENT_HANDLERS = {
+    "enter_chat": handle_read_status,
+    "mark_read": handle_read_status,
+    "read_status": handle_read_status,
+    "reaction_add": handle_reaction,
+    "reaction_remove": handle_reaction,
+    "leave_chat": handle_noop,
+    "edit_message": handle_edit_message,
+    "delete_message": handle_delete_message,
+}
+
+# Typing and signaling: no DB session, no persistence, own rate budget and pub/sub channels
+EPHEMERAL_HANDLERS = {
+    "typing_start": handle_typing,
+    "typing_stop": handle_typing,
+    "webrtc_offer": handle_webrtc_signal,
+    "webrtc_answer": handle_webrtc_signal,
+    "webrtc_ice_candidate": handle_webrtc_signal,
+}
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     if ENVIRONMENT == "development":
@@ -101,7 +695,6 @@ async def websocket_endpoint(websocket: WebSocket):
     else:
         logger.info(f"🔌 WebSocket connection from {websocket.client}")
     
-    db = SessionLocal()
     token = websocket.query_params.get("token")
     
     if not token:
@@ -142,526 +735,65 @@ async def websocket_endpoint(websocket: WebSocket):
     conn_id = await manager.connect(websocket, user_id)
     logger.info(f"✅ User {user_id} connected (conn_id: {conn_id})")
 
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if user:
-        user.is_online = True
-        session = UserOnlineSession(user_id=user_id, connected_at=datetime.utcnow())
-        db.add(session)
-        db.commit()
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        if user:
+            user.is_online = True
+            db.add(UserOnlineSession(user_id=user_id, connected_at=datetime.utcnow()))
+            await db.commit()
 
     try:
         while True:
             data = await websocket.receive_json()
             message_type = data.get('type', 'message')
 
+            ephemeral_handler = EPHEMERAL_HANDLERS.get(message_type)
+            if ephemeral_handler:
+                if not signal_limiter.allow(user_id):
+                    await reply(user_id, conn_id, {
+                        "type": "error",
+                        "code": "rate_limited",
+                        "detail": "Rate limit exceeded. Please slow down."
+                    })
+                    continue
+                with handler_metrics.track(HANDLER_NAMES[message_type]):
+                    await ephemeral_handler(user_id, conn_id, message_type, data)
+                continue
+
             # Rate Limiting check (Workstream A4)
             if not manager.check_rate_limit(user_id, settings.MAX_EVENTS_PER_SECOND):
                 logger.warning(f"⚠️ Rate limit exceeded for user {user_id}")
-                await websocket.send_json({
+                await reply(user_id, conn_id, {
                     "type": "error",
                     "code": "rate_limited",
                     "detail": "Rate limit exceeded. Please slow down."
                 })
                 continue
 
-            if message_type in ("enter_chat", "mark_read", "read_status"):
-                chat_id = data.get("chat_id")
-                
-                # Expire stale objects in session identity map & commit active read transaction snapshot
-                try:
-                    db.expire_all()
-                    db.commit()
-                except Exception:
-                    db.rollback()
-
-                chat = db.query(Chat).filter(Chat.id == chat_id).first()
-                if not chat or user_id not in [u.user_id for u in chat.participants]:
-                    await websocket.send_json({"type": "error", "detail": "Not authorized or chat not found"})
-                    continue
-
-                # Clear cache
-                invalidate_chat_cache(chat_id)
-
-                # Fetch all messages in chat sent by others
-                messages_in_chat = (
-                    db.query(Message)
-                    .filter(Message.chat_id == chat_id)
-                    .filter(Message.sender_id != user_id)
-                    .all()
-                )
-
-                read_msg_ids = []
-                now = datetime.utcnow()
-                for msg in messages_in_chat:
-                    rcpt = db.query(MessageReceipt).filter(
-                        MessageReceipt.message_id == msg.id,
-                        MessageReceipt.user_id == user_id
-                    ).first()
-                    if not rcpt:
-                        rcpt = MessageReceipt(message_id=msg.id, user_id=user_id, delivered_at=now, read_at=now)
-                        db.add(rcpt)
-                        read_msg_ids.append(msg.id)
-                    elif not rcpt.read_at:
-                        rcpt.read_at = now
-                        if not rcpt.delivered_at:
-                            rcpt.delivered_at = now
-                        read_msg_ids.append(msg.id)
-                    msg.is_read = True
-
-                try:
-                    db.commit()
-                    invalidate_chat_cache(chat_id)
-                except Exception as e:
-                    logger.error(f"❌ Error persisting read receipts: {e}")
-                    db.rollback()
-
-                participant_ids = [u.user_id for u in chat.participants]
-                response_data = {
-                    "type": "read_receipt",
-                    "chat_id": chat_id,
-                    "reader_id": user_id,
-                    "message_ids": read_msg_ids,
-                    "read_at": now.isoformat(),
-                    "timestamp": now.isoformat()
-                }
-                await manager.send_to_users(participant_ids, response_data)
-
-            elif message_type in ("reaction_add", "reaction_remove"):
-                try:
-                    chat_id = int(data.get("chat_id")) if data.get("chat_id") is not None else None
-                    message_id = int(data.get("message_id")) if data.get("message_id") is not None else None
-                except (ValueError, TypeError):
-                    await websocket.send_json({"type": "error", "detail": "Invalid chat_id or message_id"})
-                    continue
-
-                emoji = data.get("emoji")
-                if not chat_id or not message_id or not emoji:
-                    await websocket.send_json({"type": "error", "detail": "Missing chat_id, message_id or emoji"})
-                    continue
-
-                chat = db.query(Chat).filter(Chat.id == chat_id).first()
-                if not chat or user_id not in [u.user_id for u in chat.participants]:
-                    await websocket.send_json({"type": "error", "detail": "Not authorized"})
-                    continue
-
-                message = db.query(Message).filter(Message.id == message_id).first()
-                if not message:
-                    await websocket.send_json({"type": "error", "detail": "Message not found"})
-                    continue
-
-                if message_type == "reaction_add":
-                    existing = db.query(MessageReaction).filter(
-                        MessageReaction.message_id == message_id,
-                        MessageReaction.user_id == user_id,
-                        MessageReaction.emoji == emoji
-                    ).first()
-                    if not existing:
-                        db.add(MessageReaction(message_id=message_id, user_id=user_id, emoji=emoji, created_at=datetime.utcnow()))
-                        db.commit()
-
-                        # Push notification for recipient if offline
-                        sender_user = db.query(User).filter(User.user_id == user_id).first()
-                        sender_name = sender_user.username if sender_user else "User"
-
-                        recipient_tokens = []
-                        for p in chat.participants:
-                            if p.user_id != user_id and not manager.is_user_online(p.user_id):
-                                push_token = getattr(p, "expo_push_token", None)
-                                if push_token:
-                                    recipient_tokens.append(push_token)
-
-                        if recipient_tokens:
-                            await send_chat_push_notification(
-                                recipient_tokens=recipient_tokens,
-                                sender_name=sender_name,
-                                message_text=f"reacted {emoji} to your message",
-                                chat_id=message.chat_id,
-                                message_id=message_id
-                            )
-                else:
-                    existing = db.query(MessageReaction).filter(
-                        MessageReaction.message_id == message_id,
-                        MessageReaction.user_id == user_id,
-                        MessageReaction.emoji == emoji
-                    ).first()
-                    if existing:
-                        db.delete(existing)
-                        db.commit()
-
-                invalidate_chat_cache(message.chat_id)
-
-                reactions = db.query(MessageReaction).filter(MessageReaction.message_id == message_id).all()
-                for p in chat.participants:
-                    p_id = p.user_id
-                    summary = {}
-                    for r_item in reactions:
-                        if r_item.emoji not in summary:
-                            summary[r_item.emoji] = {"emoji": r_item.emoji, "count": 0, "reacted_by_me": False}
-                        summary[r_item.emoji]["count"] += 1
-                        if r_item.user_id == p_id:
-                            summary[r_item.emoji]["reacted_by_me"] = True
-
-                    await manager.send_to_users([p_id], {
-                        "type": "reaction_update",
-                        "chat_id": message.chat_id,
-                        "message_id": message_id,
-                        "server_msg_id": message_id,
-                        "reactions": list(summary.values())
-                    })
-
-            elif message_type in ("typing_start", "typing_stop"):
-                chat_id = data.get("chat_id")
-                chat = db.query(Chat).filter(Chat.id == chat_id).first()
-                if chat and user_id in [u.user_id for u in chat.participants]:
-                    is_typing = (message_type == "typing_start")
-                    redis_key = f"typing:{chat_id}:{user_id}"
-                    if is_typing:
-                        r.setex(redis_key, 5, "1")
-                    else:
-                        r.delete(redis_key)
-
-                    participant_ids = [u.user_id for u in chat.participants if u.user_id != user_id]
-                    await manager.send_to_users(participant_ids, {
-                        "type": "typing_status",
-                        "chat_id": chat_id,
-                        "user_id": user_id,
-                        "is_typing": is_typing
-                    })
-
-            elif message_type in ("enter_chat", "leave_chat"):
-                pass
-
-            elif message_type in ("webrtc_offer", "webrtc_answer", "webrtc_ice_candidate"):
-                chat_id = data.get("chat_id")
-                target_user_id = data.get("target_user_id")
-
-                if not chat_id or not target_user_id:
-                    await websocket.send_json({"type": "error", "detail": "Missing chat_id or target_user_id"})
-                    continue
-
-                chat = db.query(Chat).filter(Chat.id == chat_id).first()
-                if not chat or user_id not in [u.user_id for u in chat.participants]:
-                    await websocket.send_json({"type": "error", "detail": "Not authorized"})
-                    continue
-
-                if target_user_id not in [u.user_id for u in chat.participants]:
-                    await websocket.send_json({"type": "error", "detail": "Target user not in chat"})
-                    continue
-
-                # Forward signaling payload directly to target user
-                signal_payload = {
-                    "type": message_type,
-                    "chat_id": chat_id,
-                    "sender_user_id": user_id,
-                    "target_user_id": target_user_id,
-                    "sdp": data.get("sdp"),
-                    "candidate": data.get("candidate"),
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-                await manager.send_to_users([target_user_id], signal_payload)
-
-            elif message_type == "edit_message":
-                try:
-                    chat_id = int(data.get("chat_id")) if data.get("chat_id") is not None else None
-                    message_id = int(data.get("message_id")) if data.get("message_id") is not None else None
-                except (ValueError, TypeError):
-                    await websocket.send_json({"type": "error", "detail": "Invalid chat_id or message_id"})
-                    continue
-
-                new_text = data.get("text") if data.get("text") is not None else (data.get("content") or data.get("message") or "")
-
-                if not message_id:
-                    await websocket.send_json({"type": "error", "detail": "Missing message_id"})
-                    continue
-
-                message = db.query(Message).filter(Message.id == message_id).first()
-                if not message:
-                    await websocket.send_json({"type": "error", "detail": "Message not found"})
-                    continue
-
-                if int(message.sender_id) != int(user_id):
-                    await websocket.send_json({"type": "error", "detail": "Only sender can edit message"})
-                    continue
-
-                if message.deleted_at is not None:
-                    await websocket.send_json({"type": "error", "detail": "Cannot edit deleted message"})
-                    continue
-
-                created_at = message.created_at
-                if created_at:
-                    if created_at.tzinfo is not None:
-                        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
-                    time_diff = (datetime.utcnow() - created_at).total_seconds()
-                    if time_diff > 900:
-                        await websocket.send_json({"type": "error", "detail": "Edit time window expired"})
-                        continue
-
-                message.text = new_text
-                message.edited_at = datetime.utcnow()
-                db.commit()
-
-                invalidate_chat_cache(message.chat_id)
-
-                participant_ids = [u.user_id for u in message.chat.participants]
-                await manager.send_to_users(participant_ids, {
-                    "type": "message_edited",
-                    "chat_id": message.chat_id,
-                    "message_id": message.id,
-                    "server_msg_id": message.id,
-                    "content": new_text,
-                    "text": new_text,
-                    "edited_at": message.edited_at.isoformat()
-                })
-
-            elif message_type == "delete_message":
-                chat_id = data.get("chat_id")
-                message_id = data.get("message_id")
-
-                message = db.query(Message).filter(Message.id == message_id, Message.chat_id == chat_id).first()
-                if not message:
-                    await websocket.send_json({"type": "error", "detail": "Message not found"})
-                    continue
-
-                if int(message.sender_id) != int(user_id):
-                    await websocket.send_json({"type": "error", "detail": "Only sender can delete message"})
-                    continue
-
-                message.deleted_at = datetime.utcnow()
-                db.commit()
-
-                keys = r.keys(f"chat:{chat_id}:*")
-                if keys:
-                    r.delete(*keys)
-
-                participant_ids = [u.user_id for u in message.chat.participants]
-                await manager.send_to_users(participant_ids, {
-                    "type": "message_deleted",
-                    "chat_id": chat_id,
-                    "message_id": message_id,
-                    "server_msg_id": message_id,
-                    "deleted_at": message.deleted_at.isoformat()
-                })
-
-            elif message_type == "ping":
+            if message_type == "ping":
                 manager.refresh_presence(user_id, conn_id)
-                await websocket.send_json({"type": "pong"})
-
-            else:
-                # New message flow
-                chat_id = data.get("chat_id")
-                chat = db.query(Chat).filter(Chat.id == chat_id).first()
-
-                if not chat:
-                    await websocket.send_json({"type": "error", "detail": "Chat not found"})
-                    continue
-
-                participant_ids = [u.user_id for u in chat.participants]
-                if user_id not in participant_ids:
-                    await websocket.send_json({"type": "error", "detail": "Not allowed"})
-                    continue
-
-                reply_to_id = data.get("reply_to_id")
-                if reply_to_id:
-                    reply_msg = db.query(Message).filter(Message.id == reply_to_id, Message.chat_id == chat_id).first()
-                    if not reply_msg:
-                        await websocket.send_json({"type": "error", "detail": "Invalid reply_to_id"})
-                        continue
-
-                message_text = data.get("message") or data.get("content", "")
-                if len(message_text) > settings.MAX_TEXT_LENGTH:
-                    await websocket.send_json({
-                        "type": "error",
-                        "code": "payload_too_large",
-                        "detail": f"Message text exceeds maximum allowed length of {settings.MAX_TEXT_LENGTH}"
-                    })
-                    continue
-
-                client_msg_id = data.get("client_msg_id") or str(uuid.uuid4())
+                await reply(user_id, conn_id, {"type": "pong"})
+                continue
 
-                # Workstream A3: Idempotency check
-                existing_message = db.query(Message).filter(
-                    Message.chat_id == chat_id,
-                    Message.sender_id == user_id,
-                    Message.client_msg_id == client_msg_id
-                ).first()
-
-                if existing_message:
-                    message = existing_message
-                    media_attachments = [
-                        {"id": m.id, "file_url": m.file_url, "preview_url": m.preview_url} for m in message.media
-                    ]
-                else:
-                    message = Message(
-                        chat_id=chat_id,
-                        sender_id=user_id,
-                        client_msg_id=client_msg_id,
-                        reply_to_id=reply_to_id,
-                        text=message_text,
-                        created_at=datetime.utcnow(),
-                        is_read=False
-                    )
-                    db.add(message)
-                    db.commit()
-                    db.refresh(message)
-
-                    # Clear cache
-                    keys = r.keys(f"chat:{chat_id}:*")
-                    if keys:
-                        r.delete(*keys)
-
-                    media_attachments = []
-
-                    # 1. Process off-WS pre-signed upload media_keys (Workstream C1)
-                    media_keys = data.get("media_keys", [])
-                    for key in media_keys:
-                        if r2_storage.verify_object_exists(key):
-                            media_attachment = MediaAttachment(
-                                message_id=message.id,
-                                file=key
-                            )
-                            db.add(media_attachment)
-                            db.commit()
-                            db.refresh(media_attachment)
-                            media_attachments.append({
-                                'id': media_attachment.id,
-                                'file_url': media_attachment.file_url,
-                                'preview_url': media_attachment.preview_url
-                            })
-
-                    # 2. Legacy base64 media fallback
-                    media_list = data.get("media", [])
-                    for idx, media in enumerate(media_list):
-                        try:
-                            if not isinstance(media, dict) or 'data' not in media or not media['data']:
-                                continue
-
-                            file_data = base64.b64decode(media['data'])
-                            if len(file_data) > MAX_MEDIA_SIZE_MB * 1024 * 1024:
-                                continue
-
-                            file_name = f"message_{message.id}_{len(media_attachments)}"
-                            file_ext = "jpg" if "image" in media.get('type', '') else "mp4"
-                            relative_path = f"chat_media/{file_name}.{file_ext}"
-                            content_type = "image/jpeg" if "image" in media.get('type', '') else "video/mp4"
-                            file_url = r2_storage.upload_file(file_data, relative_path, content_type)
-
-                            media_attachment = MediaAttachment(
-                                message_id=message.id,
-                                file=relative_path
-                            )
-                            db.add(media_attachment)
-                            db.commit()
-                            db.refresh(media_attachment)
-                            
-                            media_attachments.append({
-                                'id': media_attachment.id,
-                                'file_url': file_url,
-                                'preview_url': media_attachment.preview_url
-                            })
-
-                        except Exception as e:
-                            logger.error(f"❌ Media upload error: {e}")
-                            db.rollback()
-
-                    # Receipts creation
-                    now = datetime.utcnow()
-                    sender_rcpt = MessageReceipt(message_id=message.id, user_id=user_id, delivered_at=now, read_at=now)
-                    db.add(sender_rcpt)
-
-                    delivered_user_ids = []
-                    for p in chat.participants:
-                        if p.user_id != user_id:
-                            if manager.is_user_online(p.user_id):
-                                db.add(MessageReceipt(message_id=message.id, user_id=p.user_id, delivered_at=now))
-                                delivered_user_ids.append(p.user_id)
-                    db.commit()
-
-                # Build quote snippet if reply_to exists
-                reply_snippet = None
-                if message.reply_to:
-                    reply_sender_name = f"User {message.reply_to.sender_id}"
-                    if message.reply_to.sender:
-                        reply_sender_name = getattr(message.reply_to.sender, "username", reply_sender_name)
-                    reply_snippet = {
-                        "id": message.reply_to.id,
-                        "sender_id": message.reply_to.sender_id,
-                        "sender_name": reply_sender_name,
-                        "text": (message.reply_to.text[:100] + "...") if message.reply_to.text and len(message.reply_to.text) > 100 else message.reply_to.text,
-                        "is_deleted": message.reply_to.deleted_at is not None
-                    }
-
-                # Receipts payload
-                receipts_data = [
-                    {
-                        "user_id": rcpt.user_id,
-                        "delivered_at": rcpt.delivered_at.isoformat() if rcpt.delivered_at else None,
-                        "read_at": rcpt.read_at.isoformat() if rcpt.read_at else None
-                    }
-                    for rcpt in message.receipts
-                ]
-
-                # Workstream A3 & Phase 2: Standardized envelope format
-                response_envelope = {
-                    "type": "message",
-                    "client_msg_id": message.client_msg_id,
-                    "server_msg_id": message.id,
-                    "message_id": message.id,  # backward compatibility
-                    "chat_id": chat_id,
-                    "sender_id": user_id,
-                    "content": message.text,
-                    "reply_to_id": message.reply_to_id,
-                    "reply_to_snippet": reply_snippet,
-                    "created_at": message.created_at.isoformat(),
-                    "edited_at": message.edited_at.isoformat() if message.edited_at else None,
-                    "deleted_at": message.deleted_at.isoformat() if message.deleted_at else None,
-                    "is_read": message.is_read,
-                    "reactions": [],
-                    "receipts": receipts_data,
-                    "media": media_attachments,
-                    "ts": message.created_at.isoformat()
-                }
-
-                # Workstream A2: Scoped fan-out to chat participants ONLY
-                await manager.send_to_users(participant_ids, response_envelope)
-
-                # Trigger Expo Push Notifications for offline recipients
-                sender_user = db.query(User).filter(User.user_id == user_id).first()
-                sender_name = sender_user.username if sender_user else "User"
-
-                offline_tokens = []
-                for p in chat.participants:
-                    if p.user_id != user_id and not manager.is_user_online(p.user_id):
-                        push_token = getattr(p, "expo_push_token", None)
-                        if push_token:
-                            offline_tokens.append(push_token)
-
-                if offline_tokens:
-                    push_text = message.text or ""
-                    if media_attachments:
-                        count = len(media_attachments)
-                        is_video = any(".mp4" in str(m.get("file_url", "")) for m in media_attachments)
-                        media_label = ("🎥 Video" if count == 1 else f"🎥 {count} videos") if is_video else ("📷 Photo" if count == 1 else f"📷 {count} photos")
-                        push_text = f"{media_label} {push_text}".strip() if push_text else media_label
-
-                    await send_chat_push_notification(
-                        recipient_tokens=offline_tokens,
-                        sender_name=sender_name,
-                        message_text=push_text,
-                        chat_id=chat_id,
-                        message_id=message.id
-                    )
+            # Anything unrecognised is treated as a new message (legacy clients omit "type")
+            handler = EVENT_HANDLERS.get(message_type, handle_new_message)
+            with handler_metrics.track(HANDLER_NAMES.get(message_type, "message")):
+                async with AsyncSessionLocal() as db:
+                    await handler(db, user_id, conn_id, message_type, data)
 
     except WebSocketDisconnect:
         logger.info(f"👋 User {user_id} disconnected")
     except Exception as e:
         logger.error(f"❌ WebSocket error (user {user_id}): {e}")
-        db.rollback()
     finally:
         manager.disconnect(websocket, user_id, conn_id)
+        if not manager.count_connections(user_id):
+            typing_debouncer.forget_user(user_id)
+            signal_limiter.forget_user(user_id)
         if not manager.is_user_online(user_id):
-            user = db.query(User).filter(User.user_id == user_id).first()
-            if user:
-                user.is_online = False
-                user.last_seen = datetime.utcnow()
-                db.commit()
-        db.close()
+            async with AsyncSessionLocal() as db:
+                user = await db.get(User, user_id)
+                if user:
+                    user.is_online = False
+                    user.last_seen = datetime.utcnow()
+                    await db.commit()
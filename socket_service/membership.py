@@ -0,0 +1,206 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import time
+import redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models import User
+from src.models.message_model import chat_participants
+
+logger = logging.getLogger("membership")
+
+# Redis hash per chat: user_id -> expo push token ("" when the user has none)
+MEMBERSHIP_KEY_PREFIX = "chat_members:"
+# Bumped on every invalidation; a load only writes back if it is unchanged since its DB read
+GENERATION_KEY_PREFIX = "chat_members_gen:"
+GENERATION_TTL = 86400
+# put() without a generation writes unconditionally
+_UNVERSIONED = object()
+# Django publishes chat ids here when CreateChatView/DeleteChatView change membership
+INVALIDATION_CHANNEL = "chat_membership_invalidate"
+
+
+def membership_key(chat_id: int) -> str:
+    return f"{MEMBERSHIP_KEY_PREFIX}{chat_id}"
+
+
+def generation_key(chat_id: int) -> str:
+    return f"{GENERATION_KEY_PREFIX}{chat_id}"
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class ChatMembership:
+    __slots__ = ("chat_id", "participant_ids", "push_tokens")
+
+    def __init__(self, chat_id: int, push_tokens: Dict[int, Optional[str]]):
+        self.chat_id = chat_id
+        self.push_tokens = push_tokens
+        self.participant_ids = frozenset(push_tokens)
+
+    def is_member(self, user_id) -> bool:
+        return user_id in self.participant_ids
+
+    def others(self, user_id: int) -> List[int]:
+        return [uid for uid in self.participant_ids if uid != user_id]
+
+    def tokens_for(self, user_ids: Iterable[int]) -> List[str]:
+        return [self.push_tokens[uid] for uid in user_ids if self.push_tokens.get(uid)]
+
+
+class MembershipCache:
+    """
+    Chat participants and push tokens, cached in an in-process LRU in front of a
+    Redis hash so authorization and fan-out targeting skip the database.
+    Local entries are dropped on invalidation broadcasts and after `local_ttl`.
+
+    A DB read that races an invalidation must not repopulate the cache with the
+    old participants: `load` notes the chat's generation (and the local
+    invalidation count) before querying and `put` skips the write if either moved.
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        max_entries: int = 10000,
+        local_ttl: float = 60.0,
+        redis_ttl: int = 3600,
+    ):
+        self.redis = redis_client
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self._local: "OrderedDict[int, Tuple[float, ChatMembership]]" = OrderedDict()
+        self._invalidations = 0
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _get_local(self, chat_id: int) -> Optional[ChatMembership]:
+        entry = self._local.get(chat_id)
+        if entry is None:
+            return None
+        expires_at, membership = entry
+        if expires_at < time.monotonic():
+            del self._local[chat_id]
+            return None
+        self._local.move_to_end(chat_id)
+        return membership
+
+    def _put_local(self, membership: ChatMembership):
+        self._local[membership.chat_id] = (time.monotonic() + self.local_ttl, membership)
+        self._local.move_to_end(membership.chat_id)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    def get(self, chat_id: int) -> Optional[ChatMembership]:
+        membership = self._get_local(chat_id)
+        if membership is not None:
+            self.hits += 1
+            return membership
+        if self.redis:
+            try:
+                raw = self.redis.hgetall(membership_key(chat_id))
+                if raw:
+                    membership = ChatMembership(
+                        chat_id,
+                        {int(_decode(uid)): (_decode(token) or None) for uid, token in raw.items()}
+                    )
+                    self._put_local(membership)
+                    self.redis_hits += 1
+                    return membership
+            except Exception as e:
+                logger.error(f"❌ Membership cache read error for chat {chat_id}: {e}")
+        return None
+
+    def generation(self, chat_id: int) -> Optional[str]:
+        """The chat's invalidation generation in Redis (None if never invalidated or no Redis)."""
+        if not self.redis:
+            return None
+        try:
+            return _decode(self.redis.get(generation_key(chat_id)))
+        except Exception as e:
+            logger.error(f"❌ Membership generation read error for chat {chat_id}: {e}")
+            return None
+
+    def put(self, membership: ChatMembership, generation=_UNVERSIONED, invalidations: Optional[int] = None):
+        """
+        Caches `membership`. With `generation`/`invalidations` (as seen before the
+        DB read) the write is skipped if the chat was invalidated since.
+        """
+        if invalidations is None or invalidations == self._invalidations:
+            self._put_local(membership)
+        if not (self.redis and membership.push_tokens):
+            return
+        key = membership_key(membership.chat_id)
+        try:
+            with self.redis.pipeline(transaction=True) as pipe:
+                pipe.watch(generation_key(membership.chat_id))
+                if generation is not _UNVERSIONED and _decode(pipe.get(generation_key(membership.chat_id))) != generation:
+                    pipe.reset()
+                    self.invalidate_local(membership.chat_id)
+                    return
+                pipe.multi()
+                pipe.delete(key)
+                pipe.hset(key, mapping={uid: token or "" for uid, token in membership.push_tokens.items()})
+                pipe.expire(key, self.redis_ttl)
+                pipe.execute()
+        except redis.WatchError:
+            # Invalidated while writing
+            self.invalidate_local(membership.chat_id)
+        except Exception as e:
+            logger.error(f"❌ Membership cache write error for chat {membership.chat_id}: {e}")
+
+    def invalidate_local(self, chat_id: int):
+        self._invalidations += 1
+        self._local.pop(chat_id, None)
+
+    def invalidate(self, chat_id: int):
+        """Drops the entry everywhere: locally, in Redis, and on other pods."""
+        self.invalidate_local(chat_id)
+        if self.redis:
+            try:
+                pipe = self.redis.pipeline(transaction=True)
+                pipe.incr(generation_key(chat_id))
+                pipe.expire(generation_key(chat_id), GENERATION_TTL)
+                pipe.delete(membership_key(chat_id))
+                pipe.publish(INVALIDATION_CHANNEL, str(chat_id))
+                pipe.execute()
+            except Exception as e:
+                logger.error(f"❌ Membership cache invalidation error for chat {chat_id}: {e}")
+
+    async def load(self, db: AsyncSession, chat_id) -> Optional[ChatMembership]:
+        """Cached membership for `chat_id`, falling back to one participants query."""
+        try:
+            chat_id = int(chat_id)
+        except (ValueError, TypeError):
+            return None
+
+        membership = self.get(chat_id)
+        if membership is not None:
+            return membership
+
+        self.misses += 1
+        generation, invalidations = self.generation(chat_id), self._invalidations
+        rows = (await db.execute(
+            select(User.user_id, User.expo_push_token)
+            .join(chat_participants, chat_participants.c.user_id == User.user_id)
+            .where(chat_participants.c.chat_id == chat_id)
+        )).all()
+        if not rows:
+            return None
+
+        membership = ChatMembership(chat_id, {uid: token for uid, token in rows})
+        self.put(membership, generation, invalidations)
+        return membership
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._local),
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+        }
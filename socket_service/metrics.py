@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+from typing import Dict, Tuple, Any
+import time
+
+DEFAULT_BUCKETS_MS: Tuple[float, ...] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (cumulative, Prometheus-style `le` buckets)."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        for idx, bound in enumerate(self.buckets):
+            if elapsed_ms <= bound:
+                self.counts[idx] += 1
+                return
+        self.counts[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[f"le_{bound}ms"] = cumulative
+        buckets["le_inf"] = self.count
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "buckets": buckets,
+        }
+
+
+class HandlerMetrics:
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+    def observe(self, handler: str, elapsed_ms: float):
+        histogram = self.histograms.get(handler)
+        if histogram is None:
+            histogram = self.histograms[handler] = LatencyHistogram()
+        histogram.observe(elapsed_ms)
+
+    @contextmanager
+    def track(self, handler: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(handler, (time.perf_counter() - started) * 1000)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: hist.snapshot() for name, hist in sorted(self.histograms.items())}
+
+
+handler_metrics = HandlerMetrics()
@@ -0,0 +1,71 @@
+from typing import Iterable, List, Optional, Set
+import logging
+import time
+import redis
+from fanout import ROUTE_TTL_SECONDS, route_key
+
+logger = logging.getLogger("presence")
+
+# Sorted set user_id -> last heartbeat (unix seconds); Django reads it too
+ONLINE_KEY = "presence:online"
+PRESENCE_TTL_SECONDS = 120
+
+# Drop one connection; the user leaves the online set once no pod holds a connection
+_REMOVE_CONNECTION = """
+redis.call('HDEL', KEYS[1], ARGV[1])
+if redis.call('HLEN', KEYS[1]) == 0 then
+    redis.call('ZREM', KEYS[2], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+class PresenceIndex:
+    """
+    Presence without KEYS scans: per-user connection hashes (also the fan-out
+    routes) plus one heartbeat-scored sorted set, so online checks are a ZSCORE
+    and many users resolve in one pipelined round trip.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None, ttl: int = PRESENCE_TTL_SECONDS):
+        self.redis = redis_client
+        self.ttl = ttl
+        self._remove_script = None
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl
+
+    def heartbeat(self, user_id: int, conn_id: str, pod_id: str):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(route_key(user_id), conn_id, pod_id)
+        pipe.expire(route_key(user_id), ROUTE_TTL_SECONDS)
+        pipe.zadd(ONLINE_KEY, {str(user_id): time.time()})
+        pipe.execute()
+
+    def remove(self, user_id: int, conn_id: str) -> bool:
+        """Returns True when this was the user's last connection on any pod."""
+        if self._remove_script is None:
+            self._remove_script = self.redis.register_script(_REMOVE_CONNECTION)
+        return bool(self._remove_script(keys=[route_key(user_id), ONLINE_KEY], args=[conn_id, str(user_id)]))
+
+    def is_online(self, user_id: int) -> bool:
+        score = self.redis.zscore(ONLINE_KEY, str(user_id))
+        return score is not None and score >= self._cutoff()
+
+    def online_among(self, user_ids: Iterable[int]) -> Set[int]:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        pipe = self.redis.pipeline(transaction=False)
+        for uid in user_ids:
+            pipe.zscore(ONLINE_KEY, str(uid))
+        cutoff = self._cutoff()
+        return {uid for uid, score in zip(user_ids, pipe.execute()) if score is not None and score >= cutoff}
+
+    def online_user_ids(self) -> List[int]:
+        return [int(uid) for uid in self.redis.zrangebyscore(ONLINE_KEY, self._cutoff(), "+inf")]
+
+    def sweep(self) -> int:
+        """Removes users whose last heartbeat is older than the TTL (e.g. their pod died)."""
+        return self.redis.zremrangebyscore(ONLINE_KEY, "-inf", f"({self._cutoff()}")
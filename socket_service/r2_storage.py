@@ -1,3 +1,4 @@
+import base64
 import boto3
 import os
 from dotenv import load_dotenv
@@ -38,15 +39,51 @@ class R2Storage:
             print(f"  R2: Unexpected error - {type(e).__name__}: {e}")
             raise
 
-    def generate_presigned_upload_url(self, file_path: str, content_type: str = 'application/octet-stream', expires_in: int = 3600) -> str:
+    @staticmethod
+    def content_key(chat_id: int, sha256: str, ext: str, folder: str = "chat_media") -> str:
+        """
+        Content-addressed key, scoped to one chat: identical bytes sent in the
+        same chat land on the same object. Scoping keeps a hash lookup from
+        revealing (or granting) media of chats the caller is not in. Objects
+        are shared by the chat's attachments with that content, so they must
+        only be deleted once no MediaAttachment references the key.
+        """
+        return f"{folder}/chat_{chat_id}/sha256/{sha256}.{ext}"
+
+    @staticmethod
+    def belongs_to_chat(file_path: str, chat_id: int, folder: str = "chat_media") -> bool:
+        """Whether a client-supplied media key was issued for `chat_id` (random or content key)."""
+        return file_path.startswith((f"{folder}/chat_{chat_id}_", f"{folder}/chat_{chat_id}/"))
+
+    @staticmethod
+    def checksum_header(sha256: str) -> str:
+        """x-amz-checksum-sha256 value (base64 of the raw digest) for a hex SHA-256."""
+        return base64.b64encode(bytes.fromhex(sha256)).decode()
+
+    def object_exists(self, file_path: str) -> bool:
+        """Strict existence check for deduplication; any error counts as missing."""
+        try:
+            self.client.head_object(Bucket=self.bucket_name or 'nextvibe-media', Key=file_path)
+            return True
+        except Exception:
+            return False
+
+    def generate_presigned_upload_url(self, file_path: str, content_type: str = 'application/octet-stream', expires_in: int = 3600, sha256: str | None = None) -> str:
+        """
+        With `sha256` the URL is signed over x-amz-checksum-sha256, so R2 rejects
+        any body whose digest differs and a content-addressed key cannot be poisoned.
+        """
+        params = {
+            'Bucket': self.bucket_name or 'nextvibe-media',
+            'Key': file_path,
+            'ContentType': content_type
+        }
+        if sha256:
+            params['ChecksumSHA256'] = self.checksum_header(sha256)
         try:
             url = self.client.generate_presigned_url(
                 'put_object',
-                Params={
-                    'Bucket': self.bucket_name or 'nextvibe-media',
-                    'Key': file_path,
-                    'ContentType': content_type
-                },
+                Params=params,
                 ExpiresIn=expires_in
             )
             return url
@@ -0,0 +1,92 @@
+from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from datetime import datetime
+import json
+from db import AsyncSessionLocal
+from src.models import Message
+from src.models.message_model import chat_participants
+from src.messages import get_current_user, serialize_message, HISTORY_LOAD_OPTIONS
+from src.history_cache import personalize_message
+
+router = APIRouter()
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def encode_cursor(msg: Message) -> str:
+    return f"{msg.created_at.isoformat()}_{msg.id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, msg_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(msg_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def stream_page(messages: List[Message], user_id: int, meta: Dict[str, Any]) -> AsyncIterator[str]:
+    """Writes {"messages": [...], **meta} one message at a time instead of building the whole body."""
+    yield '{"messages": ['
+    for idx, msg in enumerate(messages):
+        if idx:
+            yield ","
+        yield json.dumps(personalize_message(serialize_message(msg), user_id))
+    yield "]"
+    for key, value in meta.items():
+        yield f", {json.dumps(key)}: {json.dumps(value)}"
+    yield "}"
+
+
+@router.get("/messages/{chat_id}")
+async def get_chat_history(
+    chat_id: int,
+    before: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    since_id: Optional[int] = Query(None, description="Sync mode: only messages after this id, oldest first"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user_id: int = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    is_participant = (await db.execute(
+        select(chat_participants.c.user_id).where(
+            chat_participants.c.chat_id == chat_id,
+            chat_participants.c.user_id == user_id
+        )
+    )).first()
+    if not is_participant:
+        raise HTTPException(status_code=404, detail="Chat not found or access denied")
+
+    stmt = select(Message).options(*HISTORY_LOAD_OPTIONS).where(Message.chat_id == chat_id)
+    if since_id is not None:
+        # Reconnect delta: ids only grow, so everything newer sits above since_id
+        stmt = stmt.where(Message.id > since_id).order_by(Message.id.asc())
+    else:
+        # Keyset on (created_at, id), the same key the page is ordered by
+        if before:
+            created_at, msg_id = decode_cursor(before)
+            stmt = stmt.where(or_(
+                Message.created_at < created_at,
+                and_(Message.created_at == created_at, Message.id < msg_id)
+            ))
+        stmt = stmt.order_by(Message.created_at.desc(), Message.id.desc())
+
+    messages = list((await db.execute(stmt.limit(limit + 1))).scalars().unique().all())
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+
+    if since_id is not None:
+        meta = {"has_more": has_more, "next_since_id": messages[-1].id if messages else since_id}
+    else:
+        meta = {"has_more": has_more, "next_cursor": encode_cursor(messages[-1]) if has_more else None}
+
+    # Relations are eager-loaded and the session never commits, so rows stay
+    # readable while the body streams after the request's session closes
+    return StreamingResponse(stream_page(messages, user_id, meta), media_type="application/json")
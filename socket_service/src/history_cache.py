@@ -0,0 +1,59 @@
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import redis
+
+logger = logging.getLogger("history_cache")
+
+# chat:{chat_id}:version is bumped after every write to the chat. Page keys embed
+# the version, so a bump makes every cached page unreachable and they simply age out.
+
+
+def version_key(chat_id: int) -> str:
+    return f"chat:{chat_id}:version"
+
+
+def page_key(chat_id: int, version: int, last_message_id: Optional[int]) -> str:
+    return f"chat:{chat_id}:v{version}:last:{last_message_id or 0}"
+
+
+def get_chat_version(redis_client: redis.Redis, chat_id: int) -> int:
+    return int(redis_client.get(version_key(chat_id)) or 0)
+
+
+def bump_chat_version(redis_client: redis.Redis, chat_id: int) -> int:
+    return redis_client.incr(version_key(chat_id))
+
+
+def get_page(redis_client: redis.Redis, chat_id: int, version: int, last_message_id: Optional[int]) -> Optional[List[Dict[str, Any]]]:
+    cached = redis_client.get(page_key(chat_id, version, last_message_id))
+    return json.loads(cached) if cached else None
+
+
+def set_page(
+    redis_client: redis.Redis,
+    chat_id: int,
+    version: int,
+    last_message_id: Optional[int],
+    page: List[Dict[str, Any]],
+    ttl: int,
+):
+    redis_client.setex(page_key(chat_id, version, last_message_id), ttl, json.dumps(page))
+
+
+def personalize_message(msg: Dict[str, Any], user_id: int) -> Dict[str, Any]:
+    """
+    Shared entries keep reactor ids per emoji; each reader gets the public shape
+    with `reacted_by_me` derived from them.
+    """
+    return {
+        **msg,
+        "reactions": [
+            {"emoji": r["emoji"], "count": r["count"], "reacted_by_me": user_id in r["user_ids"]}
+            for r in msg["reactions"]
+        ],
+    }
+
+
+def personalize(page: List[Dict[str, Any]], user_id: int) -> List[Dict[str, Any]]:
+    return [personalize_message(msg, user_id) for msg in page]
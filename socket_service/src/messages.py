@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, Query, HTTPException, Header
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 from db import SessionLocal
-from src.models import Chat, Message, User, MessageReaction, MessageReceipt
+from src.models import Chat, Message, MessageReaction
+from src.models.message_model import chat_participants
 from typing import Optional, List, Dict
 import redis
-import json
 from auth import auth_jwt
 from config import settings
 
@@ -12,6 +12,9 @@ from pydantic import BaseModel, Field
 from datetime import datetime
 import uuid
 from r2_storage import r2_storage
+from fanout import publish_events
+from src.receipts import mark_chat_read
+from src.history_cache import bump_chat_version, get_chat_version, get_page, set_page, personalize
 
 router = APIRouter()
 MESSAGES_PER_PAGE = 20
@@ -27,6 +30,8 @@ class UploadUrlRequest(BaseModel):
     filename: str
     content_type: str = "application/octet-stream"
     file_size: int
+    # Hex SHA-256 of the file; enables content-addressed keys and skipping known uploads
+    sha256: Optional[str] = Field(None, pattern=r"^[0-9a-fA-F]{64}$")
 
 class ReactionRequest(BaseModel):
     emoji: str = Field(..., max_length=32)
@@ -35,22 +40,79 @@ class EditMessageRequest(BaseModel):
     text: Optional[str] = None
     content: Optional[str] = None
 
-def get_messages_cache_key(chat_id: int, last_message_id: Optional[int], user_id: int):
-    return f"chat:{chat_id}:user:{user_id}:last:{last_message_id or 0}"
-
 def invalidate_chat_cache(chat_id: int):
+    """O(1): bumps the chat's history version; pages cached under older versions age out."""
     try:
-        cursor = 0
-        pattern = f"chat:{chat_id}:*"
-        while True:
-            cursor, keys = r.scan(cursor=cursor, match=pattern, count=100)
-            if keys:
-                r.delete(*keys)
-            if cursor == 0:
-                break
+        bump_chat_version(r, chat_id)
     except Exception:
         pass
 
+# Everything serialize_message touches, batch-loaded instead of per-row lazy loads
+HISTORY_LOAD_OPTIONS = (
+    joinedload(Message.reply_to).joinedload(Message.sender),
+    selectinload(Message.reactions),
+    selectinload(Message.receipts),
+    selectinload(Message.media),
+)
+
+def serialize_message(msg: Message) -> Dict:
+    """Reader-independent history entry; reply_to(.sender), reactions, receipts and media should be loaded."""
+    # Build reactions summary (reader-independent; see personalize)
+    reaction_summary: Dict[str, Dict] = {}
+    for react in msg.reactions:
+        if react.emoji not in reaction_summary:
+            reaction_summary[react.emoji] = {"emoji": react.emoji, "count": 0, "user_ids": []}
+        reaction_summary[react.emoji]["count"] += 1
+        reaction_summary[react.emoji]["user_ids"].append(react.user_id)
+
+    # Build quote snippet if reply_to exists
+    reply_snippet = None
+    if msg.reply_to:
+        reply_sender_name = f"User {msg.reply_to.sender_id}"
+        if msg.reply_to.sender:
+            reply_sender_name = getattr(msg.reply_to.sender, "username", reply_sender_name)
+        reply_snippet = {
+            "id": msg.reply_to.id,
+            "sender_id": msg.reply_to.sender_id,
+            "sender_name": reply_sender_name,
+            "text": (msg.reply_to.text[:100] + "...") if msg.reply_to.text and len(msg.reply_to.text) > 100 else msg.reply_to.text,
+            "is_deleted": msg.reply_to.deleted_at is not None
+        }
+
+    # Build receipt status
+    receipts_data = [
+        {
+            "user_id": rcpt.user_id,
+            "delivered_at": rcpt.delivered_at.isoformat() if rcpt.delivered_at else None,
+            "read_at": rcpt.read_at.isoformat() if rcpt.read_at else None
+        }
+        for rcpt in msg.receipts
+    ]
+
+    return {
+        "message_id": msg.id,
+        "server_msg_id": msg.id,
+        "client_msg_id": msg.client_msg_id,
+        "reply_to_id": msg.reply_to_id,
+        "reply_to_snippet": reply_snippet,
+        "content": "[Message deleted]" if msg.deleted_at else msg.text,
+        "sender_id": msg.sender_id,
+        "created_at": msg.created_at.isoformat(),
+        "edited_at": msg.edited_at.isoformat() if msg.edited_at else None,
+        "deleted_at": msg.deleted_at.isoformat() if msg.deleted_at else None,
+        "is_read": msg.is_read or any(rcpt.read_at is not None for rcpt in msg.receipts if rcpt.user_id != msg.sender_id),
+        "reactions": list(reaction_summary.values()),
+        "receipts": receipts_data,
+        "media": [
+            {
+                "id": media.id,
+                "file_url": media.file_url,
+                "preview_url": media.preview_url
+            }
+            for media in msg.media
+        ] if not msg.deleted_at else []
+    }
+
 def get_db():
     db = SessionLocal()
     try:
@@ -78,101 +140,45 @@ async def get_chat_messages(
     user_id: int = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    cache_key = get_messages_cache_key(chat_id, last_message_id, user_id)
+    is_participant = db.query(chat_participants.c.user_id).filter(
+        chat_participants.c.chat_id == chat_id,
+        chat_participants.c.user_id == user_id
+    ).first()
+    if not is_participant:
+        raise HTTPException(status_code=404, detail="Chat not found or access denied")
+
+    # Pages are shared by everyone in the chat; the version is read before the
+    # query so a write racing this request lands under a newer version
+    version = None
     try:
-        cached_data = r.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
+        version = get_chat_version(r, chat_id)
+        cached_page = get_page(r, chat_id, version, last_message_id)
+        if cached_page is not None:
+            return personalize(cached_page, user_id)
     except Exception:
         pass
-    
-    chat = (
-        db.query(Chat)
-        .join(Chat.participants)
-        .filter(Chat.id == chat_id, Chat.participants.any(user_id=user_id))
-        .first()
-    )
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found or access denied")
-    
+
     messages_query = db.query(Message).filter(Message.chat_id == chat_id)
     if last_message_id:
         messages_query = messages_query.filter(Message.id < last_message_id)
 
     messages = (
         messages_query
+        .options(*HISTORY_LOAD_OPTIONS)
         .order_by(Message.created_at.desc())
         .limit(MESSAGES_PER_PAGE)
         .all()
     )
 
-    data = []
-    for msg in messages:
-        sender: User = msg.sender  
-        
-        # Build reactions summary
-        reaction_summary: Dict[str, Dict] = {}
-        for react in msg.reactions:
-            if react.emoji not in reaction_summary:
-                reaction_summary[react.emoji] = {"emoji": react.emoji, "count": 0, "reacted_by_me": False}
-            reaction_summary[react.emoji]["count"] += 1
-            if react.user_id == user_id:
-                reaction_summary[react.emoji]["reacted_by_me"] = True
-
-        # Build quote snippet if reply_to exists
-        reply_snippet = None
-        if msg.reply_to:
-            reply_sender_name = f"User {msg.reply_to.sender_id}"
-            if msg.reply_to.sender:
-                reply_sender_name = getattr(msg.reply_to.sender, "username", reply_sender_name)
-            reply_snippet = {
-                "id": msg.reply_to.id,
-                "sender_id": msg.reply_to.sender_id,
-                "sender_name": reply_sender_name,
-                "text": (msg.reply_to.text[:100] + "...") if msg.reply_to.text and len(msg.reply_to.text) > 100 else msg.reply_to.text,
-                "is_deleted": msg.reply_to.deleted_at is not None
-            }
-
-        # Build receipt status
-        receipts_data = [
-            {
-                "user_id": rcpt.user_id,
-                "delivered_at": rcpt.delivered_at.isoformat() if rcpt.delivered_at else None,
-                "read_at": rcpt.read_at.isoformat() if rcpt.read_at else None
-            }
-            for rcpt in msg.receipts
-        ]
-
-        data.append({
-            "message_id": msg.id,
-            "server_msg_id": msg.id,
-            "client_msg_id": msg.client_msg_id,
-            "reply_to_id": msg.reply_to_id,
-            "reply_to_snippet": reply_snippet,
-            "content": "[Message deleted]" if msg.deleted_at else msg.text,
-            "sender_id": sender.user_id if sender else msg.sender_id,
-            "created_at": msg.created_at.isoformat(),
-            "edited_at": msg.edited_at.isoformat() if msg.edited_at else None,
-            "deleted_at": msg.deleted_at.isoformat() if msg.deleted_at else None,
-            "is_read": msg.is_read or any(rcpt.read_at is not None for rcpt in msg.receipts if rcpt.user_id != msg.sender_id),
-            "reactions": list(reaction_summary.values()),
-            "receipts": receipts_data,
-            "media": [
-                {
-                    "id": media.id,
-                    "file_url": media.file_url,
-                    "preview_url": media.preview_url
-                }
-                for media in msg.media
-            ] if not msg.deleted_at else []
-        })
+    data = [serialize_message(msg) for msg in messages]
 
-    try:
-        r.setex(cache_key, 30, json.dumps(data))
-    except Exception:
-        pass
+    if version is not None:
+        try:
+            set_page(r, chat_id, version, last_message_id, data, settings.HISTORY_CACHE_TTL_SECONDS)
+        except Exception:
+            pass
 
-    return data
+    return personalize(data, user_id)
 
 
 @router.post("/messages/chat/{chat_id}/read")
@@ -191,56 +197,26 @@ async def mark_chat_as_read(
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found or access denied")
 
-    messages_in_chat = (
-        db.query(Message)
-        .filter(Message.chat_id == chat_id)
-        .filter(Message.sender_id != user_id)
-        .all()
-    )
-
-    read_msg_ids = []
     now = datetime.utcnow()
-    for msg in messages_in_chat:
-        rcpt = db.query(MessageReceipt).filter(
-            MessageReceipt.message_id == msg.id,
-            MessageReceipt.user_id == user_id
-        ).first()
-        if not rcpt:
-            rcpt = MessageReceipt(message_id=msg.id, user_id=user_id, delivered_at=now, read_at=now)
-            db.add(rcpt)
-            read_msg_ids.append(msg.id)
-        elif not rcpt.read_at:
-            rcpt.read_at = now
-            if not rcpt.delivered_at:
-                rcpt.delivered_at = now
-            read_msg_ids.append(msg.id)
-        msg.is_read = True
-
-    if read_msg_ids or messages_in_chat:
-        try:
-            db.commit()
-            invalidate_chat_cache(chat_id)
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=500, detail="Failed to persist read receipts")
+    try:
+        read_msg_ids = mark_chat_read(db, chat_id, user_id, now)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to persist read receipts")
+
+    if read_msg_ids:
+        invalidate_chat_cache(chat_id)
 
     participant_ids = [u.user_id for u in chat.participants]
-    pubsub_payload = {
-        "sender_pod_id": "api",
-        "target_user_ids": participant_ids,
-        "envelope": {
-            "type": "read_receipt",
-            "chat_id": chat_id,
-            "reader_id": user_id,
-            "message_ids": read_msg_ids,
-            "read_at": now.isoformat(),
-            "timestamp": now.isoformat()
-        }
-    }
-    try:
-        r.publish("chat_pubsub_events", json.dumps(pubsub_payload))
-    except Exception:
-        pass
+    publish_events(r, [(participant_ids, {
+        "type": "read_receipt",
+        "chat_id": chat_id,
+        "reader_id": user_id,
+        "message_ids": read_msg_ids,
+        "read_at": now.isoformat(),
+        "timestamp": now.isoformat()
+    })])
 
     return {
         "success": True,
@@ -265,9 +241,34 @@ async def get_media_upload_url(
         raise HTTPException(status_code=400, detail=f"File size exceeds limit of {settings.MAX_MEDIA_SIZE_MB}MB")
 
     ext = req.filename.split(".")[-1] if "." in req.filename else "bin"
+    domain = r2_storage.custom_domain or 'media.nextvibe.io'
+
+    if req.sha256:
+        sha256 = req.sha256.lower()
+        media_key = r2_storage.content_key(req.chat_id, sha256, ext.lower())
+        file_url = f"https://{domain}/{media_key}"
+        if r2_storage.object_exists(media_key):
+            # Same content was uploaded to this chat before; the client sends media_key without uploading
+            return {
+                "upload_url": None,
+                "media_key": media_key,
+                "file_url": file_url,
+                "exists": True
+            }
+        return {
+            "upload_url": r2_storage.generate_presigned_upload_url(media_key, req.content_type, sha256=sha256),
+            "upload_headers": {
+                "Content-Type": req.content_type,
+                "x-amz-checksum-sha256": r2_storage.checksum_header(sha256)
+            },
+            "media_key": media_key,
+            "file_url": file_url,
+            "exists": False
+        }
+
     media_key = f"chat_media/chat_{req.chat_id}_{uuid.uuid4().hex}.{ext}"
     upload_url = r2_storage.generate_presigned_upload_url(media_key, req.content_type)
-    file_url = f"https://{r2_storage.custom_domain or 'media.nextvibe.io'}/{media_key}"
+    file_url = f"https://{domain}/{media_key}"
 
     return {
         "upload_url": upload_url,
@@ -310,6 +311,7 @@ async def add_reaction(
     invalidate_chat_cache(message.chat_id)
 
     reactions = db.query(MessageReaction).filter(MessageReaction.message_id == message_id).all()
+    events = []
     for p in chat.participants:
         p_id = p.user_id
         summary = {}
@@ -320,21 +322,16 @@ async def add_reaction(
             if r_item.user_id == p_id:
                 summary[r_item.emoji]["reacted_by_me"] = True
 
-        pubsub_payload = {
-            "sender_pod_id": "api",
-            "target_user_ids": [p_id],
-            "envelope": {
-                "type": "reaction_update",
-                "chat_id": message.chat_id,
-                "message_id": message_id,
-                "server_msg_id": message_id,
-                "reactions": list(summary.values())
-            }
-        }
-        try:
-            r.publish("chat_pubsub_events", json.dumps(pubsub_payload))
-        except Exception:
-            pass
+        events.append(([p_id], {
+            "type": "reaction_update",
+            "chat_id": message.chat_id,
+            "message_id": message_id,
+            "server_msg_id": message_id,
+            "reactions": list(summary.values())
+        }))
+
+    # One pipelined publish per pod instead of one per participant
+    publish_events(r, events)
 
     # Summary for current requesting user
     summary_user = {}
@@ -376,6 +373,7 @@ async def remove_reaction(
     invalidate_chat_cache(message.chat_id)
 
     reactions = db.query(MessageReaction).filter(MessageReaction.message_id == message_id).all()
+    events = []
     for p in chat.participants:
         p_id = p.user_id
         summary = {}
@@ -386,21 +384,16 @@ async def remove_reaction(
             if r_item.user_id == p_id:
                 summary[r_item.emoji]["reacted_by_me"] = True
 
-        pubsub_payload = {
-            "sender_pod_id": "api",
-            "target_user_ids": [p_id],
-            "envelope": {
-                "type": "reaction_update",
-                "chat_id": message.chat_id,
-                "message_id": message_id,
-                "server_msg_id": message_id,
-                "reactions": list(summary.values())
-            }
-        }
-        try:
-            r.publish("chat_pubsub_events", json.dumps(pubsub_payload))
-        except Exception:
-            pass
+        events.append(([p_id], {
+            "type": "reaction_update",
+            "chat_id": message.chat_id,
+            "message_id": message_id,
+            "server_msg_id": message_id,
+            "reactions": list(summary.values())
+        }))
+
+    # One pipelined publish per pod instead of one per participant
+    publish_events(r, events)
 
     summary_user = {}
     for r_item in reactions:
@@ -447,23 +440,15 @@ async def edit_message(
     invalidate_chat_cache(message.chat_id)
 
     participant_ids = [u.user_id for u in message.chat.participants]
-    pubsub_payload = {
-        "sender_pod_id": "api",
-        "target_user_ids": participant_ids,
-        "envelope": {
-            "type": "message_edited",
-            "chat_id": message.chat_id,
-            "message_id": message.id,
-            "server_msg_id": message.id,
-            "content": message.text,
-            "text": message.text,
-            "edited_at": message.edited_at.isoformat()
-        }
-    }
-    try:
-        r.publish("chat_pubsub_events", json.dumps(pubsub_payload))
-    except Exception as e:
-        pass
+    publish_events(r, [(participant_ids, {
+        "type": "message_edited",
+        "chat_id": message.chat_id,
+        "message_id": message.id,
+        "server_msg_id": message.id,
+        "content": message.text,
+        "text": message.text,
+        "edited_at": message.edited_at.isoformat()
+    })])
 
     return {
         "message_id": message.id,
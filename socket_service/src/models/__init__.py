@@ -1,3 +1,3 @@
-from .message_model import Message, MediaAttachment, Chat, MessageReceipt, MessageReaction
+from .message_model import Message, MediaAttachment, Chat, MessageReceipt, MessageReaction, ChatReadCursor
 from .user_model import User, UserOnlineSession
 from .keys_model import UserDevice, SignedPreKey, OneTimePreKey
\ No newline at end of file
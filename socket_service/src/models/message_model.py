@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, Table, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, Table, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -51,6 +51,7 @@ class Message(Base):
 
     __table_args__ = (
         UniqueConstraint('chat_id', 'sender_id', 'client_msg_id', name='uq_chat_sender_client_msg'),
+        Index('chat_msg_history_keyset_idx', 'chat_id', 'created_at', 'id'),
     )
 
     chat = relationship("Chat", back_populates="messages")
@@ -101,6 +102,21 @@ class MessageReceipt(Base):
     user = relationship("User")
 
 
+class ChatReadCursor(Base):
+    """Highest message id a participant has read in a chat; bounds read-receipt scans."""
+    __tablename__ = 'chat_chatreadcursor'
+
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(Integer, ForeignKey('chat_chat.id', ondelete='CASCADE'), nullable=False)
+    user_id = Column(Integer, ForeignKey('user_user.user_id', ondelete='CASCADE'), nullable=False)
+    last_read_message_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('chat_id', 'user_id', name='uq_chat_user_read_cursor'),
+    )
+
+
 class MessageReaction(Base):
     __tablename__ = 'chat_messagereaction'
 
@@ -1,31 +1,253 @@
 import logging
 import asyncio
-import urllib.request
-import json
-from typing import List, Dict, Any, Optional
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import httpx
+from config import settings
 
 logger = logging.getLogger("websocket.notifications")
 
 EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
+EXPO_RECEIPTS_URL = "https://exp.host/--/api/v2/push/getReceipts"
+EXPO_MAX_BATCH = 100
+EXPO_MAX_RECEIPT_IDS = 1000
 
-def _send_push_sync(payloads: List[Dict[str, Any]]):
-    try:
-        data_bytes = json.dumps(payloads).encode('utf-8')
-        req = urllib.request.Request(
-            EXPO_PUSH_URL,
-            data=data_bytes,
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "Accept-Encoding": "gzip, deflate"
-            },
-            method="POST"
+# Expo errors meaning the token will never work again
+DEAD_TOKEN_ERRORS = {"DeviceNotRegistered"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# (dead tokens, chat ids whose cached memberships carried them)
+DeadTokenHandler = Callable[[List[str], Set[int]], Awaitable[None]]
+
+
+class PushDispatcher:
+    """
+    Queues Expo push messages and sends them from one background task over a
+    pooled HTTP client: pushes for the same (token, chat) inside a batch window
+    collapse into one notification, requests carry up to 100 messages, transient
+    failures retry with exponential backoff, and tokens Expo reports as dead
+    (in tickets or later receipts) are handed to `on_dead_tokens`.
+    """
+
+    def __init__(
+        self,
+        push_url: str = EXPO_PUSH_URL,
+        receipts_url: str = EXPO_RECEIPTS_URL,
+        access_token: str = "",
+        batch_window_ms: int = 250,
+        max_batch: int = EXPO_MAX_BATCH,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        receipt_delay: float = 900.0,
+        timeout: float = 10.0,
+        max_connections: int = 10,
+        on_dead_tokens: Optional[DeadTokenHandler] = None,
+    ):
+        self.push_url = push_url
+        self.receipts_url = receipts_url
+        self.access_token = access_token
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = min(max_batch, EXPO_MAX_BATCH)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.receipt_delay = receipt_delay
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.on_dead_tokens = on_dead_tokens
+        self.pending: "OrderedDict[Tuple[str, Any], Dict[str, Any]]" = OrderedDict()
+        # (due_at, ticket_id, token, chat_id) awaiting a receipt check
+        self.tickets: List[Tuple[float, str, str, Any]] = []
+        self.client: Optional[httpx.AsyncClient] = None
+        self.task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.sent = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.failed = 0
+        self.pruned = 0
+
+    def start(self):
+        headers = {"Accept": "application/json", "Accept-Encoding": "gzip, deflate"}
+        if self.access_token:
+            headers["Authorization"] = f"Bearer {self.access_token}"
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            headers=headers,
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
         )
-        with urllib.request.urlopen(req, timeout=5) as resp:
-            response_data = resp.read().decode('utf-8')
-            logger.info(f"📱 Expo push notification sent successfully: {response_data}")
-    except Exception as e:
-        logger.error(f"❌ Failed to send Expo push notification: {e}")
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self.task = asyncio.create_task(self._run())
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def ensure_started(self):
+        # Each event loop needs its own client and flusher (e.g. app restarts in tests)
+        if not self.running or self._loop is not asyncio.get_running_loop():
+            self.start()
+
+    def enqueue(self, tokens: List[str], title: str, body: str, data: Dict[str, Any]):
+        chat_id = data.get("chat_id")
+        for token in tokens:
+            if not token or not isinstance(token, str):
+                continue
+            key = (token, chat_id)
+            queued = self.pending.get(key)
+            if queued is not None:
+                count = queued["data"]["count"] + 1
+                queued.update(title=title, body=f"{count} new messages", data={**data, "count": count})
+                self.coalesced += 1
+                continue
+            self.pending[key] = {
+                "to": token,
+                "title": title,
+                "body": body,
+                "sound": "default",
+                "priority": "high",
+                "channelId": "chat-messages",
+                "data": {**data, "count": 1},
+            }
+        if self.pending and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self, timeout: float = 5.0):
+        if self.task:
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self.task, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            except Exception as e:
+                logger.error(f"❌ Push dispatcher stopped with error: {e}")
+            self.task = None
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    async def _run(self):
+        while True:
+            if not self.pending and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._next_receipt_wait())
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                if self.pending and not self._stopping:
+                    # Let pushes for the same chat pile up before sending
+                    await asyncio.sleep(self.batch_window)
+            await self.flush()
+            await self.check_receipts()
+            if self._stopping and not self.pending:
+                return
+
+    def _next_receipt_wait(self) -> Optional[float]:
+        if not self.tickets:
+            return None
+        return max(0.0, min(t[0] for t in self.tickets) - time.monotonic())
+
+    async def flush(self):
+        messages = list(self.pending.values())
+        self.pending.clear()
+        batches = [messages[i:i + self.max_batch] for i in range(0, len(messages), self.max_batch)]
+        await asyncio.gather(*(self._send_batch(batch) for batch in batches))
+
+    async def _post(self, url: str, payload: Any) -> Optional[Dict[str, Any]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                resp = await self.client.post(url, json=payload)
+                if resp.status_code not in RETRY_STATUSES:
+                    resp.raise_for_status()
+                    return resp.json()
+                error = f"HTTP {resp.status_code}"
+            except httpx.HTTPStatusError as e:
+                logger.error(f"❌ Expo rejected push request: {e}")
+                return None
+            except (httpx.TransportError, ValueError) as e:
+                error = str(e) or e.__class__.__name__
+            if attempt < self.max_retries:
+                self.retried += 1
+                await asyncio.sleep(self.backoff_base * (2 ** attempt))
+        logger.error(f"❌ Expo push request failed after {self.max_retries + 1} attempts: {error}")
+        return None
+
+    async def _send_batch(self, messages: List[Dict[str, Any]]):
+        result = await self._post(self.push_url, messages)
+        if result is None:
+            self.failed += len(messages)
+            return
+
+        dead: Dict[str, Set[int]] = {}
+        due_at = time.monotonic() + self.receipt_delay
+        for message, ticket in zip(messages, result.get("data") or []):
+            chat_id = message["data"].get("chat_id")
+            if ticket.get("status") == "ok":
+                self.sent += 1
+                if ticket.get("id"):
+                    self.tickets.append((due_at, ticket["id"], message["to"], chat_id))
+            elif (ticket.get("details") or {}).get("error") in DEAD_TOKEN_ERRORS:
+                dead.setdefault(message["to"], set()).add(chat_id)
+            else:
+                self.failed += 1
+                logger.warning(f"⚠️ Expo push ticket error: {ticket.get('message')}")
+        await self._prune(dead)
+
+    async def check_receipts(self, force: bool = False):
+        now = time.monotonic()
+        due = [t for t in self.tickets if force or t[0] <= now]
+        if not due:
+            return
+        self.tickets = [t for t in self.tickets if not (force or t[0] <= now)]
+
+        dead: Dict[str, Set[int]] = {}
+        for i in range(0, len(due), EXPO_MAX_RECEIPT_IDS):
+            chunk = due[i:i + EXPO_MAX_RECEIPT_IDS]
+            result = await self._post(self.receipts_url, {"ids": [ticket_id for _, ticket_id, _, _ in chunk]})
+            receipts = (result or {}).get("data") or {}
+            for _, ticket_id, token, chat_id in chunk:
+                receipt = receipts.get(ticket_id) or {}
+                if receipt.get("status") == "error" and (receipt.get("details") or {}).get("error") in DEAD_TOKEN_ERRORS:
+                    dead.setdefault(token, set()).add(chat_id)
+        await self._prune(dead)
+
+    async def _prune(self, dead: Dict[str, Set[int]]):
+        if not dead:
+            return
+        self.pruned += len(dead)
+        logger.info(f"🧹 Pruning {len(dead)} unregistered Expo push tokens")
+        if self.on_dead_tokens:
+            chat_ids = {chat_id for ids in dead.values() for chat_id in ids if chat_id is not None}
+            try:
+                await self.on_dead_tokens(list(dead), chat_ids)
+            except Exception as e:
+                logger.error(f"❌ Failed to prune push tokens: {e}")
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "pending": len(self.pending),
+            "awaiting_receipts": len(self.tickets),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "retried": self.retried,
+            "failed": self.failed,
+            "pruned": self.pruned,
+        }
+
+
+push_dispatcher = PushDispatcher(
+    push_url=settings.EXPO_PUSH_URL,
+    receipts_url=settings.EXPO_RECEIPTS_URL,
+    access_token=settings.EXPO_ACCESS_TOKEN,
+    batch_window_ms=settings.PUSH_BATCH_WINDOW_MS,
+    max_retries=settings.PUSH_MAX_RETRIES,
+    receipt_delay=settings.PUSH_RECEIPT_DELAY_SECONDS,
+)
 
 
 async def send_chat_push_notification(
@@ -36,38 +258,25 @@ async def send_chat_push_notification(
     message_id: Optional[int] = None
 ):
     """
-    Sends Expo Push Notification asynchronously to offline recipients.
+    Queues Expo Push Notifications for offline recipients; the dispatcher sends them in the background.
     """
     if not recipient_tokens:
         return
 
     # Prepare body text: mask ciphertext JSON payload if encrypted
-    is_encrypted = False
     if message_text and message_text.strip().startswith('{') and '"ciphertext"' in message_text:
-        is_encrypted = True
         body = "🔒 New encrypted message"
     else:
         body = message_text if len(message_text) <= 120 else f"{message_text[:117]}..."
 
-    payloads = []
-    for token in recipient_tokens:
-        if not token or not isinstance(token, str):
-            continue
-        payloads.append({
-            "to": token,
-            "title": sender_name or "New Message",
-            "body": body,
-            "sound": "default",
-            "priority": "high",
-            "channelId": "chat-messages",
-            "data": {
-                "type": "chat_message",
-                "chat_id": chat_id,
-                "message_id": message_id
-            }
-        })
-
-    if payloads:
-        # Run HTTP request in background executor so WebSocket hot-path remains non-blocking
-        loop = asyncio.get_event_loop()
-        loop.run_in_executor(None, _send_push_sync, payloads)
+    push_dispatcher.ensure_started()
+    push_dispatcher.enqueue(
+        recipient_tokens,
+        title=sender_name or "New Message",
+        body=body,
+        data={
+            "type": "chat_message",
+            "chat_id": chat_id,
+            "message_id": message_id
+        }
+    )
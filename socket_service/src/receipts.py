@@ -0,0 +1,111 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import select, update, func, and_
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from src.models import Message, MessageReceipt, ChatReadCursor
+
+UPSERT_CHUNK_SIZE = 500
+
+_INSERTS = {
+    "mysql": mysql.insert,
+    "mariadb": mysql.insert,
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def _upsert(session: Session, table, rows: List[dict], conflict_cols: List[str], update_cols):
+    """
+    Multi-row INSERT .. ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE.
+    `update_cols(stmt)` returns the column -> expression map for existing rows.
+    """
+    insert = _INSERTS[session.get_bind().dialect.name]
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = insert(table).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        if hasattr(stmt, "on_duplicate_key_update"):
+            stmt = stmt.on_duplicate_key_update(**update_cols(stmt.inserted))
+        else:
+            stmt = stmt.on_conflict_do_update(index_elements=conflict_cols, set_=update_cols(stmt.excluded))
+        session.execute(stmt)
+
+
+def _greatest(session: Session, a, b):
+    # SQLite spells GREATEST as the two-argument scalar MAX
+    if session.get_bind().dialect.name == "sqlite":
+        return func.max(a, b)
+    return func.greatest(a, b)
+
+
+def get_read_cursor(session: Session, chat_id: int, user_id: int) -> int:
+    cursor = session.execute(
+        select(ChatReadCursor.last_read_message_id).where(
+            ChatReadCursor.chat_id == chat_id,
+            ChatReadCursor.user_id == user_id
+        )
+    ).scalar_one_or_none()
+    return cursor or 0
+
+
+def mark_chat_read(session: Session, chat_id: int, user_id: int, now: Optional[datetime] = None) -> List[int]:
+    """
+    Marks everything other participants sent in `chat_id` as read by `user_id`.
+
+    Only messages above the user's read cursor are scanned: one anti-join finds
+    the ones without a read receipt, one multi-row upsert writes the receipts and
+    the cursor jumps to the high-water mark. Returns the newly read message ids.
+    Works on a sync Session; async callers go through AsyncSession.run_sync.
+    """
+    now = now or datetime.utcnow()
+    cursor = get_read_cursor(session, chat_id, user_id)
+
+    rows = session.execute(
+        select(Message.id, MessageReceipt.read_at)
+        .outerjoin(
+            MessageReceipt,
+            and_(MessageReceipt.message_id == Message.id, MessageReceipt.user_id == user_id)
+        )
+        .where(
+            Message.chat_id == chat_id,
+            Message.sender_id != user_id,
+            Message.id > cursor
+        )
+        .order_by(Message.id)
+    ).all()
+    if not rows:
+        return []
+
+    read_msg_ids = [msg_id for msg_id, read_at in rows if read_at is None]
+    high_water_mark = rows[-1][0]
+
+    if read_msg_ids:
+        receipts = MessageReceipt.__table__
+        _upsert(
+            session,
+            receipts,
+            [{"message_id": msg_id, "user_id": user_id, "delivered_at": now, "read_at": now} for msg_id in read_msg_ids],
+            ["message_id", "user_id"],
+            lambda new: {
+                "read_at": new.read_at,
+                "delivered_at": func.coalesce(receipts.c.delivered_at, new.delivered_at),
+            },
+        )
+        session.execute(
+            update(Message)
+            .where(Message.id.in_(read_msg_ids))
+            .values(is_read=True)
+            .execution_options(synchronize_session=False)
+        )
+
+    cursors = ChatReadCursor.__table__
+    _upsert(
+        session,
+        cursors,
+        [{"chat_id": chat_id, "user_id": user_id, "last_read_message_id": high_water_mark, "updated_at": now}],
+        ["chat_id", "user_id"],
+        lambda new: {
+            "last_read_message_id": _greatest(session, cursors.c.last_read_message_id, new.last_read_message_id),
+            "updated_at": new.updated_at,
+        },
+    )
+    return read_msg_ids
@@ -14,9 +14,9 @@ os.environ["JWT_ALGORITHM"] = "HS256"
 
 from db import engine, SessionLocal
 from src.models.base import Base
-from src.models import User, Chat, Message, MessageReaction, MessageReceipt, MediaAttachment
+from src.models import User, Chat, Message, MessageReaction, MessageReceipt, MediaAttachment, ChatReadCursor
 from src.models.message_model import chat_participants
-from main import app
+from main import app, manager
 from auth import SECRET_KEY, ALGORITHM
 
 
@@ -25,6 +25,7 @@ def setup_db():
     Base.metadata.create_all(bind=engine)
     db = SessionLocal()
     db.execute(chat_participants.delete())
+    db.query(ChatReadCursor).delete()
     db.query(MessageReaction).delete()
     db.query(MessageReceipt).delete()
     db.query(MediaAttachment).delete()
@@ -48,6 +49,8 @@ def setup_db():
     db.add_all([chat1, chat2])
     db.commit()
     db.close()
+    manager.membership.invalidate(100)
+    manager.membership.invalidate(200)
     yield
     Base.metadata.drop_all(bind=engine)
     engine.dispose()
@@ -115,6 +118,37 @@ def test_read_and_delivery_receipts():
         assert len(messages[0]["receipts"]) >= 1
 
 
+def test_bulk_read_receipts_advance_cursor():
+    from src.receipts import mark_chat_read, get_read_cursor
+
+    db = SessionLocal()
+    msgs = [Message(chat_id=100, sender_id=1, text=f"m{i}", created_at=datetime.utcnow()) for i in range(3)]
+    own = Message(chat_id=100, sender_id=2, text="mine", created_at=datetime.utcnow())
+    db.add_all(msgs + [own])
+    db.commit()
+    # One message already delivered (receipt without read_at) must be upserted, not duplicated
+    db.add(MessageReceipt(message_id=msgs[0].id, user_id=2, delivered_at=datetime.utcnow()))
+    db.commit()
+
+    read_ids = mark_chat_read(db, 100, 2)
+    db.commit()
+    assert sorted(read_ids) == sorted(m.id for m in msgs)
+    assert get_read_cursor(db, 100, 2) == max(m.id for m in msgs)
+    assert db.query(MessageReceipt).filter(MessageReceipt.user_id == 2).count() == 3
+    assert db.query(MessageReceipt).filter(MessageReceipt.user_id == 2, MessageReceipt.read_at.is_(None)).count() == 0
+
+    # Nothing new: no work
+    assert mark_chat_read(db, 100, 2) == []
+
+    newer = Message(chat_id=100, sender_id=1, text="new", created_at=datetime.utcnow())
+    db.add(newer)
+    db.commit()
+    assert mark_chat_read(db, 100, 2) == [newer.id]
+    db.commit()
+    assert get_read_cursor(db, 100, 2) == newer.id
+    db.close()
+
+
 def test_reactions_ws_and_rest():
     with TestClient(app) as client:
         t1 = create_jwt_token(1)
@@ -164,6 +198,103 @@ def test_reactions_ws_and_rest():
         assert len(r_data_del["reactions"]) == 1
 
 
+def test_history_pages_shared_across_readers_and_versioned():
+    import redis
+    from src.history_cache import get_chat_version, page_key
+
+    r_sync = redis.Redis(host='127.0.0.1', port=6379, db=0)
+    with TestClient(app) as client:
+        t1 = create_jwt_token(1)
+        t2 = create_jwt_token(2)
+
+        with client.websocket_connect(f"/ws?token={t1}") as ws1:
+            ws1.send_json({"type": "message", "chat_id": 100, "message": "cached", "client_msg_id": str(uuid.uuid4())})
+            msg_id = ws1.receive_json()["server_msg_id"]
+
+        res = client.post(f"/api/v2/messages/{msg_id}/reactions", json={"emoji": "👍"}, headers={"Authorization": f"Bearer {t1}"})
+        assert res.status_code == 200
+
+        version = get_chat_version(r_sync, 100)
+        alice = client.get("/api/v2/messages/100", headers={"Authorization": f"Bearer {t1}"}).json()
+        assert r_sync.exists(page_key(100, version, None))
+        bob = client.get("/api/v2/messages/100", headers={"Authorization": f"Bearer {t2}"}).json()
+
+        # Same cached body, reader-specific reacted_by_me, no reactor ids leaked
+        assert alice[0]["reactions"] == [{"emoji": "👍", "count": 1, "reacted_by_me": True}]
+        assert bob[0]["reactions"] == [{"emoji": "👍", "count": 1, "reacted_by_me": False}]
+
+        # A write bumps the version instead of scanning keys
+        with client.websocket_connect(f"/ws?token={t2}") as ws2:
+            ws2.send_json({"type": "message", "chat_id": 100, "message": "newer", "client_msg_id": str(uuid.uuid4())})
+            ws2.receive_json()
+        assert get_chat_version(r_sync, 100) > version
+        latest = client.get("/api/v2/messages/100", headers={"Authorization": f"Bearer {t1}"}).json()
+        assert latest[0]["content"] == "newer"
+
+        # Outsiders never see cached pages
+        t3 = create_jwt_token(3)
+        assert client.get("/api/v2/messages/100", headers={"Authorization": f"Bearer {t3}"}).status_code == 404
+
+
+def test_v3_history_keyset_pages_and_since_id_delta():
+    from sqlalchemy import event
+    from db import async_engine
+
+    db = SessionLocal()
+    same_ts = datetime(2026, 1, 1, 12, 0, 0)
+    msgs = [
+        Message(chat_id=100, sender_id=1 + (i % 2), text=f"m{i}", created_at=same_ts if i < 3 else datetime(2026, 1, 1, 12, 0, i))
+        for i in range(7)
+    ]
+    db.add_all(msgs)
+    db.commit()
+    db.add(MessageReaction(message_id=msgs[6].id, user_id=2, emoji="👍", created_at=same_ts))
+    db.add(Message(chat_id=100, sender_id=2, text="reply", reply_to_id=msgs[0].id, created_at=datetime(2026, 1, 1, 12, 1, 0)))
+    db.commit()
+    ids_newest_first = [m.id for m in sorted(db.query(Message).all(), key=lambda m: (m.created_at, m.id), reverse=True)]
+    db.close()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(async_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        with TestClient(app) as client:
+            headers = {"Authorization": f"Bearer {create_jwt_token(1)}"}
+
+            seen, cursor = [], None
+            while True:
+                params = {"limit": 3}
+                if cursor:
+                    params["before"] = cursor
+                res = client.get("/api/v3/messages/100", params=params, headers=headers)
+                assert res.status_code == 200
+                body = res.json()
+                seen.extend(m["message_id"] for m in body["messages"])
+                cursor = body["next_cursor"]
+                if not body["has_more"]:
+                    break
+            # Ties on created_at neither repeat nor drop rows across page boundaries
+            assert seen == ids_newest_first
+
+            first = client.get("/api/v3/messages/100", params={"limit": 3}, headers=headers).json()["messages"]
+            assert first[0]["reply_to_snippet"]["sender_name"] == "alice"
+            assert first[1]["reactions"] == [{"emoji": "👍", "count": 1, "reacted_by_me": False}]
+
+            statements.clear()
+            client.get("/api/v3/messages/100", params={"limit": 20}, headers=headers)
+            # Membership + messages + one batch per eager-loaded collection, independent of page size
+            assert len(statements) <= 6
+
+            delta = client.get("/api/v3/messages/100", params={"since_id": ids_newest_first[2]}, headers=headers).json()
+            assert [m["message_id"] for m in delta["messages"]] == sorted(ids_newest_first[:2])
+            assert delta["next_since_id"] == max(ids_newest_first)
+
+            outsider = {"Authorization": f"Bearer {create_jwt_token(3)}"}
+            assert client.get("/api/v3/messages/100", headers=outsider).status_code == 404
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", listener)
+
+
 def test_reply_to_message_snippet():
     with TestClient(app) as client:
         t1 = create_jwt_token(1)
@@ -331,3 +462,65 @@ def test_presigned_media_upload_flow():
             assert msg_env["type"] == "message"
             assert len(msg_env["media"]) == 1
             assert media_key in msg_env["media"][0]["file_url"]
+
+        # 3. A key issued for another chat is not attached
+        t2 = create_jwt_token(2)
+        with client.websocket_connect(f"/ws?token={t2}") as ws2:
+            ws2.send_json({
+                "type": "message",
+                "chat_id": 200,
+                "message": "Reusing someone else's upload",
+                "media_keys": [media_key],
+                "client_msg_id": str(uuid.uuid4())
+            })
+
+            msg_env = ws2.receive_json()
+            assert msg_env["type"] == "message"
+            assert msg_env["media"] == []
+
+
+def test_content_addressed_media_upload(monkeypatch):
+    from r2_storage import r2_storage
+
+    digest = "ab" * 32
+    stored = set()
+    monkeypatch.setattr(r2_storage, "object_exists", lambda key: key in stored)
+
+    with TestClient(app) as client:
+        headers = {"Authorization": f"Bearer {create_jwt_token(1)}"}
+        request = {
+            "chat_id": 100,
+            "filename": "meme.JPG",
+            "content_type": "image/jpeg",
+            "file_size": 2048,
+            "sha256": digest.upper()
+        }
+
+        # 1. Unknown content gets a checksum-bound upload URL on its hash key
+        res = client.post("/api/v2/media/upload-url", json=request, headers=headers)
+        assert res.status_code == 200
+        first = res.json()
+        assert first["exists"] is False
+        assert first["media_key"] == f"chat_media/chat_100/sha256/{digest}.jpg"
+        assert first["upload_url"]
+        assert first["upload_headers"]["x-amz-checksum-sha256"] == r2_storage.checksum_header(digest)
+
+        # 2. Once stored, the same content is not uploaded again
+        stored.add(first["media_key"])
+        res = client.post("/api/v2/media/upload-url", json=request, headers=headers)
+        second = res.json()
+        assert second["exists"] is True
+        assert second["upload_url"] is None
+        assert second["media_key"] == first["media_key"]
+
+        # 3. Another chat never learns about it: same hash, own key, must upload
+        headers_bob = {"Authorization": f"Bearer {create_jwt_token(2)}"}
+        res = client.post("/api/v2/media/upload-url", json={**request, "chat_id": 200}, headers=headers_bob)
+        other = res.json()
+        assert other["exists"] is False
+        assert other["upload_url"]
+        assert other["media_key"] == f"chat_media/chat_200/sha256/{digest}.jpg"
+
+        # 4. Malformed digests are rejected
+        res = client.post("/api/v2/media/upload-url", json={**request, "sha256": "xyz"}, headers=headers)
+        assert res.status_code == 422
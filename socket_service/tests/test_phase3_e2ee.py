@@ -16,7 +16,7 @@ from db import engine, SessionLocal
 from src.models.base import Base
 from src.models import User, Chat, Message, UserDevice, SignedPreKey, OneTimePreKey
 from src.models.message_model import chat_participants
-from main import app
+from main import app, manager
 from auth import SECRET_KEY, ALGORITHM
 
 
@@ -43,6 +43,7 @@ def setup_db():
     db.add(chat1)
     db.commit()
     db.close()
+    manager.membership.invalidate(100)
 
     yield
     Base.metadata.drop_all(bind=engine)
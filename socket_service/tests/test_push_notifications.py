@@ -16,7 +16,7 @@ from db import engine, SessionLocal
 from src.models.base import Base
 from src.models import User, Chat, Message
 from src.models.message_model import chat_participants
-from main import app
+from main import app, manager
 from auth import SECRET_KEY, ALGORITHM
 
 
@@ -40,6 +40,7 @@ def setup_db():
     db.add(chat1)
     db.commit()
     db.close()
+    manager.membership.invalidate(100)
 
     yield
     Base.metadata.drop_all(bind=engine)
@@ -84,3 +85,135 @@ def test_push_notification_dispatch_for_offline_user():
             assert call_kwargs["sender_name"] == "alice"
             assert call_kwargs["message_text"] == "Hello Bob via Push Notification!"
             assert call_kwargs["chat_id"] == 100
+
+
+class _ExpoStub:
+    """Local stand-in for Expo's send/getReceipts endpoints."""
+
+    def __init__(self, fail_first: int = 0, dead_tokens=(), dead_receipts=()):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.requests = []
+        self.fail_first = fail_first
+        self.dead_tokens = set(dead_tokens)
+        self.dead_receipts = set(dead_receipts)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests.append((self.path, body))
+                if stub.fail_first > 0:
+                    stub.fail_first -= 1
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                if self.path == "/send":
+                    data = [
+                        {"status": "error", "message": "gone", "details": {"error": "DeviceNotRegistered"}}
+                        if m["to"] in stub.dead_tokens else {"status": "ok", "id": f"ticket-{m['to']}"}
+                        for m in body
+                    ]
+                else:
+                    data = {
+                        ticket_id: {"status": "error", "details": {"error": "DeviceNotRegistered"}}
+                        if ticket_id in stub.dead_receipts else {"status": "ok"}
+                        for ticket_id in body["ids"]
+                    }
+                out = json.dumps({"data": data}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def sends(self):
+        return [body for path, body in self.requests if path == "/send"]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.mark.asyncio
+async def test_push_dispatcher_batches_coalesces_and_retries():
+    import asyncio
+    from src.notifications import PushDispatcher
+
+    stub = _ExpoStub(fail_first=1)
+    dispatcher = PushDispatcher(
+        push_url=f"{stub.url}/send", receipts_url=f"{stub.url}/receipts",
+        batch_window_ms=50, backoff_base=0.01
+    )
+    dispatcher.start()
+    try:
+        for i in range(3):
+            dispatcher.enqueue(["ExponentPushToken[bob]"], "alice", f"msg {i}", {"chat_id": 100, "message_id": i})
+        dispatcher.enqueue([f"ExponentPushToken[u{i}]" for i in range(150)], "alice", "hello", {"chat_id": 200, "message_id": 9})
+        await asyncio.sleep(0.5)
+    finally:
+        await dispatcher.stop()
+        stub.close()
+
+    sends = stub.sends()
+    # First attempt got a 503 and was retried; 151 notifications fit in two requests
+    assert dispatcher.retried == 1
+    assert sorted(len(batch) for batch in sends[1:]) == [51, 100]
+    bob = [m for batch in sends[1:] for m in batch if m["to"] == "ExponentPushToken[bob]"]
+    assert len(bob) == 1
+    assert bob[0]["body"] == "3 new messages"
+    assert bob[0]["data"]["message_id"] == 2
+    assert dispatcher.metrics()["sent"] == 151
+    assert dispatcher.metrics()["coalesced"] == 2
+
+
+@pytest.mark.asyncio
+async def test_push_dispatcher_prunes_dead_tokens_from_tickets_and_receipts():
+    from src.notifications import PushDispatcher
+
+    stub = _ExpoStub(dead_tokens={"ExponentPushToken[gone]"}, dead_receipts={"ticket-ExponentPushToken[stale]"})
+    pruned = []
+
+    async def on_dead(tokens, chat_ids):
+        pruned.append((sorted(tokens), chat_ids))
+
+    dispatcher = PushDispatcher(
+        push_url=f"{stub.url}/send", receipts_url=f"{stub.url}/receipts", on_dead_tokens=on_dead
+    )
+    dispatcher.start()
+    try:
+        dispatcher.enqueue(
+            ["ExponentPushToken[gone]", "ExponentPushToken[stale]", "ExponentPushToken[fine]"],
+            "alice", "hi", {"chat_id": 100, "message_id": 1}
+        )
+        await dispatcher.flush()
+        assert pruned == [(["ExponentPushToken[gone]"], {100})]
+        assert len(dispatcher.tickets) == 2
+
+        await dispatcher.check_receipts(force=True)
+        assert pruned[-1] == (["ExponentPushToken[stale]"], {100})
+        assert dispatcher.tickets == []
+    finally:
+        await dispatcher.stop()
+        stub.close()
+
+
+def test_dead_tokens_are_cleared_from_users():
+    import asyncio
+    from main import prune_push_tokens
+
+    asyncio.run(prune_push_tokens(["ExponentPushToken[bob_token]"], {100}))
+    db = SessionLocal()
+    try:
+        assert db.get(User, 2).expo_push_token is None
+        assert db.get(User, 1).expo_push_token == "ExponentPushToken[alice_token]"
+    finally:
+        db.close()
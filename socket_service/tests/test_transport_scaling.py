@@ -35,6 +35,7 @@ def setup_db():
     db.add(chat)
     db.commit()
     db.close()
+    manager.membership.invalidate(100)
     yield
     Base.metadata.drop_all(bind=engine)
     engine.dispose()
@@ -66,6 +67,34 @@ def test_connection_manager_presence():
     assert cm.count_connections(1) == 0
 
 
+def test_presence_index_without_keys_scan():
+    import redis
+    from presence import ONLINE_KEY
+
+    r_sync = redis.Redis(host='127.0.0.1', port=6379, db=0)
+    r_sync.delete(ONLINE_KEY)
+    cm1 = ConnectionManager(redis_client=r_sync, pod_id="pod-A")
+    cm2 = ConnectionManager(redis_client=r_sync, pod_id="pod-B")
+
+    cm1.refresh_presence(1, "conn-a")
+    cm2.refresh_presence(1, "conn-b")
+    cm2.refresh_presence(2, "conn-c")
+    assert cm1.online_among([1, 2, 3]) == {1, 2}
+    assert sorted(cm1.get_online_user_ids()) == [1, 2]
+
+    # Online until the last connection on any pod goes away
+    assert not cm1.presence.remove(1, "conn-a")
+    assert cm2.is_user_online(1)
+    assert cm2.presence.remove(1, "conn-b")
+    assert not cm2.is_user_online(1)
+
+    # A pod that died without cleanup stops heartbeating and gets swept
+    r_sync.zadd(ONLINE_KEY, {"2": time.time() - 3600})
+    assert not cm1.is_user_online(2)
+    assert cm1.presence.sweep() == 1
+    assert r_sync.zscore(ONLINE_KEY, "2") is None
+
+
 def test_scoped_fanout_privacy_isolation():
     client = TestClient(app)
     t1 = create_jwt_token(1)
@@ -186,6 +215,7 @@ async def test_cross_pod_pubsub_routing():
 
     mock_ws_user2 = AsyncMock()
     cm2.active_connections[2] = {"conn-2": mock_ws_user2}
+    cm2.refresh_presence(2, "conn-2")
 
     payload = {"type": "message", "content": "Cross-pod message", "chat_id": 100}
     await cm1.send_to_users([1, 2], payload)
@@ -197,6 +227,239 @@ async def test_cross_pod_pubsub_routing():
     sent_dict = json.loads(sent_args)
     assert sent_dict["content"] == "Cross-pod message"
 
+    cm2.disconnect(mock_ws_user2, 2, "conn-2")
     await cm1.close()
     await cm2.close()
 
+
+@pytest.mark.asyncio
+async def test_fanout_routes_only_to_pods_holding_targets():
+    import asyncio
+    import redis
+    from unittest.mock import AsyncMock
+    from fanout import route_key
+
+    r_sync = redis.Redis(host='127.0.0.1', port=6379, db=0)
+    cm1 = ConnectionManager(redis_client=r_sync, pod_id="pod-A")
+    cm2 = ConnectionManager(redis_client=r_sync, pod_id="pod-B")
+    cm3 = ConnectionManager(redis_client=r_sync, pod_id="pod-C")
+    for cm in (cm1, cm2, cm3):
+        await cm.init_async_redis()
+    await asyncio.sleep(0.1)
+
+    ws2 = AsyncMock()
+    cm2.active_connections[2] = {"conn-2": ws2}
+    cm2.refresh_presence(2, "conn-2")
+    assert r_sync.hget(route_key(2), "conn-2") == b"pod-B"
+
+    listened = []
+    original_deliver = cm3._deliver_local
+
+    async def spy_deliver(user_ids, message_json):
+        listened.append(user_ids)
+        await original_deliver(user_ids, message_json)
+
+    cm3._deliver_local = spy_deliver
+
+    # Several events in one burst are coalesced into a single publish to pod-B
+    for i in range(5):
+        await cm1.send_to_users([2, 3], {"type": "message", "content": f"burst {i}", "chat_id": 100})
+
+    await asyncio.sleep(0.3)
+
+    assert ws2.send_text.call_count == 5
+    assert cm1.fanout.published_batches == 1
+    assert listened == []
+
+    cm2.disconnect(ws2, 2, "conn-2")
+    assert r_sync.hget(route_key(2), "conn-2") is None
+    for cm in (cm1, cm2, cm3):
+        await cm.close()
+
+
+
+@pytest.mark.asyncio
+async def test_membership_cache_hits_and_cross_pod_invalidation():
+    import asyncio
+    import redis
+    from db import AsyncSessionLocal
+    from membership import membership_key
+
+    r_sync = redis.Redis(host='127.0.0.1', port=6379, db=0)
+    cm1 = ConnectionManager(redis_client=r_sync, pod_id="pod-A")
+    cm2 = ConnectionManager(redis_client=r_sync, pod_id="pod-B")
+    for cm in (cm1, cm2):
+        cm.membership.invalidate(100)
+        await cm.init_async_redis()
+    await asyncio.sleep(0.1)
+
+    async with AsyncSessionLocal() as db:
+        membership = await cm1.membership.load(db, "100")
+        assert membership.participant_ids == {1, 2}
+        assert membership.is_member(1) and not membership.is_member(3)
+        assert membership.others(1) == [2]
+
+        # Repeat lookups are served locally, other pods warm up from the Redis hash
+        await cm1.membership.load(db, 100)
+        assert cm1.membership.stats()["misses"] == 1
+        assert cm1.membership.stats()["hits"] == 1
+        assert r_sync.exists(membership_key(100))
+        await cm2.membership.load(db, 100)
+        assert cm2.membership.stats()["redis_hits"] == 1
+        assert cm2.membership.stats()["misses"] == 0
+
+        assert await cm1.membership.load(db, 999) is None
+
+    # Invalidation from one pod (or Django) drops every pod's local copy
+    cm1.membership.invalidate(100)
+    await asyncio.sleep(0.2)
+    assert not r_sync.exists(membership_key(100))
+    assert cm2.membership.get(100) is None
+
+    for cm in (cm1, cm2):
+        await cm.close()
+
+
+def test_typing_debounce_and_signal_budget():
+    from ephemeral import TypingDebouncer, SignalRateLimiter
+
+    debouncer = TypingDebouncer(refresh_interval=3.0)
+    assert debouncer.should_emit(100, 1, True, now=0.0)
+    assert not debouncer.should_emit(100, 1, True, now=1.0)
+    assert debouncer.should_emit(100, 1, True, now=3.5)
+    assert debouncer.should_emit(100, 1, False, now=4.0)
+    assert not debouncer.should_emit(100, 1, False, now=10.0)
+    debouncer.forget_user(1)
+    assert debouncer.should_emit(100, 1, False, now=11.0)
+
+    limiter = SignalRateLimiter(rate_per_sec=2)
+    assert [limiter.allow(1, now=0.0) for _ in range(3)] == [True, True, False]
+    assert limiter.allow(1, now=0.5)
+
+
+def test_typing_storm_is_coalesced_and_spares_message_budget():
+    t1 = create_jwt_token(1)
+    t2 = create_jwt_token(2)
+
+    with TestClient(app) as client, \
+         client.websocket_connect(f"/ws?token={t1}") as ws1, \
+         client.websocket_connect(f"/ws?token={t2}") as ws2:
+        for _ in range(15):
+            ws2.send_json({"type": "typing_start", "chat_id": 100})
+        ws2.send_json({"type": "message", "chat_id": 100, "content": "after typing"})
+
+        typing = ws1.receive_json()
+        assert typing["type"] == "typing_status" and typing["is_typing"] is True
+        # Repeats were dropped server-side and did not use up the message rate limit
+        message = ws1.receive_json()
+        assert message["type"] == "message"
+        assert message["content"] == "after typing"
+
+
+class _SlowWebSocket:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.sent = []
+        self.closed_with = None
+
+    async def send_text(self, text: str):
+        import asyncio
+        await asyncio.sleep(self.delay)
+        self.sent.append(text)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_does_not_stall_other_targets():
+    import asyncio
+    from unittest.mock import AsyncMock
+
+    cm = ConnectionManager(pod_id="pod-local")
+    slow_ws = _SlowWebSocket(delay=5)
+    fast_ws = AsyncMock()
+    cm.active_connections[1] = {"conn-slow": slow_ws}
+    cm.active_connections[2] = {"conn-fast": fast_ws}
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await cm.send_to_users([1, 2], {"type": "message", "content": "hi"})
+    await cm.broadcast("maintenance at 5pm")
+    assert loop.time() - started < 0.5
+
+    await asyncio.sleep(0.05)
+    assert fast_ws.send_text.call_count == 2
+    assert cm.delivery_metrics()["queued_total"] >= 1
+
+    cm.disconnect(slow_ws, 1, "conn-slow")
+    cm.disconnect(fast_ws, 2, "conn-fast")
+    assert cm.delivery_metrics()["connections"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_overflow_policies():
+    import asyncio
+
+    dropping = ConnectionManager(pod_id="pod-drop", send_queue_size=2)
+    ws_drop = _SlowWebSocket(delay=5)
+    dropping.active_connections[1] = {"conn-1": ws_drop}
+    for i in range(5):
+        await dropping.send_to_users([1], {"n": i})
+    metrics = dropping.delivery_metrics()
+    assert metrics["max_queue_depth"] <= 2
+    assert metrics["dropped"] >= 2
+    assert 1 in dropping.active_connections
+    dropping.disconnect(ws_drop, 1, "conn-1")
+
+    strict = ConnectionManager(pod_id="pod-strict", send_queue_size=2, slow_consumer_policy="disconnect")
+    ws_strict = _SlowWebSocket(delay=5)
+    strict.active_connections[1] = {"conn-1": ws_strict}
+    for i in range(5):
+        await strict.send_to_users([1], {"n": i})
+    await asyncio.sleep(0.05)
+    assert 1 not in strict.active_connections
+    assert strict.delivery_metrics()["slow_consumer_disconnects"] == 1
+    assert ws_strict.closed_with == 1013
+
+
+def test_handler_latency_histograms_exposed():
+    client = TestClient(app)
+    t1 = create_jwt_token(1)
+
+    with client.websocket_connect(f"/ws?token={t1}") as ws1:
+        ws1.send_json({"type": "typing_start", "chat_id": 100})
+        ws1.send_json({"type": "ping"})
+        assert ws1.receive_json()["type"] == "pong"
+
+    res = client.get("/metrics/handlers")
+    assert res.status_code == 200
+    typing = res.json()["handlers"]["typing"]
+    assert typing["count"] >= 1
+    assert typing["buckets"]["le_inf"] == typing["count"]
+    assert "db_pool" in res.json()
+
+
+@pytest.mark.asyncio
+async def test_membership_load_racing_invalidation_is_not_cached():
+    import redis
+    from db import AsyncSessionLocal
+    from membership import ChatMembership, membership_key
+
+    r_sync = redis.Redis(host='127.0.0.1', port=6379, db=0)
+    cm = ConnectionManager(redis_client=r_sync, pod_id="pod-A")
+    cm.membership.invalidate(100)
+
+    # A load read the participants, then the chat was invalidated before it wrote back
+    generation, invalidations = cm.membership.generation(100), cm.membership._invalidations
+    stale = ChatMembership(100, {1: None, 2: None, 3: None})
+    cm.membership.invalidate(100)
+    cm.membership.put(stale, generation, invalidations)
+    assert not r_sync.exists(membership_key(100))
+    assert cm.membership.get(100) is None
+
+    async with AsyncSessionLocal() as db:
+        membership = await cm.membership.load(db, 100)
+    assert membership.participant_ids == {1, 2}
+    assert r_sync.exists(membership_key(100))
+    await cm.close()